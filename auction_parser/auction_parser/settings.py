@@ -24,6 +24,38 @@ load_dotenv()
 
 JSON_RESULTS_DIR = os.path.join(BASE_DIR, 'cars', 'json_results')
 
+# Как запускаются задачи парсинга из веб-интерфейса:
+# 'thread' - в потоке текущего процесса (runserver),
+# 'process' - отдельным процессом manage.py (gunicorn, см. gunicorn.conf.py)
+PARSER_JOBS_MODE = environ.get('PARSER_JOBS_MODE', 'thread')
+
+# Запуск со статусом 'running' без сигнала процесса дольше этого времени (сек)
+# считается прерванным и может быть продолжен с последней сохраненной страницы
+PARSER_STALE_SECONDS = int(environ.get('PARSER_STALE_SECONDS', '300'))
+
+# Загружать страницы по HTTP/2 (через httpx) вместо HTTP/1.1
+PARSER_HTTP2 = environ.get('PARSER_HTTP2', '0') == '1'
+
+# Разбирать страницы по мере загрузки (блок за блоком), не дожидаясь всего ответа
+PARSER_STREAMING = environ.get('PARSER_STREAMING', '0') == '1'
+
+# Сколько номеров лотов (или id) принимает один пакетный запрос cars/lookup/
+LOT_LOOKUP_MAX_KEYS = int(environ.get('LOT_LOOKUP_MAX_KEYS', '500'))
+
+# Максимальный размер страницы списка автомобилей (cars/ajax/)
+CARS_MAX_PER_PAGE = int(environ.get('CARS_MAX_PER_PAGE', '100'))
+# Лимит времени одного запроса к БД из списка автомобилей, мс (PostgreSQL statement_timeout; 0 - без лимита)
+WEB_STATEMENT_TIMEOUT_MS = int(environ.get('WEB_STATEMENT_TIMEOUT_MS', '5000'))
+
+# Как часто (сек) индекс аналогов (/analytics/comparables/) дочитывает изменившиеся лоты
+COMPARABLES_REFRESH_SECONDS = int(environ.get('COMPARABLES_REFRESH_SECONDS', '60'))
+
+# Через сколько дней после аукциона лоты удаляются командой purge_data --retention
+RETENTION_DAYS = int(environ.get('RETENTION_DAYS', '90'))
+
+# Пересчитывать оценку лотов по аналогам (cars.valuation) после каждого запуска парсинга
+VALUATION_AUTO_REFRESH = environ.get('VALUATION_AUTO_REFRESH', '1') == '1'
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -51,8 +83,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cars.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'cars.db_router.ReplicaRoutingMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -94,6 +129,23 @@ DATABASES = {
     }
 }
 
+# Реплика для чтения (потоковая репликация PostgreSQL): представления только
+# на чтение обращаются к ней через cars.db_router.ReplicaRouter
+if environ.get('DATABASE_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': environ.get('DATABASE_REPLICA_HOST'),
+        'PORT': environ.get('DATABASE_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['cars.db_router.ReplicaRouter']
+
+# При большем отставании реплики (сек) чтение идет с основной БД
+REPLICA_MAX_LAG_SECONDS = float(environ.get('REPLICA_MAX_LAG_SECONDS', '10'))
+# Сколько секунд после изменяющего запроса пользователь читает с основной БД
+REPLICA_STICKY_SECONDS = int(environ.get('REPLICA_STICKY_SECONDS', '30'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -132,6 +184,18 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 
+# WhiteNoise отдает статику прямо из воркеров: заранее сжатые gzip/brotli
+# версии файлов и долгие заголовки кеширования
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedStaticFilesStorage',
+    },
+}
+WHITENOISE_MAX_AGE = 60 * 60 * 24 * 7
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,82 @@
+"""
+Скорость индекса аналогов (cars.comparables) на синтетических данных.
+
+Генерирует N лотов (марки, модели с неравномерной популярностью, год,
+пробег, объем, цена), строит индекс, затем замеряет поиск k ближайших
+аналогов и инкрементальное обновление пачки лотов. База данных не нужна.
+
+Пример:
+    python benchmarks/bench_comparables.py --lots 1000000
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_rows(count, brands, models_per_brand, seed=0):
+    rng = np.random.default_rng(seed)
+    brand_codes = rng.integers(0, brands, count)
+    # Популярность моделей неравномерна: несколько моделей с сотнями тысяч лотов и много редких
+    model_codes = np.minimum(rng.zipf(1.5, count) - 1, models_per_brand - 1)
+    years = rng.integers(1995, 2025, count)
+    mileages = rng.integers(0, 300_000, count)
+    engines = rng.choice([660, 1000, 1300, 1500, 1800, 2000, 2500, 3000, 3500], count)
+    prices = rng.integers(100_000, 5_000_000, count)
+    return [
+        (lot_id, f'BRAND{brand}', f'MODEL{model}', int(year), int(mileage), int(engine), int(price))
+        for lot_id, brand, model, year, mileage, engine, price
+        in zip(range(count), brand_codes, model_codes, years, mileages, engines, prices)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lots', type=int, default=1_000_000)
+    parser.add_argument('--brands', type=int, default=40)
+    parser.add_argument('--models-per-brand', type=int, default=150)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=100, help="лотов в пачке инкрементального обновления")
+    args = parser.parse_args()
+
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auction_parser.settings')
+    import django
+    django.setup()
+    from cars.comparables import ComparablesIndex
+
+    rows = synthetic_rows(args.lots, args.brands, args.models_per_brand)
+    index = ComparablesIndex()
+    started = time.perf_counter()
+    index.update(rows)
+    build_seconds = time.perf_counter() - started
+    largest = max(len(group) for group in index.groups.values())
+
+    rng = np.random.default_rng(1)
+    timings = []
+    for position in rng.integers(0, len(rows), args.queries):
+        lot_id, brand, model, year, mileage, engine, price = rows[position]
+        started = time.perf_counter()
+        index.query(brand, model, year, mileage, engine, k=args.k, exclude_id=lot_id)
+        timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1000
+
+    # Пачка изменившихся лотов после парсинга: перестраиваются только их модели
+    batch = [row[:6] + (row[6] + 1000,) for row in (rows[i] for i in rng.integers(0, len(rows), args.batch))]
+    started = time.perf_counter()
+    groups = index.update(batch)
+    update_seconds = time.perf_counter() - started
+
+    print(f"лотов: {len(index)}, моделей: {len(index.groups)}, крупнейшая модель: {largest}")
+    print(f"построение: {build_seconds:.2f} сек")
+    print(f"поиск {args.k} аналогов: медиана {np.median(timings):.2f} мс, "
+          f"p99 {np.percentile(timings, 99):.2f} мс, максимум {timings.max():.2f} мс")
+    print(f"обновление пачки {args.batch} лотов ({groups} моделей): {update_seconds:.2f} сек")
+
+
+if __name__ == '__main__':
+    main()
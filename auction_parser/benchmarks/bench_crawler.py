@@ -0,0 +1,193 @@
+"""
+Сквозная пропускная способность парсера: MultiPageParser против локальной
+замены сайта (cars.fake_site) с записью в отдельную тестовую БД.
+
+Для каждого режима (последовательный и многопоточные) печатаются страницы/сек,
+автомобили/сек и строки БД/сек (автомобили + изображения), а также время этапов.
+Перед каждым режимом таблицы очищаются, так что все лоты записываются заново.
+
+С --save результаты дописываются в файл (JSON Lines), с --compare сравниваются
+с последним сохраненным результатом тех же параметров; при падении
+пропускной способности больше --threshold скрипт завершается с ошибкой.
+
+Пример:
+    python benchmarks/bench_crawler.py --pages 20 --lots 50 --latency-ms 50 --concurrency 1 4
+    python benchmarks/bench_crawler.py --compare --save
+    python benchmarks/bench_crawler.py --stream --concurrency 1
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import subprocess
+from datetime import datetime
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = os.path.join(PROJECT_DIR, 'benchmarks', 'results', 'crawler.jsonl')
+RATES = ('pages_per_sec', 'cars_per_sec', 'db_rows_per_sec')
+
+
+def setup_django():
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auction_parser.settings')
+    import django
+    django.setup()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenario(site, concurrency, streaming=False):
+    """Один запуск парсера по всем страницам сайта, возвращает замеры"""
+    from cars.models import Car, Image
+    from cars.lifecycle import purge_all
+    from cars.run_parse import MultiPageParser
+
+    purge_all()
+    multi_parser = MultiPageParser(autothrottle=False, streaming=streaming)
+    multi_parser.base_url = site.base_url
+    multi_parser.pause = lambda: None
+    # Оценки по аналогам к пропускной способности парсера не относятся
+    multi_parser.refresh_valuations = lambda: None
+    requests_before = site.requests
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        if concurrency > 1:
+            cars, images, pages = multi_parser.run_pages_concurrently(1, site.pages, concurrency)
+        else:
+            cars, images, pages = multi_parser.run_multi_page_parser(1, site.pages)
+    seconds = time.perf_counter() - started
+
+    rows = Car.objects.count() + Image.objects.count()
+    return {
+        'concurrency': concurrency,
+        'pages': pages,
+        'cars': cars,
+        'db_rows': rows,
+        'requests': site.requests - requests_before,
+        'failed_pages': len(multi_parser.failed_pages),
+        'seconds': round(seconds, 3),
+        'pages_per_sec': round(pages / seconds, 2),
+        'cars_per_sec': round(cars / seconds, 1),
+        'db_rows_per_sec': round(rows / seconds, 1),
+        'stages': {name: round(value, 3) for name, value in multi_parser.timings.totals.items()},
+    }
+
+
+def load_baseline(path, params):
+    """Последний сохраненный результат с теми же параметрами"""
+    if not os.path.exists(path):
+        return None
+    baseline = None
+    with open(path, encoding='utf-8') as results:
+        for line in results:
+            entry = json.loads(line)
+            if entry['params'] == params:
+                baseline = entry
+    return baseline
+
+
+def compare(results, baseline, threshold):
+    """Печатает изменение скоростей относительно базовой линии, возвращает список регрессий"""
+    previous = {result['concurrency']: result for result in baseline['results']}
+    regressions = []
+    print(f"\nСравнение с {baseline['timestamp']} ({baseline.get('revision') or '-'}):")
+    for result in results:
+        old = previous.get(result['concurrency'])
+        if not old:
+            continue
+        for rate in RATES:
+            change = (result[rate] - old[rate]) / old[rate] if old[rate] else 0.0
+            marker = ''
+            if change < -threshold:
+                marker = '  <-- регрессия'
+                regressions.append((result['concurrency'], rate, change))
+            print(f"  x{result['concurrency']:<3} {rate:<16} {old[rate]:>9} -> {result[rate]:>9} "
+                  f"({change:+.1%}){marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--lots', type=int, default=50, help="лотов на странице")
+    parser.add_argument('--latency-ms', type=float, default=50, help="задержка ответа сайта")
+    parser.add_argument('--error-rate', type=float, default=0, help="доля ответов 503 (0..1)")
+    parser.add_argument('--padding-kb', type=int, default=100, help="размер остальной разметки страницы, КБ")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4],
+                        help="режимы: 1 - последовательный, N - N потоков")
+    parser.add_argument('--stream', action='store_true', help="разбор страниц по мере загрузки")
+    parser.add_argument('--results', default=RESULTS_FILE, help="файл результатов (JSON Lines)")
+    parser.add_argument('--save', action='store_true', help="дописать результат в файл результатов")
+    parser.add_argument('--compare', action='store_true', help="сравнить с последним сохраненным результатом")
+    parser.add_argument('--threshold', type=float, default=0.15, help="допустимое падение скорости")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from cars.fake_site import FakeAuctionSite
+
+    params = {
+        'pages': args.pages, 'lots': args.lots, 'latency_ms': args.latency_ms,
+        'error_rate': args.error_rate, 'padding_kb': args.padding_kb, 'db': connection.vendor,
+    }
+    if args.stream:
+        params['streaming'] = True
+    print(f"{args.pages} страниц x {args.lots} лотов, задержка {args.latency_ms} мс, "
+          f"ошибки {args.error_rate:.0%}, БД {connection.vendor}\n")
+    if connection.vendor == 'sqlite' and max(args.concurrency) > 1:
+        print("SQLite блокирует таблицу при записи из нескольких потоков: часть лотов не сохранится, "
+              "многопоточные режимы показательны только на PostgreSQL\n")
+
+    # Отдельная БД, рабочие данные не затрагиваются
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    results = []
+    try:
+        with FakeAuctionSite(args.pages, args.lots, args.latency_ms / 1000, args.error_rate,
+                             args.padding_kb) as site:
+            print(f"{'mode':<6} {'cars':>6} {'pages/s':>8} {'cars/s':>8} {'rows/s':>9} {'seconds':>8} "
+                  f"{'fetch':>7} {'parse':>7} {'persist':>8} {'failed':>7}")
+            for concurrency in args.concurrency:
+                result = run_scenario(site, concurrency, args.stream)
+                results.append(result)
+                stages = result['stages']
+                print(f"x{concurrency:<5} {result['cars']:>6} {result['pages_per_sec']:>8} "
+                      f"{result['cars_per_sec']:>8} {result['db_rows_per_sec']:>9} {result['seconds']:>8} {stages['fetch']:>7} "
+                      f"{stages['parse']:>7} {stages['persist']:>8} {result['failed_pages']:>7}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    regressions = []
+    if args.compare:
+        baseline = load_baseline(args.results, params)
+        if baseline:
+            regressions = compare(results, baseline, args.threshold)
+        else:
+            print("\nСохраненных результатов с такими параметрами нет")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.results), exist_ok=True)
+        entry = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'params': params,
+            'results': results,
+        }
+        with open(args.results, 'a', encoding='utf-8') as output:
+            output.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        print(f"\nРезультат сохранен в {args.results}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+"""
+Микробенчмарки горячих путей парсера: разбор блоков, нормализация текста,
+запись в БД и ответ списка автомобилей.
+
+- parse.*     - блоки/сек: вся страница каталога (parse_car_data), извлечение
+                полей из готовых блоков (extract_car_from_block) и цены (extract_price)
+                на записанной странице benchmarks/fixtures/catalog_page.html;
+- normalize.* - операций/сек: parse_price_text, split_brand_model,
+                parse_auction_date, parse_engine_cc на синтетических строках;
+- persist.*   - строк/сек (автомобили + изображения): save_to_database
+                новых лотов и повторное сохранение с изменившимися ценами;
+- ajax.*      - мс на ответ CarsAjaxView (медиана) при разном числе лотов в таблице.
+
+Запись идет в отдельную тестовую БД из настроек приложения (SQLite или
+PostgreSQL), рабочие данные не затрагиваются. Каждый замер повторяется
+--repeat раз, берется лучший результат.
+
+С --save результаты дописываются в файл (JSON Lines), с --compare сравниваются
+с последним сохраненным результатом тех же параметров (в том числе СУБД);
+если какой-то замер хуже базового больше чем на --threshold, скрипт
+завершается с ошибкой.
+
+Пример:
+    python benchmarks/bench_hotpaths.py --compare --save
+    python benchmarks/bench_hotpaths.py --only parse normalize
+    python benchmarks/bench_hotpaths.py --sizes 1000 10000 100000 --only ajax
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+import statistics
+from datetime import datetime
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = os.path.join(PROJECT_DIR, 'benchmarks', 'results', 'hotpaths.jsonl')
+FIXTURE_PAGE = os.path.join(PROJECT_DIR, 'benchmarks', 'fixtures', 'catalog_page.html')
+
+# Реестр замеров: имя -> (функция, единица, лучше 'higher' или 'lower')
+BENCHMARKS = {}
+
+
+def benchmark(name, unit, better='higher'):
+    def register(function):
+        BENCHMARKS[name] = (function, unit, better)
+        return function
+    return register
+
+
+def quiet():
+    """Парсер подробно печатает каждый шаг - вывод уходит в /dev/null"""
+    return contextlib.redirect_stdout(open(os.devnull, 'w'))
+
+
+def rate(function, items, repeat):
+    """Лучшая скорость (элементов/сек) из repeat прогонов function()"""
+    best = 0.0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with quiet():
+            function()
+        best = max(best, items / (time.perf_counter() - started))
+    return best
+
+
+# --- Синтетические данные ---
+
+def price_texts(count, seed=0):
+    """Цены в написаниях сайта: разные пробелы, тильда, валюта"""
+    rng = random.Random(seed)
+    spaces = [' ', '\xa0', ' ', ' ', '&nbsp;']
+    texts = []
+    for _ in range(count):
+        value = f"{rng.randint(100_000, 9_999_999):,}".replace(',', rng.choice(spaces))
+        texts.append(f"{rng.choice(['', '~', '≈ '])}{value}{rng.choice([' ₽', ' руб', '₽', ''])}")
+    return texts
+
+
+def brand_model_texts(count, seed=0):
+    rng = random.Random(seed)
+    names = ['TOYOTA PRIUS', 'NISSAN NOTE E-POWER', 'MERCEDES-BENZ E250', 'LAND ROVER DISCOVERY',
+             'HONDA FIT HYBRID', 'Daihatsu Tanto Custom', 'PORSCHE CAYENNE', 'SUZUKI  JIMNY&nbsp;SIERRA']
+    return [rng.choice(names) for _ in range(count)]
+
+
+def date_texts(count, seed=0):
+    rng = random.Random(seed)
+    formats = ['{d:02d}.{m:02d}.2026', '{d:02d}.{m:02d}.2026 10:30', '2026-{m:02d}-{d:02d}', 'Аукцион: {d:02d}.{m:02d}.2026']
+    return [rng.choice(formats).format(d=rng.randint(1, 28), m=rng.randint(1, 12)) for _ in range(count)]
+
+
+def car_records(count, seed=0, price_shift=0):
+    from cars.records import CarRecord
+
+    rng = random.Random(seed)
+    brands = ('TOYOTA', 'NISSAN', 'HONDA', 'MAZDA', 'SUBARU', 'LEXUS')
+    return [
+        CarRecord(
+            lot_number=str(100_000 + number),
+            brand=brands[number % len(brands)],
+            model=f'MODEL{number % 97}',
+            year=2000 + number % 24,
+            price=rng.randint(300, 1200) * 1000 + price_shift,
+            mileage=rng.randint(0, 200) * 1000,
+            engine_volume=f'{1000 + number % 30 * 100} cc',
+            engine_cc=1000 + number % 30 * 100,
+            images=tuple(f'https://img.example/{number}/{index}.jpg' for index in range(3)),
+        )
+        for number in range(count)
+    ]
+
+
+def fill_cars(target_size, seed=0):
+    """Добавляет в таблицу синтетические лоты (с 2 изображениями) до target_size"""
+    from django.db import connection
+    from django.utils import timezone
+    from cars.models import Car, Image
+
+    rng = random.Random(seed)
+    brands = ('Toyota', 'Nissan', 'Honda', 'Mazda', 'Subaru', 'Lexus', 'Suzuki', 'Daihatsu')
+    now = timezone.now()
+    existing = Car.objects.count()
+    for start in range(existing, target_size, 5000):
+        cars = Car.objects.bulk_create(
+            Car(brand=brands[number % len(brands)], model=f'MODEL{number % 97}', year=rng.randint(1995, 2024),
+                price=rng.randint(100, 5000) * 1000, mileage=rng.randint(0, 300) * 1000,
+                engine_cc=rng.choice([660, 1300, 1500, 1800, 2000, 2500]), lot_number=str(number),
+                auction_at=now + timezone.timedelta(days=rng.randint(-30, 30)))
+            for number in range(start, min(start + 5000, target_size))
+        )
+        Image.objects.bulk_create(
+            Image(car=car, url=f'https://img.example/{car.pk}/{index}.jpg') for car in cars for index in range(2)
+        )
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE cars_car')
+            cursor.execute('ANALYZE cars_image')
+
+
+# --- Замеры ---
+
+@benchmark('parse.page', 'blocks/s')
+def bench_parse_page(args):
+    from cars.parser import AuctionParser
+
+    html = open(FIXTURE_PAGE, encoding='utf-8').read()
+    parser = AuctionParser()
+    with quiet():
+        blocks = len(parser.parse_car_data(html))
+    return rate(lambda: parser.parse_car_data(html), blocks, args.repeat)
+
+
+def fixture_blocks():
+    from bs4 import BeautifulSoup
+    from cars.adapters import get_adapter
+
+    soup = BeautifulSoup(open(FIXTURE_PAGE, encoding='utf-8').read(), 'html.parser')
+    return get_adapter().find_blocks(soup)
+
+
+@benchmark('parse.extract_car', 'blocks/s')
+def bench_extract_car(args):
+    from cars.parser import AuctionParser
+
+    parser = AuctionParser()
+    blocks = fixture_blocks()
+    return rate(lambda: [parser.extract_car_from_block(block) for block in blocks], len(blocks), args.repeat)
+
+
+@benchmark('parse.extract_price', 'blocks/s')
+def bench_extract_price(args):
+    from cars.adapters import get_adapter
+
+    adapter = get_adapter()
+    blocks = fixture_blocks()
+    return rate(lambda: [adapter.extract_price(block) for block in blocks], len(blocks), args.repeat)
+
+
+@benchmark('normalize.price_text', 'ops/s')
+def bench_price_text(args):
+    from cars.adapters import get_adapter
+
+    adapter = get_adapter()
+    texts = price_texts(args.normalize_items)
+    return rate(lambda: [adapter.parse_price_text(text) for text in texts], len(texts), args.repeat)
+
+
+@benchmark('normalize.brand_model', 'ops/s')
+def bench_brand_model(args):
+    from cars.adapters import get_adapter
+
+    adapter = get_adapter()
+    texts = brand_model_texts(args.normalize_items)
+    return rate(lambda: [adapter.split_brand_model(text) for text in texts], len(texts), args.repeat)
+
+
+@benchmark('normalize.auction_date', 'ops/s')
+def bench_auction_date(args):
+    from cars.adapters import get_adapter
+
+    adapter = get_adapter()
+    texts = date_texts(args.normalize_items)
+    return rate(lambda: [adapter.parse_auction_date(text) for text in texts], len(texts), args.repeat)
+
+
+@benchmark('normalize.engine_cc', 'ops/s')
+def bench_engine_cc(args):
+    from cars.adapters import get_adapter
+
+    adapter = get_adapter()
+    texts = [f'{1000 + number % 30 * 100} cc' for number in range(args.normalize_items)]
+    return rate(lambda: [adapter.parse_engine_cc(text) for text in texts], len(texts), args.repeat)
+
+
+def persist_rate(args, update):
+    from cars.lifecycle import purge_all
+    from cars.parser import AuctionParser
+
+    best = 0.0
+    for attempt in range(args.repeat):
+        purge_all()
+        parser = AuctionParser()
+        records = car_records(args.persist_lots)
+        if update:
+            with quiet():
+                parser.save_to_database(records)
+            records = car_records(args.persist_lots, price_shift=1000 * (attempt + 1))
+        started = time.perf_counter()
+        rows = 0
+        with quiet():
+            # Пачками по странице каталога, как при парсинге
+            for start in range(0, len(records), 50):
+                cars, images = parser.save_to_database(records[start:start + 50], update_existing=update)
+                rows += cars + images
+        best = max(best, rows / (time.perf_counter() - started))
+    purge_all()
+    return best
+
+
+@benchmark('persist.insert', 'rows/s')
+def bench_persist_insert(args):
+    return persist_rate(args, update=False)
+
+
+@benchmark('persist.update', 'rows/s')
+def bench_persist_update(args):
+    return persist_rate(args, update=True)
+
+
+# Запросы списка автомобилей: страница по умолчанию, фильтр с сортировкой по цене, поиск
+AJAX_QUERIES = {
+    'default': {},
+    'brand_price': {'brand': 'Toyota', 'sort': 'price', 'year_from': '2010'},
+    'search': {'search': 'niss mod', 'sort': '-auction_at'},
+}
+
+
+def bench_ajax(args, query):
+    from django.test import RequestFactory
+    from cars.views import CarsAjaxView
+
+    view = CarsAjaxView.as_view()
+    request = RequestFactory().get('/cars/ajax/', AJAX_QUERIES[query])
+    timings = []
+    for _ in range(max(args.repeat, 5)):
+        started = time.perf_counter()
+        response = view(request)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.content
+    return statistics.median(timings) * 1000
+
+
+def selected(name, only):
+    return not only or any(name == prefix or name.startswith(prefix + '.') for prefix in only)
+
+
+def run_benchmarks(args):
+    from cars.lifecycle import purge_all
+
+    results = {}
+    for name, (function, unit, better) in BENCHMARKS.items():
+        if selected(name, args.only):
+            results[name] = {'value': round(function(args), 2), 'unit': unit, 'better': better}
+            print(f"  {name:<28} {results[name]['value']:>12} {unit}")
+
+    if selected('ajax', args.only):
+        purge_all()
+        for size in sorted(args.sizes):
+            fill_cars(size)
+            for query in AJAX_QUERIES:
+                name = f'ajax.{query}@{size}'
+                results[name] = {'value': round(bench_ajax(args, query), 2), 'unit': 'ms', 'better': 'lower'}
+                print(f"  {name:<28} {results[name]['value']:>12} ms")
+        purge_all()
+    return results
+
+
+def load_baseline(path, params):
+    """Последний сохраненный результат с теми же параметрами"""
+    if not os.path.exists(path):
+        return None
+    baseline = None
+    with open(path, encoding='utf-8') as results:
+        for line in results:
+            entry = json.loads(line)
+            if entry['params'] == params:
+                baseline = entry
+    return baseline
+
+
+def compare(results, baseline, threshold):
+    """Печатает изменения относительно базовой линии, возвращает список регрессий"""
+    regressions = []
+    print(f"\nСравнение с {baseline['timestamp']} ({baseline.get('revision') or '-'}):")
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if not old or not old['value']:
+            continue
+        change = (result['value'] - old['value']) / old['value']
+        # Для времени ответа рост - ухудшение
+        worse = -change if result['better'] == 'higher' else change
+        marker = ''
+        if worse > threshold:
+            marker = '  <-- регрессия'
+            regressions.append((name, change))
+        print(f"  {name:<28} {old['value']:>12} -> {result['value']:>12} {result['unit']:<9} ({change:+.1%}){marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', default=[], help="группы или замеры: parse normalize persist ajax ...")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--normalize-items', type=int, default=20000, help="строк на замер нормализации")
+    parser.add_argument('--persist-lots', type=int, default=1000, help="лотов на замер записи")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                        help="число лотов в таблице для замеров списка автомобилей")
+    parser.add_argument('--results', default=RESULTS_FILE, help="файл результатов (JSON Lines)")
+    parser.add_argument('--save', action='store_true', help="дописать результат в файл результатов")
+    parser.add_argument('--compare', action='store_true', help="сравнить с последним сохраненным результатом")
+    parser.add_argument('--threshold', type=float, default=0.15, help="допустимое ухудшение")
+    args = parser.parse_args()
+
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auction_parser.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from bench_crawler import git_revision
+
+    params = {
+        'db': connection.vendor, 'normalize_items': args.normalize_items,
+        'persist_lots': args.persist_lots, 'sizes': sorted(args.sizes),
+    }
+    if args.only:
+        params['only'] = sorted(args.only)
+    print(f"БД {connection.vendor}, повторов {args.repeat}\n")
+
+    # Отдельная БД, рабочие данные не затрагиваются
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        results = run_benchmarks(args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    regressions = []
+    if args.compare:
+        baseline = load_baseline(args.results, params)
+        if baseline:
+            regressions = compare(results, baseline, args.threshold)
+        else:
+            print("\nСохраненных результатов с такими параметрами нет")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.results), exist_ok=True)
+        entry = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'params': params,
+            'results': results,
+        }
+        with open(args.results, 'a', encoding='utf-8') as output:
+            output.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        print(f"\nРезультат сохранен в {args.results}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
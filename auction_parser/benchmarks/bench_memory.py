@@ -0,0 +1,138 @@
+"""
+Пиковая память многостраничного запуска: старый конвейер (список словарей,
+дерево BeautifulSoup живет до сборщика мусора) против потокового
+(записи CarRecord пачками, дерево разрушается сразу после разбора).
+
+Каждый вариант запускается в отдельном процессе на синтетических страницах
+каталога (без записи в БД), печатается пиковый RSS процесса. legacy и stream
+работают без сети; buffered и incremental загружают те же страницы по HTTP
+с локальной замены сайта (cars.fake_site, в родительском процессе): целиком
+перед разбором или с разбором блоков по мере загрузки (PARSER_STREAMING).
+
+Пример:
+    python benchmarks/bench_memory.py --pages 50 --lots 50
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import contextlib
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('legacy', 'stream', 'buffered', 'incremental')
+HTTP_MODES = ('buffered', 'incremental')
+
+
+def setup_django():
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auction_parser.settings')
+    import django
+    django.setup()
+
+
+def run_legacy(pages, lots, padding_kb):
+    """Поведение до перехода на CarRecord: список словарей на страницу, дерево без decompose()"""
+    from bs4 import BeautifulSoup
+    from django.core.serializers.json import DjangoJSONEncoder
+    from cars.parser import AuctionParser
+    from cars.fake_site import synthetic_page
+
+    parser = AuctionParser()
+    total = 0
+    with open(os.devnull, 'w') as archive:
+        for page in range(1, pages + 1):
+            html_content = synthetic_page(page, lots, padding_kb)
+            soup = BeautifulSoup(html_content, 'html.parser')
+            car_blocks = soup.find_all('div', class_=lambda x: x and 'flex flex-col md:table-row-group' in x)
+            cars_data = []
+            for block in car_blocks:
+                car = parser.extract_car_from_block(block)
+                if car:
+                    data = car.to_dict()
+                    if not data['images']:
+                        del data['images']
+                    cars_data.append(data)
+            archive.write(''.join(json.dumps(car, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+                                  for car in cars_data))
+            total += len(cars_data)
+    return total
+
+
+def run_stream(pages, lots, padding_kb):
+    """Текущий конвейер MultiPageParser в режиме --dry-run"""
+    from cars.run_parse import MultiPageParser
+    from cars.fake_site import synthetic_page
+
+    with open(os.devnull, 'w') as archive:
+        multi_parser = MultiPageParser(dry_run=True, archive=archive, autothrottle=False)
+        multi_parser.parser.fetch_html = lambda url: synthetic_page(int(url.rsplit('=', 1)[1]), lots, padding_kb)
+        multi_parser.pause = lambda: None
+        cars, images, successful_pages = multi_parser.run_multi_page_parser(1, pages)
+    return cars
+
+
+def run_http(pages, base_url, streaming):
+    """MultiPageParser в режиме --dry-run, страницы загружаются с локальной замены сайта"""
+    from cars.run_parse import MultiPageParser
+
+    with open(os.devnull, 'w') as archive:
+        multi_parser = MultiPageParser(dry_run=True, archive=archive, autothrottle=False, streaming=streaming)
+        multi_parser.base_url = base_url
+        multi_parser.pause = lambda: None
+        cars, images, successful_pages = multi_parser.run_multi_page_parser(1, pages)
+    return cars
+
+
+def run_mode(mode, pages, lots, padding_kb, base_url=None):
+    """Выполняется в дочернем процессе, печатает результат одной JSON-строкой"""
+    setup_django()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        if mode in HTTP_MODES:
+            cars = run_http(pages, base_url, streaming=mode == 'incremental')
+        else:
+            runner = run_legacy if mode == 'legacy' else run_stream
+            cars = runner(pages, lots, padding_kb)
+    print(json.dumps({
+        'mode': mode,
+        'cars': cars,
+        'seconds': time.perf_counter() - started,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--lots', type=int, default=50, help="лотов на странице")
+    parser.add_argument('--padding-kb', type=int, default=300, help="размер остальной разметки страницы, КБ")
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.pages, args.lots, args.padding_kb, args.base_url)
+        return
+
+    sys.path.insert(0, PROJECT_DIR)
+    from cars.fake_site import FakeAuctionSite
+
+    print(f"{args.pages} страниц x {args.lots} лотов, разметка ~{args.padding_kb} КБ на страницу\n")
+    print(f"{'mode':<12} {'cars':>6} {'seconds':>8} {'peak RSS MB':>12}")
+    with FakeAuctionSite(args.pages, args.lots, padding_kb=args.padding_kb) as site:
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--mode', mode, '--pages', str(args.pages),
+                 '--lots', str(args.lots), '--padding-kb', str(args.padding_kb), '--base-url', site.base_url],
+                cwd=PROJECT_DIR, check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<12} {result['cars']:>6} {result['seconds']:>8.1f} "
+                  f"{result['peak_rss_kb'] / 1024:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Сравнение обычной и секционированной по месяцам таблицы автомобилей (PostgreSQL).
+
+Скрипт создает схему bench_partitioning в базе из настроек приложения (.env),
+заполняет две таблицы с одинаковыми данными через generate_series -
+обычную и секционированную по месяцу created_at - и замеряет типичные
+запросы: первая страница списка, фильтр по недавнему периоду, сводка
+для дашборда и удаление устаревших данных (DELETE против DROP секции).
+Для каждого запроса печатается медиана времени и число прочитанных секций.
+
+Пример (20 млн строк за 36 месяцев, генерация занимает несколько минут):
+    python benchmarks/bench_partitioning.py --rows 20000000 --months 36
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA = 'bench_partitioning'
+
+COLUMNS = """
+    id bigint NOT NULL,
+    brand varchar(100) NOT NULL,
+    model varchar(100) NOT NULL,
+    year integer NOT NULL,
+    price integer,
+    mileage integer,
+    auction_at timestamptz,
+    created_at timestamptz NOT NULL
+"""
+
+# Запросы как в CarsAjaxView и типичных дашбордах Redash
+QUERIES = {
+    'list_newest': """
+        SELECT * FROM {table} ORDER BY created_at DESC LIMIT 50
+    """,
+    'recent_week_page': """
+        SELECT * FROM {table}
+        WHERE created_at >= now() - interval '7 days'
+        ORDER BY created_at DESC LIMIT 50 OFFSET 100
+    """,
+    'recent_week_count': """
+        SELECT count(*) FROM {table} WHERE created_at >= now() - interval '7 days'
+    """,
+    'recent_month_by_brand': """
+        SELECT brand, count(*), avg(price) FROM {table}
+        WHERE created_at >= now() - interval '30 days'
+        GROUP BY brand
+    """,
+    'quarter_auction_range': """
+        SELECT count(*) FROM {table}
+        WHERE created_at >= now() - interval '90 days'
+          AND auction_at BETWEEN now() - interval '30 days' AND now()
+    """,
+}
+
+
+def setup_django():
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auction_parser.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    if connection.vendor != 'postgresql':
+        sys.exit("Бенчмарк рассчитан на PostgreSQL")
+    return connection
+
+
+def month_bounds(months):
+    """Границы помесячных секций: от months месяцев назад до следующего месяца"""
+    return [
+        f"date_trunc('month', now()) - interval '{offset} months'"
+        for offset in range(months - 1, -2, -1)
+    ]
+
+
+def create_tables(cursor, rows, months):
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+
+    # Данные равномерно распределены по периоду; аукцион - через 0-21 день после добавления
+    cursor.execute(f"""
+        CREATE UNLOGGED TABLE {SCHEMA}.cars_plain AS
+        SELECT g AS id,
+               (ARRAY['Toyota','Nissan','Honda','Mazda','Subaru','Suzuki','Lexus','Mitsubishi'])[1 + g % 8]::varchar(100) AS brand,
+               ('Model ' || (g % 120))::varchar(100) AS model,
+               1995 + (g % 30) AS year,
+               CASE WHEN g % 10 = 0 THEN NULL ELSE 100000 + (g * 7919) % 5000000 END AS price,
+               (g * 104729) % 300000 AS mileage,
+               created_at + (g % 21) * interval '1 day' AS auction_at,
+               created_at
+        FROM (
+            SELECT g, now() - random() * (now() - (date_trunc('month', now()) - interval '{months - 1} months')) AS created_at
+            FROM generate_series(1, {rows}) AS g
+        ) AS source
+    """)
+    cursor.execute(f"ALTER TABLE {SCHEMA}.cars_plain ADD PRIMARY KEY (id)")
+
+    cursor.execute(f"CREATE TABLE {SCHEMA}.cars_part ({COLUMNS}) PARTITION BY RANGE (created_at)")
+    bounds = month_bounds(months)
+    for number, (lower, upper) in enumerate(zip(bounds, bounds[1:])):
+        cursor.execute(
+            f"CREATE UNLOGGED TABLE {SCHEMA}.cars_part_{number:03d} PARTITION OF {SCHEMA}.cars_part "
+            f"FOR VALUES FROM ({lower}) TO ({upper})"
+        )
+    cursor.execute(f"CREATE TABLE {SCHEMA}.cars_part_default PARTITION OF {SCHEMA}.cars_part DEFAULT")
+    cursor.execute(f"INSERT INTO {SCHEMA}.cars_part SELECT * FROM {SCHEMA}.cars_plain")
+    cursor.execute(f"ALTER TABLE {SCHEMA}.cars_part ADD PRIMARY KEY (id, created_at)")
+
+    for table in ('cars_plain', 'cars_part'):
+        cursor.execute(f"CREATE INDEX ON {SCHEMA}.{table} (created_at)")
+        cursor.execute(f"CREATE INDEX ON {SCHEMA}.{table} (auction_at)")
+        cursor.execute(f"VACUUM ANALYZE {SCHEMA}.{table}")
+
+
+def scanned_relations(plan):
+    """Таблицы (секции), которые план действительно читает"""
+    relations = set()
+    if plan.get('Relation Name') and plan.get('Actual Loops', 1) > 0:
+        relations.add(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        relations |= scanned_relations(child)
+    return relations
+
+
+def measure(cursor, sql, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(sql)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return statistics.median(timings), len(scanned_relations(plan[0]['Plan']))
+
+
+def measure_expiry(cursor, months):
+    """Удаление самого старого месяца: DELETE в обычной таблице и DROP секции"""
+    cutoff = month_bounds(months)[1]
+    started = time.perf_counter()
+    cursor.execute(f"DELETE FROM {SCHEMA}.cars_plain WHERE created_at < {cutoff}")
+    delete_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    cursor.execute(f"ALTER TABLE {SCHEMA}.cars_part DETACH PARTITION {SCHEMA}.cars_part_000")
+    cursor.execute(f"DROP TABLE {SCHEMA}.cars_part_000")
+    drop_ms = (time.perf_counter() - started) * 1000
+    return delete_ms, drop_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20_000_000, help="строк в каждой таблице")
+    parser.add_argument('--months', type=int, default=36, help="за сколько месяцев распределены данные")
+    parser.add_argument('--repeat', type=int, default=5, help="повторов каждого запроса")
+    parser.add_argument('--reuse', action='store_true', help="не пересоздавать таблицы")
+    parser.add_argument('--keep', action='store_true', help="не удалять схему после замеров")
+    args = parser.parse_args()
+
+    connection = setup_django()
+    with connection.cursor() as cursor:
+        if not args.reuse:
+            print(f"Заполнение таблиц: {args.rows} строк за {args.months} месяцев...")
+            started = time.perf_counter()
+            create_tables(cursor, args.rows, args.months)
+            print(f"Готово за {time.perf_counter() - started:.0f} сек")
+
+        print(f"\n{'query':<24} {'plain ms':>10} {'part ms':>10} {'speedup':>8} {'parts read':>11}")
+        for name, sql in QUERIES.items():
+            plain_ms, _ = measure(cursor, sql.format(table=f'{SCHEMA}.cars_plain'), args.repeat)
+            part_ms, parts = measure(cursor, sql.format(table=f'{SCHEMA}.cars_part'), args.repeat)
+            print(f"{name:<24} {plain_ms:>10.1f} {part_ms:>10.1f} {plain_ms / part_ms:>7.1f}x "
+                  f"{parts:>5}/{args.months + 1}")
+
+        delete_ms, drop_ms = measure_expiry(cursor, args.months)
+        print(f"\n{'expire_oldest_month':<24} {delete_ms:>10.1f} {drop_ms:>10.1f} {delete_ms / drop_ms:>7.1f}x")
+
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+
+
+if __name__ == '__main__':
+    main()
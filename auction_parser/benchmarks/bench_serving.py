@@ -0,0 +1,154 @@
+"""
+Сравнение пропускной способности runserver и gunicorn (gevent).
+
+Скрипт по очереди поднимает оба сервера на отдельных портах, нагружает
+указанные URL в несколько потоков и печатает RPS и перцентили задержки.
+Используются те же переменные окружения (.env), что и у приложения.
+
+Пример:
+    python benchmarks/bench_serving.py --duration 20 --concurrency 32
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import statistics
+import subprocess
+import threading
+import urllib.request
+from urllib.error import URLError, HTTPError
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATHS = ['/cars/ajax/', '/parser/status/']
+
+
+def server_commands(port):
+    """Команды запуска сравниваемых серверов"""
+    return {
+        'runserver': [
+            sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload',
+        ],
+        'gunicorn': [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+            '--bind', f'127.0.0.1:{port}',
+            'auction_parser.wsgi',
+        ],
+    }
+
+
+def wait_until_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/parser/status/', timeout=2).read()
+            return True
+        except HTTPError:
+            # Сервер отвечает, пусть и ошибкой - этого достаточно
+            return True
+        except (URLError, ConnectionError, OSError):
+            time.sleep(0.3)
+    return False
+
+
+def run_load(base_url, path, concurrency, duration):
+    """Нагружает один URL и возвращает (кол-во запросов, ошибки, задержки)"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker():
+        local = []
+        local_errors = 0
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(base_url + path, timeout=30) as response:
+                    response.read()
+                local.append(time.perf_counter() - started)
+            except Exception:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return len(latencies), errors[0], latencies
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def benchmark_server(name, command, port, paths, concurrency, duration):
+    env = dict(os.environ)
+    # Во время бенчмарка парсинг не запускается, но режим должен совпадать с продакшеном
+    env.setdefault('PARSER_JOBS_MODE', 'process')
+    process = subprocess.Popen(
+        command, cwd=PROJECT_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    results = []
+    try:
+        if not wait_until_ready(base_url):
+            print(f"{name}: сервер не запустился")
+            return results
+
+        for path in paths:
+            count, errors, latencies = run_load(base_url, path, concurrency, duration)
+            results.append({
+                'server': name,
+                'path': path,
+                'rps': count / duration,
+                'errors': errors,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'mean_ms': (statistics.mean(latencies) * 1000) if latencies else 0.0,
+            })
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10, help="секунд нагрузки на каждый URL")
+    parser.add_argument('--concurrency', type=int, default=16, help="количество параллельных клиентов")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--path', action='append', dest='paths', help="URL для нагрузки (можно несколько)")
+    parser.add_argument('--server', action='append', dest='servers', choices=['runserver', 'gunicorn'])
+    args = parser.parse_args()
+
+    paths = args.paths or DEFAULT_PATHS
+    commands = server_commands(args.port)
+    servers = args.servers or list(commands)
+
+    all_results = []
+    for name in servers:
+        print(f"=== {name} ===")
+        all_results += benchmark_server(
+            name, commands[name], args.port, paths, args.concurrency, args.duration
+        )
+
+    print(f"\n{'server':<10} {'path':<18} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+    for row in all_results:
+        print(f"{row['server']:<10} {row['path']:<18} {row['rps']:>9.1f} "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Холодный старт веб-процесса: время импорта, память и время до первого ответа.
+
+1. Импорт приложения так, как это делает воркер (django.setup() + URLconf),
+   под `python -X importtime`: общее время, пиковый RSS и самые тяжелые модули.
+   Для сравнения тот же замер с принудительным импортом стека парсинга (cars.tasks).
+2. Запуск gunicorn с одним воркером: время от старта до первого ответа
+   и RSS воркера после него.
+
+С --check скрипт завершается с ошибкой, если веб-процесс импортирует стек
+парсинга (requests, BeautifulSoup, NumPy и т.п.) - для проверки в CI.
+
+Пример:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --check --skip-server
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import subprocess
+import urllib.request
+from urllib.error import URLError, HTTPError
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули, которые нужны только процессам парсинга
+SCRAPING_MODULES = ('requests', 'urllib3', 'httpx', 'bs4', 'numpy', 'cars.parser', 'cars.run_parse', 'cars.tasks')
+
+IMPORT_SCRIPT = """
+import os, sys, json, time, resource
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auction_parser.settings')
+import django
+django.setup()
+import auction_parser.urls
+{extra}
+print(json.dumps({{
+    'seconds': time.perf_counter() - started,
+    'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'scraping_modules': [name for name in {modules!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure_imports(eager=False):
+    """Импорт приложения в отдельном процессе под -X importtime"""
+    script = IMPORT_SCRIPT.format(extra='import cars.tasks' if eager else '', modules=SCRAPING_MODULES)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True,
+    )
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    summary['heaviest'] = heaviest_imports(result.stderr)
+    return summary
+
+
+def heaviest_imports(importtime_output, limit=10):
+    """Пакеты верхнего уровня с наибольшим накопленным временем импорта, мс"""
+    totals = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Вложенные модули отмечены дополнительным отступом, их время уже входит в родителя
+        if not name.startswith('  '):
+            totals[name.strip()] = int(cumulative_us) / 1000
+    return sorted(totals.items(), key=lambda item: -item[1])[:limit]
+
+
+def wait_for_response(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return True
+        except HTTPError:
+            # Сервер отвечает, пусть и ошибкой - этого достаточно
+            return True
+        except (URLError, ConnectionError, OSError):
+            time.sleep(0.02)
+    return False
+
+
+def worker_rss_kb(master_pid):
+    """RSS воркеров gunicorn (дочерних процессов мастера), КБ"""
+    total = 0
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as children:
+            pids = children.read().split()
+    except OSError:
+        return None
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+def measure_server(port, path, timeout=60):
+    """Время от запуска gunicorn (1 воркер) до первого ответа и RSS воркера"""
+    env = dict(os.environ, GUNICORN_WORKERS='1')
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', 'auction_parser.wsgi'],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        if not wait_for_response(f'http://127.0.0.1:{port}{path}', timeout):
+            return None
+        first_response = time.perf_counter() - started
+        return {'first_response_seconds': first_response, 'worker_rss_kb': worker_rss_kb(process.pid)}
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--path', default='/parser/status/')
+    parser.add_argument('--skip-server', action='store_true', help="не запускать gunicorn")
+    parser.add_argument('--check', action='store_true',
+                        help="ошибка, если веб-процесс импортирует стек парсинга")
+    args = parser.parse_args()
+
+    web = measure_imports()
+    eager = measure_imports(eager=True)
+
+    print(f"{'import':<22} {'seconds':>8} {'peak RSS MB':>12}")
+    for name, result in (('web (lazy)', web), ('web + scraping stack', eager)):
+        print(f"{name:<22} {result['seconds']:>8.3f} {result['peak_rss_kb'] / 1024:>12.1f}")
+
+    print("\nСамые тяжелые импорты веб-процесса, мс:")
+    for name, milliseconds in web['heaviest']:
+        print(f"  {name:<40} {milliseconds:>8.1f}")
+
+    if not args.skip_server:
+        server = measure_server(args.port, args.path)
+        if server is None:
+            print("\ngunicorn не ответил")
+        else:
+            rss = server['worker_rss_kb']
+            print(f"\ngunicorn: первый ответ через {server['first_response_seconds']:.2f} сек, "
+                  f"RSS воркера {rss / 1024 if rss else float('nan'):.1f} МБ")
+
+    if web['scraping_modules']:
+        print(f"\nВеб-процесс импортирует стек парсинга: {', '.join(web['scraping_modules'])}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
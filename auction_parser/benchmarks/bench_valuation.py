@@ -0,0 +1,64 @@
+"""
+Скорость оценки лотов по аналогам (cars.valuation.score_lots) на синтетических данных.
+
+Генерирует N лотов (марки, модели, год, пробег, цена с шумом), затем строит
+кривые амортизации по моделям/маркам и считает z-оценки. База данных не нужна.
+
+Пример:
+    python benchmarks/bench_valuation.py --lots 1000000
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_lots(count, brands, models_per_brand, seed=0):
+    from cars.valuation import LotArrays
+
+    rng = np.random.default_rng(seed)
+    brand_codes = rng.integers(0, brands, count)
+    # Популярность моделей неравномерна: много редких моделей с парой лотов
+    model_in_brand = np.minimum(rng.zipf(1.5, count) - 1, models_per_brand - 1)
+    model_codes = brand_codes * models_per_brand + model_in_brand
+    years = rng.integers(1995, 2025, count).astype(float)
+    mileages = rng.uniform(0, 300_000, count)
+    mileages[rng.random(count) < 0.1] = np.nan
+    base = 2_000_000 * (1 + model_codes % 7)
+    prices = base * 0.9 ** (2025 - years) * (1 - 0.3 * np.nan_to_num(mileages, nan=80_000) / 300_000)
+    prices *= rng.lognormal(0, 0.15, count)
+    empty = np.full(count, np.nan)
+    return LotArrays(np.arange(count), prices, years, mileages, brand_codes, model_codes, empty, empty)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lots', type=int, default=1_000_000)
+    parser.add_argument('--brands', type=int, default=40)
+    parser.add_argument('--models-per-brand', type=int, default=150)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auction_parser.settings')
+    import django
+    django.setup()
+    from cars.valuation import score_lots, UNDERPRICED_Z
+
+    lots = synthetic_lots(args.lots, args.brands, args.models_per_brand)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        expected, zscores = score_lots(lots, current_year=2025)
+        timings.append(time.perf_counter() - started)
+
+    print(f"лотов: {args.lots}, моделей: {len(np.unique(lots.model_codes))}")
+    print(f"оценка: лучшее {min(timings):.2f} сек, худшее {max(timings):.2f} сек")
+    print(f"недооцененных (z <= {UNDERPRICED_Z}): {(zscores <= UNDERPRICED_Z).mean():.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+import re
+import inspect
+from abc import ABC, abstractmethod
+from datetime import datetime
+from urllib.parse import urlsplit
+from django.utils import timezone
+from .records import CarRecord
+from .streaming import CAR_BLOCK_CLASS
+from . import metrics
+
+# Источник по умолчанию (Car.source у лотов, сохраненных до появления адаптеров)
+DEFAULT_SOURCE = 'japantransit'
+
+
+class SiteAdapter(ABC):
+    """
+    Сайт-источник лотов: генератор URL страниц каталога, поиск блоков
+    лотов на странице и извлечение полей блока в CarRecord.
+    name записывается в Car.source и вместе с номером лота образует
+    уникальный ключ автомобиля. Общие разборщики текста (цена, марка
+    и модель, дата, объем) доступны всем адаптерам. Адаптер без
+    extract_car не создается и не регистрируется.
+    """
+
+    name = None
+    listing_url_template = None  # URL страницы каталога, {} - номер страницы
+    block_tag = 'div'
+    block_class = None  # подстрока атрибута class у блока одного лота
+
+    def __init__(self, listing_url_template=None, name=None):
+        # Переопределение адреса и имени - для зеркал и локальной замены сайта
+        if listing_url_template:
+            self.listing_url_template = listing_url_template
+        if name:
+            self.name = name
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+    @property
+    def host(self):
+        return urlsplit(self.listing_url(1)).netloc
+
+    def listing_url(self, page):
+        return self.listing_url_template.format(page)
+
+    def find_blocks(self, soup):
+        """Блоки лотов в дереве BeautifulSoup страницы"""
+        return soup.find_all(self.block_tag, class_=lambda x: x and self.block_class in x)
+
+    @abstractmethod
+    def extract_car(self, block):
+        """CarRecord из блока одного лота или None"""
+
+    def parse_price_text(self, price_text):
+        """
+        Парсит текст цены, обрабатывает все виды пробелов и специальные символы
+        """
+        if not price_text:
+            return None
+
+        print(f"    Парсим текст цены: '{price_text}'")
+        print(f"    Длина текста: {len(price_text)}")
+        print(f"    Коды символов: {[ord(c) for c in price_text]}")
+
+        # Заменяем ВСЕ виды неразрывных пробелов на обычные
+        # Unicode для разных типов неразрывных пробелов:
+        # \xa0 - NO-BREAK SPACE (самый распространенный)
+        # \u202f - NARROW NO-BREAK SPACE
+        # \u2009 - THIN SPACE
+        # \u2007 - FIGURE SPACE
+        # \u2060 - WORD JOINER
+
+        replacements = {
+            '&nbsp;': ' ',
+            '\xa0': ' ',  # NO-BREAK SPACE
+            '\u202f': ' ',  # NARROW NO-BREAK SPACE
+            '\u2009': ' ',  # THIN SPACE
+            '\u2007': ' ',  # FIGURE SPACE
+            '\u2060': ' ',  # WORD JOINER
+            '\u200a': ' ',  # HAIR SPACE
+            '\u200b': '',  # ZERO WIDTH SPACE (удаляем)
+            '\ufeff': '',  # ZERO WIDTH NO-BREAK SPACE (удаляем)
+        }
+
+        clean_text = price_text
+        for old, new in replacements.items():
+            clean_text = clean_text.replace(old, new)
+
+        print(f"    После замены пробелов: '{clean_text}'")
+
+        # Убираем тильду, приблизительные символы и валюту
+        clean_text = re.sub(r'[~≈₽рRUBруб]', '', clean_text, flags=re.IGNORECASE)
+
+        print(f"    После удаления символов: '{clean_text}'")
+
+        # Убираем ВСЕ пробелы
+        clean_text = clean_text.replace(' ', '')
+
+        print(f"    Без пробелов: '{clean_text}'")
+
+        if clean_text and clean_text.isdigit():
+            price = int(clean_text)
+            # Проверяем, что цена реалистичная
+            if 10000 <= price <= 1000000000:  # увеличил до 1 млрд
+                print(f"    ✓ Валидная цена: {price}")
+                return price
+            else:
+                print(f"    ✗ Цена не в диапазоне: {price}")
+        else:
+            print(f"    ✗ Нечисловой текст после очистки: '{clean_text}'")
+
+        return None
+
+    def split_brand_model(self, text):
+        """
+        Разделяет текст на марку и модель
+        """
+        if not text:
+            return "", ""
+
+        # Очищаем текст
+        text = re.sub(r'&nbsp;', ' ', text)
+        text = re.sub(r'\s+', ' ', text).strip()
+
+        # Специальные случаи (многословные марки)
+        special_cases = {
+            'MERCEDES-BENZ': 'MERCEDES-BENZ',
+            'LAND ROVER': 'LAND ROVER',
+            'ALFA ROMEO': 'ALFA ROMEO',
+            'ASTON MARTIN': 'ASTON MARTIN',
+        }
+
+        text_upper = text.upper()
+        for multi_brand, brand_name in special_cases.items():
+            if text_upper.startswith(multi_brand):
+                brand = brand_name
+                model = text[len(multi_brand):].strip()
+                return brand.title(), model
+
+        # Известные марки
+        known_brands = [
+            'TOYOTA', 'NISSAN', 'HONDA', 'MAZDA', 'SUBARU', 'MITSUBISHI', 'SUZUKI',
+            'DAIHATSU', 'ISUZU', 'LEXUS', 'INFINITI', 'ACURA', 'BMW', 'AUDI',
+            'VOLKSWAGEN', 'VOLVO', 'FORD', 'CHEVROLET', 'HYUNDAI', 'KIA', 'PEUGEOT',
+            'RENAULT', 'FIAT', 'JEEP', 'CHRYSLER', 'DODGE', 'CADILLAC', 'BUICK',
+        ]
+
+        for brand in known_brands:
+            if text_upper.startswith(brand):
+                brand_part = brand
+                model_part = text[len(brand):].strip()
+                return brand_part.title(), model_part
+
+        # Базовый алгоритм
+        words = text.split()
+        if len(words) == 0:
+            return "", ""
+        elif len(words) == 1:
+            return words[0], ""
+        else:
+            brand = words[0]
+            model = ' '.join(words[1:])
+            model = re.sub(r'^[\s\-–—]+', '', model).strip()
+            return brand, model
+
+    def parse_auction_date(self, text):
+        """
+        Преобразует дату аукциона с сайта ("17.01.2026", "17.01.2026 10:30")
+        в datetime с часовым поясом
+        """
+        if not text:
+            return None
+
+        text = text.strip()
+        for date_format in ('%d.%m.%Y %H:%M', '%d.%m.%Y', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+            try:
+                value = datetime.strptime(text, date_format)
+            except ValueError:
+                continue
+            return timezone.make_aware(value)
+
+        # Дата внутри текста ("Аукцион: 17.01.2026")
+        date_match = re.search(r'(\d{2})\.(\d{2})\.(\d{4})', text)
+        if date_match:
+            day, month, year = map(int, date_match.groups())
+            try:
+                return timezone.make_aware(datetime(year, month, day))
+            except ValueError:
+                return None
+
+        return None
+
+    def parse_engine_cc(self, text):
+        """
+        Извлекает объем двигателя в куб. см из текста ("1500 cc", "1 500 см3")
+        или в литрах ("1.5L", "2,0 л")
+        """
+        if not text:
+            return None
+
+        text = str(text)
+        engine_match = re.search(r'(\d{1,2}\s\d{3}|\d+)\s*(?:cc|см3|см³)', text, flags=re.IGNORECASE)
+        if engine_match:
+            return int(re.sub(r'\D', '', engine_match.group(1)))
+
+        liters_match = re.search(r'(\d+(?:[.,]\d+)?)\s*(?:l|л)\b', text, flags=re.IGNORECASE)
+        if liters_match:
+            return round(float(liters_match.group(1).replace(',', '.')) * 1000)
+        return None
+
+
+class JapanTransitAdapter(SiteAdapter):
+    """Каталог японских аукционов japantransit.ru"""
+
+    name = DEFAULT_SOURCE
+    listing_url_template = "https://japantransit.ru/auctions/?sortstat=AUCTION_DATE+asc&page={}"
+    site_url = "https://japantransit.ru"
+    block_class = CAR_BLOCK_CLASS
+
+    def extract_car(self, block):
+        """
+        Извлекает данные об одном автомобиле из блока
+        """
+        try:
+            car = CarRecord(source=self.name)
+
+            # Лот номер
+            lot_info = block.find('span', class_='font-semibold')
+            if lot_info:
+                lot_text = lot_info.get_text(strip=True)
+                car.lot_number = re.sub(r'[^\d]', '', lot_text)
+
+            # Марка и модель
+            brand_model_div = block.find('div', class_='mt-1 text-sm font-bold')
+            if brand_model_div:
+                brand_model_text = brand_model_div.get_text(strip=True)
+                car.brand, car.model = self.split_brand_model(brand_model_text)
+
+            # Дата аукциона
+            date_div = block.find('div', class_='text-darkblue')
+            if date_div:
+                car.auction_date = date_div.get_text(strip=True)
+                car.auction_at = self.parse_auction_date(car.auction_date)
+
+            # Год выпуска
+            year_span = block.find('span', class_='text-red-700')
+            if year_span:
+                year_text = year_span.get_text(strip=True)
+                year_match = re.search(r'\d{4}', year_text)
+                if year_match:
+                    car.year = int(year_match.group())
+
+            # Объем двигателя
+            engine_div = block.find('div', string=lambda x: x and 'cc' in str(x))
+            if engine_div:
+                parent_div = engine_div.parent
+                if parent_div:
+                    engine_text = parent_div.get_text()
+                    engine_match = re.search(r'(\d+)\s*cc', engine_text)
+                    if engine_match:
+                        car.engine_volume = engine_match.group(1) + ' cc'
+                        car.engine_cc = int(engine_match.group(1))
+
+            # Пробег
+            mileage_div = block.find('div', string=lambda x: x and 'км' in str(x))
+            if mileage_div:
+                mileage_text = mileage_div.get_text(strip=True)
+                mileage_match = re.search(r'([\d\s]+)\s*км', mileage_text)
+                if mileage_match:
+                    mileage_clean = mileage_match.group(1).replace(' ', '')
+                    if mileage_clean.isdigit():
+                        car.mileage = int(mileage_clean)
+
+            # ЦЕНА - УЛУЧШЕННЫЙ ПАРСИНГ
+            car.price = self.extract_price(block)
+
+            # Ссылка на аукцион
+            link = block.find('a', href=lambda x: x and '/auctions/' in x)
+            if link:
+                href = link.get('href', '')
+                if href.startswith('/'):
+                    car.lot_url = f"{self.site_url}{href}"
+                else:
+                    car.lot_url = href
+
+            # Изображения
+            images = []
+            img_links = block.find_all('a', class_=lambda x: x and 'group h-16 w-20 rounded-md' in x)
+            for img_link in img_links:
+                style = img_link.get('style', '')
+                bg_match = re.search(r"url\('([^']+)'\)", style)
+                if bg_match:
+                    images.append(bg_match.group(1))
+
+            car.images = tuple(images)
+
+            return car
+
+        except Exception as e:
+            print(f"Ошибка при парсинге блока: {e}")
+            return None
+
+    def extract_price(self, block):
+        """
+        Парсинг цены для элемента с классом rounded-full shadow-lg shadow-red-800/40
+        """
+        print("  Поиск цены в блоке...")
+
+        # Ищем конкретный элемент с ценой из вашего примера
+        price_element = block.select_one('div.rounded-full.shadow-lg.shadow-red-800\\/40')
+
+        if not price_element:
+            # Пробуем другие варианты селектора на случай если классы немного отличаются
+            price_element = block.select_one('div.rounded-full.shadow-lg')
+            if not price_element:
+                price_element = block.select_one('[class*="rounded-full"][class*="shadow-lg"]')
+
+        if price_element:
+            price_text = price_element.get_text(strip=True)
+            print(f"  Найден элемент цены: '{price_text}'")
+
+            # Обрабатываем &nbsp; и другие специальные символы
+            price = self.parse_price_text(price_text)
+
+            if price:
+                print(f"  ✓ Цена найдена: {price}")
+                return price
+            else:
+                print(f"  ✗ Не удалось распарсить цену из текста: '{price_text}'")
+
+        # Альтернативный поиск - ищем любые элементы с символом рубля
+        ruble_elements = block.find_all(text=re.compile('[₽р]'))
+        for element in ruble_elements:
+            price_text = element.strip()
+            print(f"  Найден элемент с символом рубля: '{price_text}'")
+            price = self.parse_price_text(price_text)
+            if price:
+                print(f"  ✓ Цена найдена через символ рубля: {price}")
+                return price
+
+        print("  ✗ Цена не найдена")
+        metrics.PRICE_PARSE_MISSES.inc()
+        return None
+
+
+# Зарегистрированные адаптеры: имя источника -> класс
+ADAPTERS = {
+    JapanTransitAdapter.name: JapanTransitAdapter,
+}
+
+
+def register(adapter_class):
+    """Регистрирует адаптер (можно использовать как декоратор класса)"""
+    if inspect.isabstract(adapter_class):
+        missing = ', '.join(sorted(adapter_class.__abstractmethods__))
+        raise TypeError(f"Адаптер {adapter_class.__name__} не реализует: {missing}")
+    ADAPTERS[adapter_class.name] = adapter_class
+    return adapter_class
+
+
+def get_adapter(name=None):
+    """Экземпляр адаптера по имени источника (по умолчанию - DEFAULT_SOURCE)"""
+    name = name or DEFAULT_SOURCE
+    try:
+        return ADAPTERS[name]()
+    except KeyError:
+        raise ValueError(f"Неизвестный источник: {name} (доступны: {', '.join(sorted(ADAPTERS))})")
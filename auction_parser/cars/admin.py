@@ -1,22 +1,175 @@
 from django.contrib import admin
-from .models import Car, Image, ParserLog
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import HttpResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .models import (Car, Image, ParserLog, PageCrawlStat, ThrottleState, MaintenanceJob, SavedSearch, SearchMatch,
+                     RecrawlBucketStat)
+from .lifecycle import estimated_queryset_count
+
+# Админка рассчитана на миллионы автомобилей и изображений: число строк
+# оценивается по статистике PostgreSQL, варианты фильтров кешируются,
+# поиск идет только по индексированным полям (точное совпадение или начало строки).
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор с оценкой числа строк вместо COUNT(*) по всей таблице"""
+
+    @cached_property
+    def count(self):
+        return estimated_queryset_count(self.object_list)
+
+
+class CachedValuesFilter(admin.SimpleListFilter):
+    """
+    Фильтр по значениям поля автомобиля. Список значений (DISTINCT по всей
+    таблице) строится не чаще раза в cache_seconds.
+    """
+    field = None
+    cache_seconds = 3600
+
+    def lookups(self, request, model_admin):
+        key = f'admin-filter-values:{self.field}'
+        values = cache.get(key)
+        if values is None:
+            values = list(
+                Car.objects.exclude(**{f'{self.field}__isnull': True})
+                .order_by(self.field).values_list(self.field, flat=True).distinct()
+            )
+            cache.set(key, values, self.cache_seconds)
+        return [(str(value), value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class BrandFilter(CachedValuesFilter):
+    title = "Марка"
+    parameter_name = 'brand'
+    field = 'brand'
+
+
+class YearFilter(CachedValuesFilter):
+    title = "Год выпуска"
+    parameter_name = 'year'
+    field = 'year'
+
+
+class CarBrandFilter(BrandFilter):
+    parameter_name = 'car__brand'
+
+
+class HighVolumeAdmin(admin.ModelAdmin):
+    """Общие настройки для таблиц с миллионами строк"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ['-id']
+
 
 @admin.register(Car)
-class CarAdmin(admin.ModelAdmin):
-    list_display = ['brand', 'model', 'year', 'price', 'mileage', 'lot_number']
-    list_filter = ['brand', 'year', 'created_at']
-    search_fields = ['brand', 'model', 'lot_number']
+class CarAdmin(HighVolumeAdmin):
+    list_display = ['brand', 'model', 'year', 'price', 'mileage', 'lot_number', 'source']
+    list_filter = [BrandFilter, YearFilter, 'created_at']
+    # Номер лота - по индексу, марка и модель - по началу строки (индексы UPPER(...) text_pattern_ops)
+    search_fields = ['=lot_number', '^brand', '^model']
     readonly_fields = ['created_at']
 
+
 @admin.register(Image)
-class ImageAdmin(admin.ModelAdmin):
+class ImageAdmin(HighVolumeAdmin):
     list_display = ['car', 'url']
-    list_filter = ['car__brand']
-    search_fields = ['car__brand', 'car__model', 'url']
+    list_select_related = ['car']
+    list_filter = [CarBrandFilter]
+    search_fields = ['=car__lot_number', '^car__brand', '^car__model']
+    # Выпадающий список из миллионов автомобилей в форме не строится
+    raw_id_fields = ['car']
+
 
 @admin.register(ParserLog)
 class ParserLogAdmin(admin.ModelAdmin):
-    list_display = ['url', 'status', 'cars_parsed', 'images_parsed', 'created_at']
+    list_display = ['url', 'status', 'cars_parsed', 'images_parsed', 'last_page', 'duplicate_lots',
+                    'fetch_seconds', 'parse_seconds', 'persist_seconds', 'sleep_seconds',
+                    'peak_memory_kb', 'created_at']
     list_filter = ['status', 'created_at']
-    readonly_fields = ['created_at', 'finished_at']
-    search_fields = ['url']
\ No newline at end of file
+    readonly_fields = ['created_at', 'finished_at', 'run_params', 'last_page', 'heartbeat_at',
+                       'keyless_lots', 'duplicate_lots',
+                       'fetch_seconds', 'parse_seconds', 'persist_seconds', 'sleep_seconds',
+                       'peak_memory_kb', 'profile_download', 'profile_report']
+    exclude = ['profile_data']
+    search_fields = ['url']
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name == 'cars_parserlog_changelist':
+            # Профиль и отчет (до нескольких МБ на запуск) в списке не показываются
+            queryset = queryset.defer('profile_data', 'profile_report')
+        return queryset
+
+    def get_urls(self):
+        urls = [
+            path('<int:log_id>/profile/', self.admin_site.admin_view(self.download_profile),
+                 name='cars_parserlog_profile'),
+        ]
+        return urls + super().get_urls()
+
+    @admin.display(description="Профиль cProfile")
+    def profile_download(self, obj):
+        if not obj.profile_data:
+            return "-"
+        url = reverse('admin:cars_parserlog_profile', args=[obj.id])
+        return format_html('<a href="{}">Скачать .prof</a>', url)
+
+    def download_profile(self, request, log_id):
+        """Отдает профиль запуска (открывается через pstats или snakeviz)"""
+        parser_log = get_object_or_404(ParserLog, id=log_id)
+        if not self.has_view_permission(request, parser_log) or not parser_log.profile_data:
+            raise Http404
+        response = HttpResponse(bytes(parser_log.profile_data), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="parser_log_{log_id}.prof"'
+        return response
+
+
+@admin.register(PageCrawlStat)
+class PageCrawlStatAdmin(admin.ModelAdmin):
+    list_display = ['source', 'page', 'lots_count', 'nearest_auction_at', 'crawls', 'last_crawled_at', 'last_changed_at']
+    list_filter = ['source']
+    readonly_fields = ['last_crawled_at', 'last_changed_at']
+
+
+@admin.register(RecrawlBucketStat)
+class RecrawlBucketStatAdmin(admin.ModelAdmin):
+    list_display = ['source', 'bucket', 'changes', 'exposure_hours']
+    list_filter = ['source']
+
+
+@admin.register(ThrottleState)
+class ThrottleStateAdmin(admin.ModelAdmin):
+    list_display = ['host', 'delay', 'concurrency', 'good_delay', 'good_concurrency', 'updated_at']
+
+
+@admin.register(MaintenanceJob)
+class MaintenanceJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'processed', 'total', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['kind', 'status', 'processed', 'total', 'message', 'created_at', 'finished_at']
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'brand', 'year_from', 'year_to', 'price_from', 'price_to',
+                    'mileage_from', 'mileage_to', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['name', 'brand']
+
+
+@admin.register(SearchMatch)
+class SearchMatchAdmin(HighVolumeAdmin):
+    list_display = ['search', 'car', 'matched_at']
+    list_select_related = ['search', 'car']
+    raw_id_fields = ['search', 'car']
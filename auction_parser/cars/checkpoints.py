@@ -0,0 +1,140 @@
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import ParserLog, PageCheckpoint
+
+# Как часто процесс запуска отмечается в ParserLog.heartbeat_at, сек
+HEARTBEAT_INTERVAL = 30
+
+
+class RunProgress:
+    """
+    Состояние многостраничного запуска, восстановленное по контрольным точкам:
+    сохраненные страницы и частичные итоги. Для нового запуска пустое.
+    """
+
+    def __init__(self, pages=None):
+        self.pages = pages or {}  # {страница: (автомобили, изображения)}
+
+    @classmethod
+    def load(cls, parser_log):
+        if parser_log is None:
+            return cls()
+        rows = PageCheckpoint.objects.filter(parser_log=parser_log).values_list('page', 'cars', 'images')
+        return cls({page: (cars, images) for page, cars, images in rows})
+
+    def __contains__(self, page):
+        return page in self.pages
+
+    def __len__(self):
+        return len(self.pages)
+
+    def counts(self, page):
+        return self.pages[page]
+
+    def record(self, page, cars, images):
+        self.pages[page] = (cars, images)
+
+    @property
+    def totals(self):
+        """(автомобили, изображения, непустые страницы) по сохраненным страницам"""
+        cars = sum(cars for cars, images in self.pages.values())
+        images = sum(images for cars, images in self.pages.values())
+        successful = sum(1 for cars, images in self.pages.values() if cars or images)
+        return cars, images, successful
+
+
+def commit_page(parser_log, page, store):
+    """
+    Сохраняет страницу и ее контрольную точку одной транзакцией.
+    store() записывает данные страницы и возвращает (автомобили, изображения).
+    Если страница уже учтена (например, ее сохранил параллельно запущенный
+    экземпляр), данные откатываются и возвращается None.
+    """
+    with transaction.atomic():
+        checkpoint, created = PageCheckpoint.objects.select_for_update().get_or_create(
+            parser_log=parser_log, page=page,
+        )
+        if not created:
+            transaction.set_rollback(True)
+            return None
+
+        cars, images = store()
+        checkpoint.cars = cars
+        checkpoint.images = images
+        checkpoint.save(update_fields=['cars', 'images'])
+        # Частичные итоги видны в статусе запуска сразу после сохранения страницы
+        ParserLog.objects.filter(pk=parser_log.pk).update(
+            cars_parsed=F('cars_parsed') + cars,
+            images_parsed=F('images_parsed') + images,
+            last_page=Greatest(Coalesce('last_page', Value(0)), Value(page)),
+            heartbeat_at=timezone.now(),
+        )
+    return cars, images
+
+
+def reset_totals(parser_log):
+    """Приводит частичные итоги лога к сумме по контрольным точкам (перед продолжением)"""
+    totals = PageCheckpoint.objects.filter(parser_log=parser_log).aggregate(
+        cars=Sum('cars'), images=Sum('images'),
+    )
+    parser_log.cars_parsed = totals['cars'] or 0
+    parser_log.images_parsed = totals['images'] or 0
+
+
+class Heartbeat:
+    """
+    Поток, периодически отмечающий в ParserLog, что процесс запуска жив.
+    По отсутствию отметок stale_runs() находит запуски, процесс которых погиб.
+    """
+
+    def __init__(self, log_id, interval=HEARTBEAT_INTERVAL):
+        self.log_id = log_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.beat()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=self.interval)
+
+    def beat(self):
+        ParserLog.objects.filter(pk=self.log_id, status='running').update(heartbeat_at=timezone.now())
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    self.beat()
+                except Exception as e:
+                    print(f"Ошибка при отметке процесса парсинга: {e}")
+        finally:
+            # У потока свое подключение к БД
+            connection.close()
+
+
+def stale_runs(stale_seconds=None):
+    """Запуски со статусом 'running', процесс которых давно не подавал сигнал"""
+    stale_seconds = stale_seconds if stale_seconds is not None else settings.PARSER_STALE_SECONDS
+    threshold = timezone.now() - timedelta(seconds=stale_seconds)
+    return ParserLog.objects.filter(status='running').filter(
+        Q(heartbeat_at__lt=threshold) | Q(heartbeat_at__isnull=True, created_at__lt=threshold)
+    )
+
+
+def mark_stale_runs(stale_seconds=None):
+    """Отмечает зависшие запуски прерванными, возвращает их количество"""
+    return stale_runs(stale_seconds).update(
+        status='interrupted',
+        finished_at=timezone.now(),
+        error_message='Процесс парсинга перестал отвечать',
+    )
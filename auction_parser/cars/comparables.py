@@ -0,0 +1,256 @@
+import heapq
+import threading
+import time
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from .models import Car
+
+# Признаки аналога: год, пробег и объем двигателя. Деление на масштаб приводит
+# их к одной шкале: 1 год разницы ~ 20 000 км ~ 250 куб. см
+FEATURES = ('year', 'mileage', 'engine_cc')
+FEATURE_SCALES = np.array([1.0, 20_000.0, 250.0])
+# Точек в листе KD-дерева: лист просматривается одной векторной операцией
+LEAF_SIZE = 64
+# Полная перестройка индекса процесса (удаленные лоты инкрементально не видны), сек
+FULL_REBUILD_SECONDS = 3600
+# Дочитывание изменений захватывает и чуть более ранние записи: транзакция
+# страницы могла завершиться позже, чем выставила updated_at
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+class KDTree:
+    """
+    KD-дерево над точками (n, d) на массивах NumPy. Узлы делятся по медиане
+    вдоль измерения с наибольшим разбросом, у каждого узла хранится ограничивающий
+    прямоугольник. Поиск k ближайших идет от ближайших узлов (куча) и
+    заканчивается, когда прямоугольники дальше k-го найденного соседа.
+    """
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        points = np.asarray(points, dtype=float)
+        self.order = np.arange(len(points))  # номер исходной точки по позиции в дереве
+        self.starts, self.ends, self.children = [], [], []
+        lows, highs = [], []
+        if len(points):
+            self._build(points, 0, len(points), leaf_size, lows, highs)
+        self.points = points[self.order]
+        self.lows = np.array(lows)
+        self.highs = np.array(highs)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, points, start, end, leaf_size, lows, highs):
+        node = len(self.starts)
+        chunk = points[self.order[start:end]]
+        lows.append(chunk.min(axis=0))
+        highs.append(chunk.max(axis=0))
+        self.starts.append(start)
+        self.ends.append(end)
+        self.children.append(None)
+
+        spread = highs[node] - lows[node]
+        if end - start > leaf_size and spread.max() > 0:
+            dim = int(np.argmax(spread))
+            middle = (end - start) // 2
+            part = np.argpartition(chunk[:, dim], middle)
+            self.order[start:end] = self.order[start:end][part]
+            left = self._build(points, start, start + middle, leaf_size, lows, highs)
+            right = self._build(points, start + middle, end, leaf_size, lows, highs)
+            self.children[node] = (left, right)
+        return node
+
+    def box_distance(self, node, point):
+        gap = np.maximum(self.lows[node] - point, 0) + np.maximum(point - self.highs[node], 0)
+        return float(np.sqrt(gap @ gap))
+
+    def query(self, point, k):
+        """(расстояния, номера исходных точек) k ближайших к point, по возрастанию расстояния"""
+        best_distances = np.empty(0)
+        best_positions = np.empty(0, dtype=np.int64)
+        if not len(self) or k <= 0:
+            return best_distances, best_positions
+
+        point = np.asarray(point, dtype=float)
+        heap = [(0.0, 0)]
+        while heap:
+            bound, node = heapq.heappop(heap)
+            if len(best_distances) == k and bound > best_distances[-1]:
+                break
+            children = self.children[node]
+            if children is None:
+                start, end = self.starts[node], self.ends[node]
+                offsets = self.points[start:end] - point
+                distances = np.concatenate([best_distances, np.sqrt(np.einsum('ij,ij->i', offsets, offsets))])
+                positions = np.concatenate([best_positions, np.arange(start, end)])
+                nearest = np.argsort(distances, kind='stable')[:k]
+                best_distances, best_positions = distances[nearest], positions[nearest]
+            else:
+                for child in children:
+                    heapq.heappush(heap, (self.box_distance(child, point), child))
+        return best_distances, self.order[best_positions]
+
+
+class ModelGroup:
+    """
+    Лоты одной пары (марка, модель) с ценой: признаки и KD-дерево по ним.
+    Пропуски признака заменяются медианой группы - так же и у искомого лота.
+    """
+
+    def __init__(self, ids, prices, features):
+        self.ids = ids
+        self.prices = prices
+        self.features = features  # исходные значения, NaN - не указано
+        known = ~np.isnan(features)
+        self.fill = np.array([
+            np.median(features[known[:, column], column]) if known[:, column].any() else 0.0
+            for column in range(features.shape[1])
+        ])
+        self.tree = KDTree(self.normalize(features))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def normalize(self, features):
+        return np.where(np.isnan(features), self.fill, features) / FEATURE_SCALES
+
+
+class ComparablesIndex:
+    """
+    Индекс аналогов: по KD-дереву на каждую пару (марка, модель).
+    update() принимает новые и изменившиеся лоты и перестраивает только
+    затронутые группы (марка и модель у сохраненного лота не меняются).
+    Группы после построения не меняются, поэтому copy() разделяет их
+    с исходным индексом.
+    """
+
+    def __init__(self):
+        self.groups = {}  # (марка, модель) -> ModelGroup
+
+    def __len__(self):
+        return sum(len(group) for group in self.groups.values())
+
+    def copy(self):
+        """Индекс с теми же группами: его update() не затрагивает исходный"""
+        index = ComparablesIndex()
+        index.groups = dict(self.groups)
+        return index
+
+    def update(self, rows):
+        """
+        rows - [(id, марка, модель, год, пробег, объем, цена)].
+        Лоты без цены удаляются из индекса. Возвращает число перестроенных групп.
+        """
+        if not rows:
+            return 0
+        ids, brands, models, years, mileages, engines, prices = zip(*rows)
+        keys = {}
+        codes = np.fromiter(
+            (keys.setdefault(key, len(keys)) for key in zip(brands, models)),
+            dtype=np.int64, count=len(rows),
+        )
+        ids = np.array(ids, dtype=np.int64)
+        prices = np.array(prices, dtype=float)  # None -> NaN
+        features = np.column_stack([
+            np.array(years, dtype=float), np.array(mileages, dtype=float), np.array(engines, dtype=float),
+        ])
+
+        order = np.argsort(codes, kind='stable')
+        parts = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1)
+        for key, part in zip(keys, parts):
+            usable = part[prices[part] > 0]
+            group_ids, group_prices, group_features = ids[usable], prices[usable], features[usable]
+            group = self.groups.get(key)
+            if group is not None:
+                keep = ~np.isin(group.ids, ids[part])
+                group_ids = np.concatenate([group.ids[keep], group_ids])
+                group_prices = np.concatenate([group.prices[keep], group_prices])
+                group_features = np.concatenate([group.features[keep], group_features])
+            if len(group_ids):
+                self.groups[key] = ModelGroup(group_ids, group_prices, group_features)
+            else:
+                self.groups.pop(key, None)
+        return len(parts)
+
+    def query(self, brand, model, year, mileage=None, engine_cc=None, k=10, exclude_id=None):
+        """k ближайших лотов той же марки и модели: [(id, цена, расстояние)]"""
+        group = self.groups.get((brand, model))
+        if group is None:
+            return []
+        point = group.normalize(np.array([[year, mileage, engine_cc]], dtype=float))[0]
+        distances, positions = group.tree.query(point, k + (exclude_id is not None))
+        found = [
+            (int(group.ids[position]), float(group.prices[position]), float(distance))
+            for distance, position in zip(distances, positions)
+            if group.ids[position] != exclude_id
+        ]
+        return found[:k]
+
+
+def load_rows(since=None):
+    """Лоты для индекса одним запросом: все с ценой или все изменившиеся с момента since"""
+    queryset = Car.objects.order_by()
+    if since is None:
+        queryset = queryset.filter(price__gt=0)
+    else:
+        queryset = queryset.filter(updated_at__gte=since)
+    queryset = queryset.values_list('id', 'brand', 'model', *FEATURES, 'price')
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+_lock = threading.Lock()
+_index = None
+_watermark = None  # updated_at, до которого изменения уже в индексе
+_built_at = None
+_checked_at = None
+
+
+def current_index():
+    """
+    Индекс аналогов процесса. Строится при первом обращении, затем не чаще
+    раза в COMPARABLES_REFRESH_SECONDS дочитывает лоты, изменившиеся после
+    прошлой проверки (после парсинга - новые и обновленные), и раз в
+    FULL_REBUILD_SECONDS перестраивается целиком. Пока один поток обновляет
+    индекс, остальные отвечают по предыдущей версии: обновление строится
+    на копии и подменяет индекс процесса целиком, когда готово.
+    """
+    global _index, _watermark, _built_at, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < settings.COMPARABLES_REFRESH_SECONDS:
+        return _index
+    if not _lock.acquire(blocking=_index is None):
+        return _index
+    try:
+        if _index is not None and now - _checked_at < settings.COMPARABLES_REFRESH_SECONDS:
+            return _index
+        # Отметка берется до чтения: записанное во время чтения попадет в следующую проверку
+        watermark = Car.objects.aggregate(latest=Max('updated_at'))['latest']
+        if _index is None or now - _built_at > FULL_REBUILD_SECONDS:
+            index = ComparablesIndex()
+            started = time.perf_counter()
+            index.update(load_rows())
+            print(f"Индекс аналогов построен: {len(index)} лотов, {len(index.groups)} моделей, "
+                  f"{time.perf_counter() - started:.2f} сек")
+            _index, _built_at = index, now
+        elif _watermark is not None:
+            index = _index.copy()
+            index.update(load_rows(since=_watermark - WATERMARK_OVERLAP))
+            _index = index
+        _watermark = watermark or _watermark
+        _checked_at = now
+        return _index
+    finally:
+        _lock.release()
+
+
+def reset():
+    """Сбрасывает индекс процесса: следующее обращение построит его заново"""
+    global _index, _watermark, _built_at, _checked_at
+    with _lock:
+        _index = _watermark = _built_at = _checked_at = None
@@ -0,0 +1,177 @@
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DatabaseError, connections
+from . import metrics
+
+# Чтение с реплики (DATABASE_REPLICA_HOST) для представлений только на чтение.
+# Представление разрешает реплику атрибутом replica_reads = True; остальные
+# запросы, все записи, процессы парсинга и миграции работают с основной БД.
+# После POST пользователь на REPLICA_STICKY_SECONDS закрепляется за основной
+# БД (cookie), чтобы сразу видеть результат своего действия. При отставании
+# реплики больше REPLICA_MAX_LAG_SECONDS или ее недоступности чтение идет
+# с основной БД.
+
+REPLICA_ALIAS = 'replica'
+STICKY_COOKIE = 'db_primary_pinned'
+# Как часто перепроверяется состояние реплики, сек
+HEALTH_CHECK_INTERVAL = 5
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Чтение моделей внутри блока идет с реплики (если она настроена и в порядке)"""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def raise_replica_error(error):
+    """
+    Представления с replica_reads отвечают на свои ошибки JSON-ом; ошибка БД
+    при чтении с реплики пробрасывается дальше, чтобы ReplicaRoutingMiddleware
+    вывел реплику из работы и повторил представление с основной БД
+    """
+    if isinstance(error, DatabaseError) and _replica_reads.get():
+        raise error
+
+
+class ReplicaHealth:
+    """
+    Состояние реплики, общее для процесса: отставание проверяется не чаще
+    раза в HEALTH_CHECK_INTERVAL, ошибка запроса выводит реплику из работы
+    до следующей проверки
+    """
+
+    def __init__(self):
+        self.healthy = True
+        self.reason = None
+        self.lag = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= HEALTH_CHECK_INTERVAL:
+            with self._lock:
+                if self.checked_at is None or now - self.checked_at >= HEALTH_CHECK_INTERVAL:
+                    self.check()
+        return self.healthy
+
+    def check(self):
+        try:
+            self.lag = replica_lag()
+        except DatabaseError as e:
+            self.mark_failed(e)
+            return
+        self.healthy = self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+        self.reason = None if self.healthy else 'lag'
+        self.checked_at = time.monotonic()
+        metrics.REPLICA_LAG_SECONDS.set(self.lag)
+
+    def mark_failed(self, error):
+        print(f"Реплика БД недоступна, чтение идет с основной БД: {error}")
+        self.healthy = False
+        self.reason = 'error'
+        self.checked_at = time.monotonic()
+
+
+replica_health = ReplicaHealth()
+
+
+def replica_lag():
+    """Отставание реплики в секундах (для СУБД без репликации - 0)"""
+    connection = connections[REPLICA_ALIAS]
+    if connection.vendor != 'postgresql':
+        connection.ensure_connection()
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+class ReplicaRouter:
+    """Чтение - с реплики, если текущий запрос это разрешает; запись и миграции - в основную БД"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured() and replica_health.available():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной БД, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Включает чтение с реплики для представлений с replica_reads = True
+    и закрепляет пользователя за основной БД после изменяющих запросов
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and replica_configured():
+            # Чтение своих записей: следующие запросы пользователя - с основной БД
+            response.set_cookie(STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if not getattr(view_class, 'replica_reads', False) or not replica_configured():
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if STICKY_COOKIE in request.COOKIES:
+            metrics.REPLICA_FALLBACKS.labels('sticky').inc()
+            return None
+        if not replica_health.available():
+            metrics.REPLICA_FALLBACKS.labels(replica_health.reason).inc()
+            return None
+        _replica_reads.set(True)
+        request.replica_view = (view_func, view_args, view_kwargs)
+        return None
+
+    def process_exception(self, request, exception):
+        """Реплика отказала посреди запроса: повторяем представление с основной БД"""
+        replica_view = getattr(request, 'replica_view', None)
+        if replica_view is None or not isinstance(exception, DatabaseError):
+            return None
+        replica_health.mark_failed(exception)
+        metrics.REPLICA_FALLBACKS.labels('error').inc()
+        request.replica_view = None
+        view_func, view_args, view_kwargs = replica_view
+        with replica_reads(False):
+            return view_func(request, *view_args, **view_kwargs)
@@ -0,0 +1,191 @@
+import re
+import hashlib
+import threading
+from django.db import connection, transaction
+from django.db.models import Count, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+from .models import Car, Image
+from . import metrics
+
+# Поля, которые переносятся в оставляемый автомобиль с самой свежей копии
+MERGED_FIELDS = ('price', 'lot_url', 'engine_volume', 'engine_cc', 'auction_date', 'auction_at')
+
+
+def natural_key(brand, model, year, mileage, auction_at, auction_date, first_image):
+    """
+    Хеш естественного ключа лота: марка, модель, год, пробег, дата аукциона
+    и первое изображение. Без марки или года ключ не строится (None).
+    """
+    if not brand or not year:
+        return None
+
+    def normalize(value):
+        return re.sub(r'\s+', ' ', str(value or '')).strip().upper()
+
+    auction = auction_at.date().isoformat() if auction_at else normalize(auction_date)
+    parts = (normalize(brand), normalize(model), str(year), str(mileage or ''), auction, (first_image or '').strip())
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def record_key(record):
+    """Естественный ключ записи CarRecord"""
+    return natural_key(
+        record.brand, record.model, record.year, record.mileage, record.auction_at,
+        record.auction_date, record.images[0] if record.images else None,
+    )
+
+
+def existing_by_key(records):
+    """
+    Уже сохраненные автомобили для записей без номера лота: {(источник, ключ): Car}.
+    Один запрос по индексу natural_key на всю пачку; при нескольких
+    совпадениях берется самый ранний автомобиль.
+    """
+    keys = {record_key(record) for record in records if not record.lot_number} - {None}
+    if not keys:
+        return {}
+    known = {}
+    for car in Car.objects.filter(natural_key__in=keys).order_by('id'):
+        known.setdefault((car.source, car.natural_key), car)
+    return known
+
+
+def lock_lot(source, lot_number):
+    """
+    Блокировка номера лота до конца транзакции (PostgreSQL). Уникальность
+    (source, lot_number) держит ограничение car_source_lot_unique, но после
+    секционирования таблицы (cars.partitioning) оно становится обычным
+    индексом, и параллельные вставки одного лота разводит эта блокировка.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f"{source}:{lot_number}"])
+
+
+class DedupeStats:
+    """
+    Счетчики за запуск: сколько лотов пришло без номера и сколько
+    из них оказались повторами уже сохраненных
+    """
+
+    def __init__(self):
+        self.keyless = 0
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    def record(self, keyless, duplicates):
+        with self._lock:
+            self.keyless += keyless
+            self.duplicates += duplicates
+        metrics.KEYLESS_LOTS.labels('duplicate').inc(duplicates)
+        metrics.KEYLESS_LOTS.labels('new').inc(keyless - duplicates)
+
+    @property
+    def rate(self):
+        return round(self.duplicates / self.keyless, 3) if self.keyless else 0.0
+
+    def as_dict(self):
+        return {'keyless': self.keyless, 'duplicates': self.duplicates, 'rate': self.rate}
+
+    def apply_to(self, parser_log):
+        """Переносит счетчики в поля ParserLog (без сохранения)"""
+        parser_log.keyless_lots = self.keyless
+        parser_log.duplicate_lots = self.duplicates
+
+
+def backfill_keys(batch_size=2000, progress=None):
+    """
+    Заполняет natural_key у автомобилей, сохраненных до появления ключа.
+    Пагинация по первичному ключу, bulk_update пачками.
+    """
+    first_image = Image.objects.filter(car_id=OuterRef('pk')).order_by('id').values('url')[:1]
+    pending = Car.objects.filter(natural_key__isnull=True).order_by('pk')
+    last_pk = 0
+    updated = 0
+    while True:
+        batch = list(
+            pending.filter(pk__gt=last_pk)
+            .only('pk', 'brand', 'model', 'year', 'mileage', 'auction_at', 'auction_date')
+            .annotate(first_image=Subquery(first_image))[:batch_size]
+        )
+        if not batch:
+            break
+        for car in batch:
+            car.natural_key = natural_key(car.brand, car.model, car.year, car.mileage,
+                                          car.auction_at, car.auction_date, car.first_image)
+        Car.objects.bulk_update(batch, ['natural_key'])
+        last_pk = batch[-1].pk
+        updated += len(batch)
+        if progress:
+            progress(updated)
+    return updated
+
+
+def merge_duplicates(batch_size=500, dry_run=False, progress=None):
+    """
+    Объединяет сохраненные копии лотов без номера с одинаковым ключом
+    (в пределах одного источника).
+    Остается самый ранний автомобиль: он получает значения MERGED_FIELDS
+    самой свежей копии и ее изображения (без повторов URL), остальные
+    копии удаляются. Каждые batch_size ключей - отдельная транзакция.
+    Возвращает (групп копий, удаленных автомобилей).
+    """
+    groups = (
+        Car.objects.filter(natural_key__isnull=False, lot_number__isnull=True)
+        .values('source', 'natural_key')
+        .annotate(copies=Count('id'), keep_id=Min('id'))
+        .filter(copies__gt=1)
+        .order_by('natural_key', 'source')
+    )
+    merged_groups = 0
+    removed = 0
+    last_key, last_source = '', ''
+    while True:
+        batch = list(groups.filter(
+            Q(natural_key__gt=last_key) | Q(natural_key=last_key, source__gt=last_source)
+        )[:batch_size])
+        if not batch:
+            break
+        last_key, last_source = batch[-1]['natural_key'], batch[-1]['source']
+
+        if dry_run:
+            merged_groups += len(batch)
+            removed += sum(group['copies'] - 1 for group in batch)
+            continue
+
+        with transaction.atomic():
+            for group in batch:
+                removed += merge_group(group['source'], group['natural_key'], group['keep_id'])
+        merged_groups += len(batch)
+        if progress:
+            progress(merged_groups, removed)
+    return merged_groups, removed
+
+
+def merge_group(source, key, keep_id):
+    """Сливает копии одного ключа источника в автомобиль keep_id, возвращает число удаленных"""
+    copies = list(Car.objects.filter(source=source, natural_key=key, lot_number__isnull=True).order_by('id'))
+    keep = next(car for car in copies if car.id == keep_id)
+    duplicates = [car for car in copies if car.id != keep_id]
+
+    newest = duplicates[-1]
+    changed = [field for field in MERGED_FIELDS
+               if getattr(newest, field) is not None and getattr(newest, field) != getattr(keep, field)]
+    for field in changed:
+        setattr(keep, field, getattr(newest, field))
+    if changed:
+        keep.save(update_fields=changed + ['updated_at'])
+
+    duplicate_ids = [car.id for car in duplicates]
+    known_urls = set(Image.objects.filter(car_id=keep_id).values_list('url', flat=True))
+    move_ids = []
+    for image_id, url in Image.objects.filter(car_id__in=duplicate_ids).order_by('id').values_list('id', 'url'):
+        if url not in known_urls:
+            known_urls.add(url)
+            move_ids.append(image_id)
+    Image.objects.filter(id__in=move_ids).update(car_id=keep_id, created_at=keep.created_at)
+    if move_ids and not changed:
+        Car.objects.filter(id=keep_id).update(updated_at=timezone.now())
+    Car.objects.filter(id__in=duplicate_ids).delete()
+    return len(duplicate_ids)
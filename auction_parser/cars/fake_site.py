@@ -0,0 +1,156 @@
+"""
+Локальная замена сайта аукциона для тестов и бенчмарков.
+
+Отдает страницы каталога в той же разметке, что разбирает
+AuctionParser.extract_car_from_block: заданное число страниц с lots
+лотами, дальше - пустые страницы (конец каталога). Можно добавить
+задержку ответа и долю ответов 503 для проверки повторов.
+
+Запуск отдельно:
+    python -m cars.fake_site --port 8800 --pages 20 --latency-ms 50
+"""
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOT_TEMPLATE = """
+<div class="flex flex-col md:table-row-group border">
+ <span class="font-semibold">Лот {lot}</span>
+ <div class="mt-1 text-sm font-bold">{brand} MODEL{model}</div>
+ <div class="text-darkblue">{day:02d}.01.2026</div>
+ <span class="text-red-700">{year} г.</span>
+ <div><div>{engine} cc</div></div>
+ <div>{mileage} км</div>
+ <div class="rounded-full shadow-lg shadow-red-800/40">{price}&nbsp;000 ₽</div>
+ <a href="/auctions/?id={lot}">lot</a>
+ {images}
+</div>
+"""
+IMAGE_TEMPLATE = (
+    '<a class="group h-16 w-20 rounded-md" '
+    'style="background-image: url(\'https://img.example/{lot}/{index}.jpg\')"></a>'
+)
+BRANDS = ('TOYOTA', 'NISSAN', 'HONDA', 'MAZDA', 'SUBARU', 'LEXUS')
+IMAGES_PER_LOT = 6
+
+
+def synthetic_page(page, lots, padding_kb=0):
+    """Страница каталога: lots блоков лотов и «обвязка» сайта примерно на padding_kb КБ"""
+    blocks = []
+    for number in range(lots):
+        lot = page * 1000 + number
+        images = ''.join(IMAGE_TEMPLATE.format(lot=lot, index=index) for index in range(IMAGES_PER_LOT))
+        blocks.append(LOT_TEMPLATE.format(
+            lot=lot, brand=BRANDS[lot % len(BRANDS)], model=lot % 97, day=1 + lot % 28,
+            year=2000 + lot % 24, engine=1000 + lot % 30 * 100, mileage=lot % 200 * 1000,
+            price=300 + lot % 900, images=images,
+        ))
+    padding = '<div class="menu"><a href="/x">пункт меню</a></div>' * (padding_kb * 1024 // 50)
+    return f"<html><body>{padding}{''.join(blocks)}</body></html>"
+
+
+class FakeAuctionSite:
+    """
+    HTTP-сервер каталога в отдельном потоке.
+    base_url подставляется в MultiPageParser вместо адреса настоящего сайта.
+    """
+
+    def __init__(self, pages=10, lots=50, latency=0.0, error_rate=0.0, padding_kb=0, port=0, seed=0):
+        self.pages = pages
+        self.lots = lots
+        self.latency = latency  # секунды на ответ
+        self.error_rate = error_rate  # доля ответов 503
+        self.padding_kb = padding_kb
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = site.respond(self.path)
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}/auctions/?sortstat=AUCTION_DATE+asc&page={{}}"
+
+    @property
+    def total_lots(self):
+        return self.pages * self.lots
+
+    def respond(self, path):
+        """(статус, тело) ответа на запрос страницы каталога"""
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            return 503, b'Service Unavailable'
+
+        url = urlsplit(path)
+        if url.path.rstrip('/') != '/auctions':
+            return 404, b'Not Found'
+        try:
+            page = int(parse_qs(url.query).get('page', ['1'])[0])
+        except ValueError:
+            return 400, b'Bad Request'
+        lots = self.lots if 1 <= page <= self.pages else 0
+        return 200, synthetic_page(page, lots, self.padding_kb).encode('utf-8')
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--lots', type=int, default=50, help="лотов на странице")
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0, help="доля ответов 503 (0..1)")
+    parser.add_argument('--padding-kb', type=int, default=0, help="размер остальной разметки страницы, КБ")
+    args = parser.parse_args()
+
+    site = FakeAuctionSite(args.pages, args.lots, args.latency_ms / 1000, args.error_rate,
+                           args.padding_kb, port=args.port)
+    print(f"Каталог: {site.base_url.format(1)}")
+    try:
+        site.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import subprocess
+from django.conf import settings
+
+# Тонкий интерфейс постановки задач для веб-процесса. Стек парсинга
+# (cars.tasks) здесь не импортируется: в режиме 'process' задача уходит
+# в отдельный процесс manage.py, в режиме 'thread' модуль подключается
+# при первом запуске задачи.
+
+
+def start_single_page_job(url, log_id):
+    """
+    Запускает парсинг одной страницы в фоне
+    """
+    if settings.PARSER_JOBS_MODE == 'process':
+        return _spawn_job_process(['--log-id', str(log_id), '--url', url])
+
+    from .tasks import run_single_page_job
+    thread = threading.Thread(target=run_single_page_job, args=(url, log_id))
+    thread.daemon = True
+    thread.start()
+
+
+def start_multi_page_job(start_page, end_page, log_id):
+    """
+    Запускает многостраничный парсинг в фоне
+    """
+    if settings.PARSER_JOBS_MODE == 'process':
+        args = ['--log-id', str(log_id), '--start-page', str(start_page)]
+        if end_page:
+            args += ['--end-page', str(end_page)]
+        return _spawn_job_process(args)
+
+    from .tasks import run_multi_page_job
+    thread = threading.Thread(target=run_multi_page_job, args=(start_page, end_page, log_id))
+    thread.daemon = True
+    thread.start()
+
+
+def start_resume_job(log_id):
+    """
+    Продолжает прерванный многостраничный парсинг в фоне
+    """
+    if settings.PARSER_JOBS_MODE == 'process':
+        return _spawn_job_process(['--log-id', str(log_id), '--resume'])
+
+    from .tasks import run_resume_job
+    thread = threading.Thread(target=run_resume_job, args=(log_id,))
+    thread.daemon = True
+    thread.start()
+
+
+def start_maintenance_job(job_id):
+    """
+    Запускает задачу обслуживания данных в фоне, чтобы не держать запрос
+    """
+    if settings.PARSER_JOBS_MODE == 'process':
+        return _spawn_job_process(['--job-id', str(job_id)], command='purge_data')
+
+    from .tasks import run_maintenance_job
+    thread = threading.Thread(target=run_maintenance_job, args=(job_id,))
+    thread.daemon = True
+    thread.start()
+
+
+def _spawn_job_process(args, command='run_parser_job'):
+    """
+    Запускает задачу отдельным процессом manage.py, не привязанным к воркеру
+    """
+    manage_py = os.path.join(settings.BASE_DIR, 'manage.py')
+    process = subprocess.Popen(
+        [sys.executable, manage_py, command, *args],
+        cwd=settings.BASE_DIR,
+        stdin=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    # Завершившийся процесс забирается через wait(), иначе он остается зомби
+    # в воркере до его перезапуска
+    reaper = threading.Thread(target=process.wait, name=f'reap-{process.pid}')
+    reaper.daemon = True
+    reaper.start()
+    return process.pid
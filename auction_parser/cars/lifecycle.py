@@ -0,0 +1,145 @@
+import os
+import gzip
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from .models import (Car, Image, ParserLog, PageCheckpoint, PageCrawlStat, SearchMatch, LotCrawlStat,
+                     RecrawlBucketStat)
+
+# Таблицы, которые очищаются полностью (статистика переобхода тоже, иначе
+# --adaptive сочтет известные лоты недавно проверенными и не заполнит базу заново).
+# Сохраненные поиски остаются, их совпадения удаляются вместе с лотами
+PURGE_MODELS = (SearchMatch, Image, Car, PageCheckpoint, ParserLog, PageCrawlStat, LotCrawlStat, RecrawlBucketStat)
+# Ниже этой оценки строк запроса считается точно (estimated_queryset_count)
+EXACT_COUNT_BELOW = 10000
+
+
+def estimated_count(model):
+    """
+    Количество строк в таблице. На PostgreSQL - оценка из статистики
+    планировщика (COUNT(*) на миллионах строк - полный проход по таблице).
+    У секционированной таблицы (manage_partitions) складываются оценки секций.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT CASE WHEN c.relkind = 'p' THEN ("
+                "    SELECT COALESCE(SUM(GREATEST(part.reltuples, 0)), -1)::bigint FROM pg_inherits i"
+                "    JOIN pg_class part ON part.oid = i.inhrelid WHERE i.inhparent = c.oid"
+                ") ELSE c.reltuples::bigint END FROM pg_class c WHERE c.oid = %s::regclass",
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    return model.objects.count()
+
+
+def estimated_queryset_count(queryset, exact_below=EXACT_COUNT_BELOW):
+    """
+    Количество строк запроса для постраничного вывода: без фильтров - оценка
+    по таблице, с фильтрами на PostgreSQL - оценка планировщика (EXPLAIN).
+    Точный COUNT(*) выполняется, только если оценка меньше exact_below.
+    """
+    db = connections[queryset.db]
+    if db.vendor != 'postgresql':
+        return queryset.count()
+
+    if not queryset.query.where:
+        estimate = estimated_count(queryset.model)
+    else:
+        sql, params = queryset.query.sql_with_params()
+        with db.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+    return estimate if estimate >= exact_below else queryset.count()
+
+
+def purge_all():
+    """
+    Полная очистка данных парсера.
+    На PostgreSQL - один TRUNCATE ... CASCADE вместо поштучного удаления
+    через ORM, на остальных СУБД - DELETE без загрузки ключей в Python.
+    Возвращает оценку количества удаленных строк по таблицам.
+    """
+    counts = {model._meta.model_name: estimated_count(model) for model in PURGE_MODELS}
+    tables = [connection.ops.quote_name(model._meta.db_table) for model in PURGE_MODELS]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"TRUNCATE {', '.join(tables)} CASCADE")
+        else:
+            for table in tables:
+                cursor.execute(f"DELETE FROM {table}")
+    return counts
+
+
+def retention_queryset(days):
+    """Лоты, аукцион по которым прошел больше days дней назад"""
+    cutoff = timezone.now() - timedelta(days=days)
+    return Car.objects.filter(auction_at__lt=cutoff)
+
+
+def apply_retention(days=None, batch_size=1000, archive=None, dry_run=False, progress=None):
+    """
+    Удаляет лоты старше days дней после аукциона пачками по batch_size.
+    Каждая пачка - отдельная короткая транзакция, поэтому таблица не
+    блокируется надолго. Если передан archive (текстовый файл), перед
+    удалением лоты дописываются в него по одной JSON-строке.
+    progress(processed, total) вызывается после каждой пачки.
+    Возвращает количество удаленных (в dry_run - подходящих) лотов.
+    """
+    if days is None:
+        days = settings.RETENTION_DAYS
+    queryset = retention_queryset(days).order_by('pk')
+    total = queryset.count()
+    if dry_run:
+        return total
+
+    processed = 0
+    last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+
+        with transaction.atomic():
+            if archive:
+                write_archive(archive, pks)
+            Image.objects.filter(car_id__in=pks).delete()
+            Car.objects.filter(pk__in=pks).delete()
+
+        processed += len(pks)
+        if progress:
+            progress(processed, total)
+    return processed
+
+
+def open_archive(path):
+    """Открывает файл архива на дозапись; .gz - со сжатием"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'at', encoding='utf-8')
+    return open(path, 'a', encoding='utf-8')
+
+
+def write_archive(archive, pks):
+    """Дописывает лоты с URL изображений в архив"""
+    image_urls = {}
+    for car_id, url in Image.objects.filter(car_id__in=pks).values_list('car_id', 'url'):
+        image_urls.setdefault(car_id, []).append(url)
+
+    lines = []
+    for car in Car.objects.filter(pk__in=pks).values():
+        car['images'] = image_urls.get(car['id'], [])
+        lines.append(json.dumps(car, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n')
+    archive.write(''.join(lines))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from cars.models import Car
+from cars.parser import AuctionParser
+
+
+class Command(BaseCommand):
+    help = "Заполняет auction_at и engine_cc для существующих автомобилей пакетами"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        parser = AuctionParser()
+
+        pending = Car.objects.filter(
+            Q(auction_at__isnull=True, auction_date__isnull=False) |
+            Q(engine_cc__isnull=True, engine_volume__isnull=False)
+        ).order_by('pk')
+
+        last_pk = 0
+        processed = 0
+        updated = 0
+
+        while True:
+            # Пагинация по первичному ключу, без OFFSET
+            batch = list(
+                pending.filter(pk__gt=last_pk)
+                .only('pk', 'auction_date', 'auction_at', 'engine_volume', 'engine_cc')[:batch_size]
+            )
+            if not batch:
+                break
+
+            changed = []
+            now = timezone.now()
+            for car in batch:
+                auction_at = car.auction_at or parser.parse_auction_date(car.auction_date)
+                engine_cc = car.engine_cc or parser.parse_engine_cc(car.engine_volume)
+                if auction_at != car.auction_at or engine_cc != car.engine_cc:
+                    car.auction_at = auction_at
+                    car.engine_cc = engine_cc
+                    car.updated_at = now
+                    changed.append(car)
+
+            if changed:
+                Car.objects.bulk_update(changed, ['auction_at', 'engine_cc', 'updated_at'])
+
+            last_pk = batch[-1].pk
+            processed += len(batch)
+            updated += len(changed)
+            self.stdout.write(f"Обработано: {processed}, обновлено: {updated}")
+
+        self.stdout.write(self.style.SUCCESS(f"Готово. Обработано: {processed}, обновлено: {updated}"))
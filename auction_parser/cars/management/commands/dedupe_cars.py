@@ -0,0 +1,42 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from cars.dedupe import backfill_keys, merge_duplicates
+
+
+class Command(BaseCommand):
+    help = (
+        "Объединяет повторно сохраненные лоты без номера: заполняет естественный ключ "
+        "у старых записей и сливает копии с одинаковым ключом пачками"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Ключей в одной транзакции слияния (по умолчанию 500)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Только посчитать копии, ничего не меняя "
+                                 "(учитываются записи с уже заполненным ключом)")
+        parser.add_argument('--skip-backfill', action='store_true',
+                            help="Не заполнять ключ у записей, где его нет")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size должен быть >= 1")
+
+        backfilled = 0
+        if not options['skip_backfill'] and not options['dry_run']:
+            backfilled = backfill_keys(
+                progress=lambda done: self.stderr.write(f"Ключ заполнен: {done}"),
+            )
+
+        groups, removed = merge_duplicates(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            progress=lambda done, deleted: self.stderr.write(f"Групп: {done}, удалено копий: {deleted}"),
+        )
+
+        self.stdout.write(json.dumps({
+            'backfilled': backfilled,
+            'duplicate_groups': groups,
+            'removed': removed,
+            'dry_run': options['dry_run'],
+        }))
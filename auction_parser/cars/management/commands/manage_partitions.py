@@ -0,0 +1,56 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from cars.partitioning import (
+    PARTITIONED_MODELS, PartitioningError, enable_partitioning, ensure_partitions,
+    expire_partitions, is_partitioned, list_partitions, require_postgresql,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Секционирование таблиц автомобилей и изображений по месяцу created_at (только PostgreSQL): "
+        "включение, создание будущих секций и отключение устаревших. Запускайте из cron раз в сутки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enable', action='store_true',
+                            help="Перевести таблицы на секционирование (однократно, в окно обслуживания)")
+        parser.add_argument('--ahead', type=int, default=3,
+                            help="На сколько месяцев вперед создавать секции (по умолчанию 3)")
+        parser.add_argument('--retain-months', type=int,
+                            help="Отключать секции, все строки которых старше указанного числа месяцев")
+        parser.add_argument('--drop', action='store_true',
+                            help="Удалять устаревшие секции вместо отключения")
+        parser.add_argument('--list', action='store_true', help="Только показать секции")
+
+    def handle(self, *args, **options):
+        if options['drop'] and options['retain_months'] is None:
+            raise CommandError("--drop используется вместе с --retain-months")
+
+        summary = {}
+        try:
+            require_postgresql()
+            for model in PARTITIONED_MODELS:
+                summary[model._meta.db_table] = self.handle_model(model, options)
+        except PartitioningError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(json.dumps(summary, ensure_ascii=False, default=str))
+
+    def handle_model(self, model, options):
+        result = {}
+        if options['enable'] and not is_partitioned(model):
+            enable_partitioning(model)
+            result['enabled'] = True
+
+        if not options['list']:
+            result['created'] = ensure_partitions(model, options['ahead'])
+            if options['retain_months'] is not None:
+                key = 'dropped' if options['drop'] else 'detached'
+                result[key] = expire_partitions(model, options['retain_months'], drop=options['drop'])
+
+        result['partitions'] = [
+            {'name': name, 'from': lower, 'to': upper, 'rows': rows}
+            for name, lower, upper, rows in list_partitions(model)
+        ]
+        return result
@@ -0,0 +1,74 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from cars.models import MaintenanceJob
+from cars.tasks import run_maintenance_job
+from cars.lifecycle import apply_retention, open_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Обслуживание данных: полная очистка (--all) или удаление лотов, "
+        "аукцион по которым прошел больше N дней назад (--retention)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Удалить все автомобили, изображения, логи и статистику страниц")
+        parser.add_argument('--retention', action='store_true',
+                            help="Удалить лоты старше --days дней после аукциона")
+        parser.add_argument('--days', type=int,
+                            help="Срок хранения в днях (по умолчанию RETENTION_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Лотов в одной транзакции удаления (по умолчанию 1000)")
+        parser.add_argument('--archive',
+                            help="Перед удалением сохранить лоты в файл JSON Lines (.gz - со сжатием)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Только посчитать лоты, которые будут удалены")
+        parser.add_argument('--job-id', type=int,
+                            help="Выполнить уже созданную задачу (используется веб-интерфейсом)")
+
+    def handle(self, *args, **options):
+        if options['job_id']:
+            job = self.run_job(options['job_id'], options)
+            self.stdout.write(json.dumps(self.summary(job), ensure_ascii=False))
+            return
+
+        if options['all'] == options['retention']:
+            raise CommandError("Укажите ровно один режим: --all или --retention")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size должен быть >= 1")
+
+        if options['dry_run']:
+            if options['all']:
+                raise CommandError("--dry-run поддерживается только с --retention")
+            count = apply_retention(options['days'], dry_run=True)
+            self.stdout.write(json.dumps({'kind': 'retention', 'dry_run': True, 'matched': count}))
+            return
+
+        job = MaintenanceJob.objects.create(kind='purge' if options['all'] else 'retention')
+        job = self.run_job(job.id, options)
+        self.stdout.write(json.dumps(self.summary(job), ensure_ascii=False))
+
+    def run_job(self, job_id, options):
+        archive = open_archive(options['archive']) if options['archive'] else None
+        try:
+            return run_maintenance_job(
+                job_id, retention_days=options['days'], batch_size=options['batch_size'], archive=archive,
+            )
+        except MaintenanceJob.DoesNotExist:
+            raise CommandError(f"Задача {job_id} не найдена")
+        except Exception as e:
+            raise CommandError(f"Ошибка обслуживания данных: {e}")
+        finally:
+            if archive:
+                archive.close()
+
+    @staticmethod
+    def summary(job):
+        return {
+            'job_id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'processed': job.processed,
+            'message': job.message,
+        }
@@ -0,0 +1,18 @@
+import json
+from django.core.management.base import BaseCommand
+from cars.valuation import refresh_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает оценку лотов по аналогам (ожидаемая цена и z-оценка отклонения) "
+        "и сохраняет изменившиеся значения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Перезаписать оценки всех лотов, а не только изменившиеся")
+
+    def handle(self, *args, **options):
+        summary = refresh_scores(force=options['force'])
+        self.stdout.write(json.dumps(summary, ensure_ascii=False))
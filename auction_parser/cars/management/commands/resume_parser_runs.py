@@ -0,0 +1,53 @@
+import sys
+import json
+import contextlib
+from django.core.management.base import BaseCommand, CommandError
+from cars.models import ParserLog
+from cars.checkpoints import mark_stale_runs
+
+
+class Command(BaseCommand):
+    help = (
+        "Находит зависшие запуски парсера (нет сигнала процесса дольше PARSER_STALE_SECONDS), "
+        "отмечает их прерванными и продолжает многостраничные запуски с последней сохраненной страницы"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log-id', type=int, help="Продолжить только этот запуск")
+        parser.add_argument('--all', action='store_true', help="Продолжить все прерванные запуски")
+        parser.add_argument('--stale-seconds', type=int,
+                            help="Через сколько секунд без сигнала запуск считается зависшим")
+
+    def handle(self, *args, **options):
+        marked = mark_stale_runs(options['stale_seconds'])
+
+        if options['log_id']:
+            try:
+                logs = [ParserLog.objects.get(id=options['log_id'])]
+            except ParserLog.DoesNotExist:
+                raise CommandError(f"Запуск #{options['log_id']} не найден")
+            if not logs[0].resumable:
+                raise CommandError(f"Запуск #{logs[0].id} ({logs[0].status}) нельзя продолжить")
+        else:
+            logs = [log for log in ParserLog.objects.filter(status='interrupted').order_by('id')
+                    if log.resumable]
+
+        resumed = []
+        if options['log_id'] or options['all']:
+            # Стек парсинга нужен только при продолжении
+            from cars.run_parse import MultiPageParser
+
+            for parser_log in logs:
+                self.stderr.write(f"Продолжение запуска #{parser_log.id} со страницы "
+                                  f"{(parser_log.last_page or 0) + 1}")
+                with contextlib.redirect_stdout(sys.stderr):
+                    cars, images, pages = MultiPageParser.for_run(parser_log).resume(parser_log)
+                parser_log.refresh_from_db()
+                resumed.append({'log_id': parser_log.id, 'status': parser_log.status,
+                                'cars': cars, 'images': images, 'pages': pages})
+
+        self.stdout.write(json.dumps({
+            'marked_interrupted': marked,
+            'resumable': [log.id for log in logs],
+            'resumed': resumed,
+        }, ensure_ascii=False))
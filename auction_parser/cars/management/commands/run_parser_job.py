@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from cars.tasks import run_single_page_job, run_multi_page_job, run_resume_job
+
+
+class Command(BaseCommand):
+    help = "Выполняет задачу парсинга для уже созданного ParserLog (используется веб-интерфейсом)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log-id', type=int, required=True)
+        parser.add_argument('--url', help="URL одной страницы для парсинга")
+        parser.add_argument('--start-page', type=int, default=1)
+        parser.add_argument('--end-page', type=int)
+        parser.add_argument('--resume', action='store_true',
+                            help="Продолжить прерванный запуск с последней сохраненной страницы")
+
+    def handle(self, *args, **options):
+        log_id = options['log_id']
+
+        if options['resume']:
+            run_resume_job(log_id)
+            return
+
+        if options['url']:
+            run_single_page_job(options['url'], log_id)
+            return
+
+        if options['start_page'] < 1:
+            raise CommandError("--start-page должен быть >= 1")
+
+        run_multi_page_job(options['start_page'], options['end_page'], log_id)
@@ -0,0 +1,313 @@
+import os
+import sys
+import json
+import time
+import random
+import zlib
+import fcntl
+import tempfile
+import contextlib
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, close_old_connections
+from django.utils import timezone
+from cars.models import ParserLog
+from cars.checkpoints import mark_stale_runs
+from cars.run_parse import MultiPageParser
+from cars.adapters import ADAPTERS, get_adapter
+from cars.recrawl import RecrawlScheduler
+from cars.lifecycle import open_archive
+from cars.multisite import MultiSiteCrawler
+
+# Коды завершения для cron/systemd
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_PARTIAL = 3  # часть страниц не удалось получить
+EXIT_LOCKED = 4  # другой запуск еще не завершился (на этом или другом узле)
+
+LOCK_NAME = 'cars-scrape'
+
+
+class Command(BaseCommand):
+    help = (
+        "Запускает парсинг без веб-интерфейса. "
+        "Логи парсера выводятся в stderr, итоговая JSON-сводка - в stdout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Спарсить одну страницу по URL")
+        parser.add_argument('--start-page', type=int, default=1)
+        parser.add_argument('--end-page', type=int,
+                            help="Последняя страница; без нее парсинг идет до 3 пустых страниц подряд")
+        parser.add_argument('--max-pages', type=int, default=50,
+                            help="Максимум страниц в автоматическом режиме (по умолчанию 50)")
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help="Количество страниц, загружаемых параллельно (нужен --end-page)")
+        parser.add_argument('--delay', type=float,
+                            help="Фиксированная пауза между страницами в секундах "
+                                 "(отключает автоподстройку скорости)")
+        parser.add_argument('--delta', action='store_true',
+                            help="Обновлять изменившиеся поля уже известных лотов")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Парсить без записи в базу данных")
+        parser.add_argument('--archive',
+                            help="Сохранить спарсенные записи в файл JSON Lines (.gz - со сжатием)")
+        parser.add_argument('--sources',
+                            help="Сайты-источники через запятую (по умолчанию japantransit); "
+                                 f"несколько сайтов обходятся параллельно. Доступны: {', '.join(sorted(ADAPTERS))}")
+        parser.add_argument('--stream', action='store_true',
+                            help="Разбирать страницы по мере загрузки, не дожидаясь всего ответа "
+                                 "(по умолчанию - настройка PARSER_STREAMING)")
+        parser.add_argument('--profile', action='store_true',
+                            help="Сохранить в ParserLog профиль cProfile и отчет tracemalloc")
+        parser.add_argument('--adaptive', type=int, metavar='BUDGET',
+                            help="Адаптивный переобход: BUDGET страниц с наибольшей вероятностью изменений "
+                                 "(с --schedule 3600 - бюджет запросов в час)")
+        parser.add_argument('--schedule', type=float, metavar='SECONDS',
+                            help="Запускать парсинг в цикле с указанным интервалом")
+        parser.add_argument('--jitter', type=float, default=0, metavar='SECONDS',
+                            help="Случайное отклонение интервала расписания (±)")
+
+    def handle(self, *args, **options):
+        if options['start_page'] < 1:
+            raise CommandError("--start-page должен быть >= 1")
+        if options['end_page'] is not None and options['end_page'] < options['start_page']:
+            raise CommandError("--end-page должен быть >= --start-page")
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency должен быть >= 1")
+        if options['concurrency'] > 1 and options['end_page'] is None and not options['url']:
+            raise CommandError("Для --concurrency > 1 нужно указать --end-page")
+        try:
+            names = list(dict.fromkeys(name.strip() for name in (options['sources'] or '').split(',')))
+            options['adapters'] = [get_adapter(name) for name in names]
+        except ValueError as e:
+            raise CommandError(str(e))
+        if len(options['adapters']) > 1 and (options['url'] or options['adaptive']):
+            raise CommandError("--url и --adaptive работают с одним источником")
+
+        if not options['schedule']:
+            summary = self.run_locked(options)
+            self.write_summary(summary)
+            sys.exit(summary['exit_code'])
+
+        # Режим расписания: повторяем запуск, пока процесс не остановят
+        while True:
+            try:
+                summary = self.run_locked(options)
+            except Exception as e:
+                # Ошибка одного запуска не останавливает расписание
+                self.stderr.write(f"Ошибка запуска по расписанию: {e}")
+                summary = {
+                    'status': 'error',
+                    'exit_code': EXIT_ERROR,
+                    'started_at': timezone.now().isoformat(),
+                    'error': str(e),
+                }
+            self.write_summary(summary)
+            close_old_connections()
+
+            delay = options['schedule'] + random.uniform(-options['jitter'], options['jitter'])
+            time.sleep(max(1, delay))
+
+    def run_locked(self, options):
+        """Выполняет один запуск, если не выполняется другой"""
+        with scrape_lock(LOCK_NAME) as acquired:
+            if not acquired:
+                return {
+                    'status': 'locked',
+                    'exit_code': EXIT_LOCKED,
+                    'started_at': timezone.now().isoformat(),
+                }
+            return self.run_once(options)
+
+    def run_once(self, options):
+        started_at = timezone.now()
+        started = time.monotonic()
+        archive = open_archive(options['archive']) if options['archive'] else None
+        if not options['dry_run']:
+            # Запуски, процесс которых погиб (деплой, нехватка памяти), не остаются 'running'
+            mark_stale_runs()
+
+        try:
+            # Вывод парсера уходит в stderr, чтобы stdout содержал только сводку
+            with contextlib.redirect_stdout(sys.stderr):
+                if options['url']:
+                    result = self.run_single_url(options, archive)
+                elif options['adaptive']:
+                    result = self.run_adaptive(options, archive)
+                elif len(options['adapters']) > 1:
+                    result = self.run_sites(options, archive)
+                else:
+                    result = self.run_pages(options, archive)
+        finally:
+            if archive:
+                archive.close()
+
+        summary = {
+            'started_at': started_at.isoformat(),
+            'duration_s': round(time.monotonic() - started, 3),
+            'dry_run': options['dry_run'],
+            'delta': options['delta'],
+            **result,
+        }
+        if summary['status'] == 'error':
+            summary['exit_code'] = EXIT_ERROR
+        elif summary.get('failed_pages') or summary.get('failed_sources'):
+            summary['exit_code'] = EXIT_PARTIAL
+        else:
+            summary['exit_code'] = EXIT_OK
+        return summary
+
+    def run_pages(self, options, archive):
+        multi_parser = MultiPageParser(
+            dry_run=options['dry_run'], delta=options['delta'], archive=archive,
+            profile=options['profile'], autothrottle=options['delay'] is None,
+            streaming=options['stream'] or None, adapter=options['adapters'][0],
+        )
+        multi_parser.max_pages = options['max_pages']
+        if options['delay'] is not None:
+            multi_parser.delay_between_pages = options['delay']
+            multi_parser.delay_variation = min(multi_parser.delay_variation, options['delay'])
+
+        start_page, end_page = options['start_page'], options['end_page']
+        parser_log = None
+        if not options['dry_run']:
+            pages_text = f"{start_page}-{end_page}" if end_page else f"{start_page}-auto"
+            parser_log = ParserLog.objects.create(url=f"Парсинг страниц {pages_text} (manage.py scrape)")
+
+        if options['concurrency'] > 1:
+            cars, images, pages = multi_parser.run_pages_concurrently(
+                start_page, end_page, options['concurrency'], parser_log
+            )
+        else:
+            cars, images, pages = multi_parser.run_multi_page_parser(start_page, end_page, parser_log)
+
+        status = 'completed'
+        if parser_log:
+            parser_log.refresh_from_db()
+            status = parser_log.status
+
+        return {
+            'status': status,
+            'log_id': parser_log.id if parser_log else None,
+            'pages_ok': pages,
+            'failed_pages': multi_parser.failed_pages,
+            'cars': cars,
+            'images': images,
+            'dedupe': multi_parser.dedupe_stats.as_dict(),
+            'throttle': multi_parser.throttle.state() if multi_parser.throttle else None,
+        }
+
+    def run_sites(self, options, archive):
+        crawler = MultiSiteCrawler(
+            options['adapters'], dry_run=options['dry_run'], delta=options['delta'], archive=archive,
+            delay=options['delay'], streaming=options['stream'] or None, max_pages=options['max_pages'],
+        )
+        start_page, end_page = options['start_page'], options['end_page']
+        parser_log = None
+        if not options['dry_run']:
+            names = ', '.join(adapter.name for adapter in options['adapters'])
+            parser_log = ParserLog.objects.create(url=f"Парсинг сайтов {names} (manage.py scrape)")
+
+        cars, images, pages = crawler.run(start_page, end_page, parser_log)
+
+        status = 'completed'
+        if parser_log:
+            parser_log.refresh_from_db()
+            status = parser_log.status
+        sources = crawler.summary()
+        return {
+            'status': status,
+            'log_id': parser_log.id if parser_log else None,
+            'pages_ok': pages,
+            'failed_pages': [url for result in sources.values() for url in result['failed_pages']],
+            'cars': cars,
+            'images': images,
+            'failed_sources': [name for name, result in sources.items() if result['error']],
+            'sources': sources,
+            'dedupe': crawler.dedupe_stats.as_dict(),
+        }
+
+    def run_adaptive(self, options, archive):
+        multi_parser = MultiPageParser(
+            dry_run=options['dry_run'], delta=options['delta'], archive=archive,
+            profile=options['profile'], autothrottle=options['delay'] is None,
+            streaming=options['stream'] or None, adapter=options['adapters'][0],
+        )
+        if options['delay'] is not None:
+            multi_parser.delay_between_pages = options['delay']
+            multi_parser.delay_variation = min(multi_parser.delay_variation, options['delay'])
+
+        scheduler = RecrawlScheduler(max_page=options['end_page'], source=options['adapters'][0].name)
+        cars, images, pages, changed_pages = multi_parser.run_adaptive(scheduler, options['adaptive'])
+
+        return {
+            'status': 'completed',
+            'pages_ok': pages - len(multi_parser.failed_pages),
+            'changed_pages': changed_pages,
+            'failed_pages': multi_parser.failed_pages,
+            'cars': cars,
+            'images': images,
+            'freshness': RecrawlScheduler.freshness_by_bucket(source=scheduler.source),
+            'dedupe': multi_parser.dedupe_stats.as_dict(),
+            'throttle': multi_parser.throttle.state() if multi_parser.throttle else None,
+        }
+
+    def run_single_url(self, options, archive):
+        url = options['url']
+        multi_parser = MultiPageParser(
+            dry_run=options['dry_run'], delta=options['delta'], archive=archive,
+            profile=options['profile'], autothrottle=options['delay'] is None,
+            streaming=options['stream'] or None, adapter=options['adapters'][0],
+        )
+        cars, images = multi_parser.parse_single_page(url, None)
+
+        if not options['dry_run']:
+            parser_log = ParserLog.objects.create(url=url)
+            multi_parser.dedupe_stats.apply_to(parser_log)
+            parser_log.mark_completed(cars, images)
+
+        return {
+            'status': 'completed',
+            'pages_ok': 1 if cars or images else 0,
+            'failed_pages': multi_parser.failed_pages,
+            'cars': cars,
+            'images': images,
+            'dedupe': multi_parser.dedupe_stats.as_dict(),
+        }
+
+    def write_summary(self, summary):
+        self.stdout.write(json.dumps(summary, ensure_ascii=False))
+        self.stdout.flush()
+
+
+@contextlib.contextmanager
+def scrape_lock(name):
+    """
+    Блокировка от наложения запусков.
+    На PostgreSQL - advisory lock (работает между узлами с общей БД),
+    иначе - файловая блокировка на текущей машине.
+    """
+    if connection.vendor == 'postgresql':
+        key = zlib.crc32(name.encode())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+        return
+
+    lock_path = os.path.join(tempfile.gettempdir(), f'{name}.lock')
+    with open(lock_path, 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
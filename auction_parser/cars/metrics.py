@@ -0,0 +1,96 @@
+import os
+import time
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+
+# Метрики конвейера парсинга.
+# Если задана переменная PROMETHEUS_MULTIPROC_DIR, значения из всех процессов
+# (воркеры gunicorn и процессы парсинга) собираются в одном /metrics.
+
+FETCH_SECONDS = Histogram(
+    'parser_fetch_seconds', "Время загрузки страницы (fetch_html)",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30),
+)
+FETCH_RESPONSE_BYTES = Histogram(
+    'parser_fetch_response_bytes', "Размер ответа страницы в байтах",
+    buckets=(10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000),
+)
+HTTP_ERRORS = Counter(
+    'parser_http_errors_total', "Ошибки загрузки страниц", ['reason'],
+)
+HTTP_RETRIES = Counter(
+    'parser_http_retries_total', "Повторные запросы после временных ошибок", ['reason'],
+)
+PARSE_SECONDS = Histogram(
+    'parser_parse_seconds', "Время разбора страницы (parse_car_data)",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+BLOCKS_PER_PAGE = Histogram(
+    'parser_blocks_per_page', "Количество блоков автомобилей на странице",
+    buckets=(0, 1, 5, 10, 20, 30, 50, 100),
+)
+KEYLESS_LOTS = Counter(
+    'parser_keyless_lots_total', "Лоты без номера: повторы уже сохраненных и новые", ['result'],
+)
+PRICE_PARSE_MISSES = Counter(
+    'parser_price_parse_misses_total', "Блоки, в которых не удалось найти цену",
+)
+SAVE_SECONDS = Histogram(
+    'parser_save_seconds', "Время сохранения страницы в БД (save_to_database)",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+ROWS_WRITTEN = Histogram(
+    'parser_rows_written', "Записано строк (автомобили и изображения) за вызов save_to_database",
+    buckets=(0, 1, 10, 25, 50, 100, 250, 500),
+)
+SEARCH_MATCH_SECONDS = Histogram(
+    'parser_search_match_seconds', "Время сверки пачки лотов с сохраненными поисками",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+SEARCH_MATCHES = Counter(
+    'parser_search_matches_total', "Совпадения новых и изменившихся лотов с сохраненными поисками",
+)
+VIEW_SECONDS = Histogram(
+    'web_request_seconds', "Время обработки запроса по представлениям",
+    ['view', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+QUERY_REJECTIONS = Counter(
+    'web_query_rejections_total', "Запросы, отклоненные из-за параметров или прерванные по времени в БД",
+    ['view', 'reason'],
+)
+REPLICA_LAG_SECONDS = Gauge(
+    'web_db_replica_lag_seconds', "Отставание реплики БД при последней проверке",
+    multiprocess_mode='max',
+)
+REPLICA_FALLBACKS = Counter(
+    'web_db_replica_fallbacks_total', "Запросы, читавшие с основной БД вместо реплики", ['reason'],
+)
+
+
+def render_latest():
+    """Текущие значения метрик в текстовом формате Prometheus"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """Замеряет время ответа для каждого представления"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name or match.view_name if match else 'unmatched'
+        VIEW_SECONDS.labels(view, request.method, response.status_code).observe(
+            time.perf_counter() - started
+        )
+        return response
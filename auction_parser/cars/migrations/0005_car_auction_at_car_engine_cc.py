@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0004_alter_parserlog_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='auction_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Дата аукциона (дата)'),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='engine_cc',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True, verbose_name='Объем двигателя, куб. см'),
+        ),
+    ]
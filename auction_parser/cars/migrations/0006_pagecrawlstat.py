@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0005_car_auction_at_car_engine_cc'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageCrawlStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.PositiveIntegerField(unique=True, verbose_name='Страница')),
+                ('content_hash', models.CharField(blank=True, default='', max_length=64, verbose_name='Хеш содержимого')),
+                ('lots_count', models.IntegerField(default=0, verbose_name='Лотов на странице')),
+                ('nearest_auction_at', models.DateTimeField(blank=True, null=True, verbose_name='Ближайший аукцион')),
+                ('crawls', models.IntegerField(default=0, verbose_name='Обходов')),
+                ('changes', models.IntegerField(default=0, verbose_name='Обнаружено изменений')),
+                ('exposure_hours', models.FloatField(default=0, verbose_name='Часов наблюдения')),
+                ('last_crawled_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний обход')),
+                ('last_changed_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее изменение')),
+            ],
+            options={
+                'verbose_name': 'Статистика страницы',
+                'verbose_name_plural': 'Статистика страниц',
+                'ordering': ['page'],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0006_pagecrawlstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parserlog',
+            name='fetch_seconds',
+            field=models.FloatField(default=0, verbose_name='Загрузка страниц, сек'),
+        ),
+        migrations.AddField(
+            model_name='parserlog',
+            name='parse_seconds',
+            field=models.FloatField(default=0, verbose_name='Разбор HTML, сек'),
+        ),
+        migrations.AddField(
+            model_name='parserlog',
+            name='peak_memory_kb',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Пиковая память, КБ'),
+        ),
+        migrations.AddField(
+            model_name='parserlog',
+            name='persist_seconds',
+            field=models.FloatField(default=0, verbose_name='Запись в БД, сек'),
+        ),
+        migrations.AddField(
+            model_name='parserlog',
+            name='profile_data',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Профиль cProfile'),
+        ),
+        migrations.AddField(
+            model_name='parserlog',
+            name='profile_report',
+            field=models.TextField(blank=True, default='', verbose_name='Отчет профилирования'),
+        ),
+        migrations.AddField(
+            model_name='parserlog',
+            name='sleep_seconds',
+            field=models.FloatField(default=0, verbose_name='Паузы, сек'),
+        ),
+    ]
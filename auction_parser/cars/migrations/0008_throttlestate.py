@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0007_parserlog_stage_timings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255, unique=True, verbose_name='Сайт')),
+                ('delay', models.FloatField(verbose_name='Пауза между запросами, сек')),
+                ('concurrency', models.PositiveIntegerField(default=1, verbose_name='Параллельных запросов')),
+                ('good_delay', models.FloatField(verbose_name='Последняя удачная пауза, сек')),
+                ('good_concurrency', models.PositiveIntegerField(default=1, verbose_name='Последнее удачное число запросов')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Состояние регулятора скорости',
+                'verbose_name_plural': 'Состояния регулятора скорости',
+            },
+        ),
+    ]
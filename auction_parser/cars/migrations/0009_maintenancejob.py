@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0008_throttlestate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('purge', 'Полная очистка'), ('retention', 'Удаление старых лотов')], max_length=20, verbose_name='Тип')),
+                ('status', models.CharField(choices=[('running', 'Выполняется'), ('completed', 'Завершен'), ('error', 'Ошибка')], default='running', max_length=20, verbose_name='Статус')),
+                ('processed', models.IntegerField(default=0, verbose_name='Обработано автомобилей')),
+                ('total', models.IntegerField(blank=True, null=True, verbose_name='Всего автомобилей (оценка)')),
+                ('message', models.TextField(blank=True, default='', verbose_name='Сообщение')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата запуска')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+            ],
+            options={
+                'verbose_name': 'Задача обслуживания данных',
+                'verbose_name_plural': 'Задачи обслуживания данных',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:37
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_car_created_at(apps, schema_editor):
+    # Существующие изображения относим к месяцу их автомобиля
+    Car = apps.get_model('cars', 'Car')
+    Image = apps.get_model('cars', 'Image')
+    Image.objects.update(
+        created_at=Subquery(Car.objects.filter(pk=OuterRef('car_id')).values('created_at')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0009_maintenancejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата создания'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_car_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='car',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания'),
+        ),
+    ]
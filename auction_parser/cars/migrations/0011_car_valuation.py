@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0010_partition_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='expected_price',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Ожидаемая цена'),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='price_zscore',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='Отклонение цены (z)'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0011_car_valuation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='natural_key',
+            field=models.CharField(blank=True, db_index=True, max_length=40, null=True, verbose_name='Естественный ключ'),
+        ),
+        migrations.AddField(
+            model_name='parserlog',
+            name='duplicate_lots',
+            field=models.IntegerField(default=0, verbose_name='Повторов среди них'),
+        ),
+        migrations.AddField(
+            model_name='parserlog',
+            name='keyless_lots',
+            field=models.IntegerField(default=0, verbose_name='Лотов без номера'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0012_natural_key_dedupe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parserlog',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последний сигнал процесса'),
+        ),
+        migrations.AddField(
+            model_name='parserlog',
+            name='last_page',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Последняя сохраненная страница'),
+        ),
+        migrations.AddField(
+            model_name='parserlog',
+            name='run_params',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Параметры запуска'),
+        ),
+        migrations.AlterField(
+            model_name='maintenancejob',
+            name='status',
+            field=models.CharField(choices=[('running', 'Выполняется'), ('completed', 'Завершен'), ('error', 'Ошибка'), ('interrupted', 'Прерван')], default='running', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AlterField(
+            model_name='parserlog',
+            name='status',
+            field=models.CharField(choices=[('running', 'Выполняется'), ('completed', 'Завершен'), ('error', 'Ошибка'), ('interrupted', 'Прерван')], default='running', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.CreateModel(
+            name='PageCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.PositiveIntegerField(verbose_name='Страница')),
+                ('cars', models.IntegerField(default=0, verbose_name='Автомобилей')),
+                ('images', models.IntegerField(default=0, verbose_name='Изображений')),
+                ('committed_at', models.DateTimeField(auto_now_add=True, verbose_name='Сохранена')),
+                ('parser_log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='cars.parserlog', verbose_name='Лог парсинга')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка страницы',
+                'verbose_name_plural': 'Контрольные точки страниц',
+                'constraints': [models.UniqueConstraint(fields=('parser_log', 'page'), name='unique_checkpoint_page')],
+            },
+        ),
+    ]
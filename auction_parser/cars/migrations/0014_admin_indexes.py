@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:56
+
+from django.db import migrations, models
+
+# Поиск в админке по началу строки без учета регистра (^brand, ^model) строится
+# как UPPER(поле::text) LIKE 'ЗНАЧЕНИЕ%'; на PostgreSQL такому условию нужен
+# индекс по выражению с text_pattern_ops
+PREFIX_INDEXES = (
+    ('cars_car_brand_upper_prefix', 'brand'),
+    ('cars_car_model_upper_prefix', 'model'),
+)
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON cars_car (UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0013_run_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='car',
+            name='brand',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='Марка'),
+        ),
+        migrations.AlterField(
+            model_name='car',
+            name='lot_number',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True, verbose_name='Номер лота'),
+        ),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
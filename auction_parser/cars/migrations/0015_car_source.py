@@ -0,0 +1,79 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_lot_duplicates(apps, schema_editor):
+    # Копии одного номера лота (гонка параллельных потоков до появления
+    # ограничения) сливаются в самый ранний автомобиль
+    Car = apps.get_model('cars', 'Car')
+    Image = apps.get_model('cars', 'Image')
+    groups = (
+        Car.objects.filter(lot_number__isnull=False)
+        .values('lot_number')
+        .annotate(copies=Count('id'), keep_id=Min('id'))
+        .filter(copies__gt=1)
+    )
+    for group in groups.iterator():
+        duplicate_ids = list(
+            Car.objects.filter(lot_number=group['lot_number']).exclude(id=group['keep_id']).values_list('id', flat=True)
+        )
+        known_urls = set(Image.objects.filter(car_id=group['keep_id']).values_list('url', flat=True))
+        move_ids = []
+        for image_id, url in Image.objects.filter(car_id__in=duplicate_ids).order_by('id').values_list('id', 'url'):
+            if url not in known_urls:
+                known_urls.add(url)
+                move_ids.append(image_id)
+        Image.objects.filter(id__in=move_ids).update(car_id=group['keep_id'])
+        Image.objects.filter(car_id__in=duplicate_ids).delete()
+        Car.objects.filter(id__in=duplicate_ids).delete()
+
+
+def is_partitioned(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'cars_car'::regclass")
+        return cursor.fetchone() is not None
+
+
+class AddLotConstraint(migrations.AddConstraint):
+    """
+    Уникальный индекс секционированной таблицы обязан содержать ключ секций,
+    поэтому там создается обычный индекс, а уникальность держит cars.dedupe.lock_lot
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if is_partitioned(schema_editor):
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {self.constraint.name} ON cars_car (source, lot_number)'
+            )
+        else:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if is_partitioned(schema_editor):
+            schema_editor.execute(f'DROP INDEX IF EXISTS {self.constraint.name}')
+        else:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0014_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='source',
+            field=models.CharField(default='japantransit', max_length=50, verbose_name='Источник'),
+        ),
+        migrations.RunPython(merge_lot_duplicates, migrations.RunPython.noop),
+        AddLotConstraint(
+            model_name='car',
+            constraint=models.UniqueConstraint(fields=('source', 'lot_number'), name='car_source_lot_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0015_car_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+    ]
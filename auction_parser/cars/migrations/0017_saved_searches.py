@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0016_car_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, default='', max_length=200, verbose_name='Название')),
+                ('brand', models.CharField(blank=True, default='', max_length=100, verbose_name='Марка')),
+                ('year_from', models.PositiveIntegerField(blank=True, null=True, verbose_name='Год от')),
+                ('year_to', models.PositiveIntegerField(blank=True, null=True, verbose_name='Год до')),
+                ('price_from', models.IntegerField(blank=True, null=True, verbose_name='Цена от')),
+                ('price_to', models.IntegerField(blank=True, null=True, verbose_name='Цена до')),
+                ('mileage_from', models.IntegerField(blank=True, null=True, verbose_name='Пробег от')),
+                ('mileage_to', models.IntegerField(blank=True, null=True, verbose_name='Пробег до')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Сохраненный поиск',
+                'verbose_name_plural': 'Сохраненные поиски',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matched_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата совпадения')),
+                ('car', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='search_matches', to='cars.car', verbose_name='Автомобиль')),
+                ('search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='cars.savedsearch', verbose_name='Поиск')),
+            ],
+            options={
+                'verbose_name': 'Совпадение поиска',
+                'verbose_name_plural': 'Совпадения поисков',
+                'indexes': [models.Index(fields=['search', '-matched_at'], name='search_match_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('search', 'car'), name='unique_search_match')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0017_saved_searches'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='car',
+            name='mileage',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='Пробег'),
+        ),
+        migrations.AlterField(
+            model_name='car',
+            name='price',
+            field=models.IntegerField(blank=True, db_index=True, null=True, verbose_name='Цена'),
+        ),
+        migrations.AlterField(
+            model_name='car',
+            name='year',
+            field=models.PositiveIntegerField(db_index=True, verbose_name='Год выпуска'),
+        ),
+    ]
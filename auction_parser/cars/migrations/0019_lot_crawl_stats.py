@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0018_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecrawlBucketStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=20, unique=True, verbose_name='Корзина')),
+                ('changes', models.IntegerField(default=0, verbose_name='Обнаружено изменений')),
+                ('exposure_hours', models.FloatField(default=0, verbose_name='Лото-часов наблюдения')),
+            ],
+            options={
+                'verbose_name': 'Статистика корзины переобхода',
+                'verbose_name_plural': 'Статистика корзин переобхода',
+                'ordering': ['bucket'],
+            },
+        ),
+        migrations.RemoveField(
+            model_name='pagecrawlstat',
+            name='changes',
+        ),
+        migrations.RemoveField(
+            model_name='pagecrawlstat',
+            name='exposure_hours',
+        ),
+        migrations.CreateModel(
+            name='LotCrawlStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, verbose_name='Источник')),
+                ('lot_number', models.CharField(max_length=50, verbose_name='Номер лота')),
+                ('auction_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата аукциона')),
+                ('signature', models.CharField(max_length=32, verbose_name='Хеш значимых полей')),
+                ('checked_at', models.DateTimeField(verbose_name='Последняя проверка')),
+            ],
+            options={
+                'verbose_name': 'Наблюдение лота',
+                'verbose_name_plural': 'Наблюдения лотов',
+                'indexes': [models.Index(fields=['source', 'auction_at'], name='lot_crawl_auction_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'lot_number'), name='lot_crawl_stat_unique')],
+            },
+        ),
+    ]
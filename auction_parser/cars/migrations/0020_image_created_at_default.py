@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0019_lot_crawl_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='image',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата создания'),
+        ),
+    ]
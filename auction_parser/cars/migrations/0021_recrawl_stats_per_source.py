@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0020_image_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='pagecrawlstat',
+            options={'ordering': ['source', 'page'], 'verbose_name': 'Статистика страницы', 'verbose_name_plural': 'Статистика страниц'},
+        ),
+        migrations.AlterModelOptions(
+            name='recrawlbucketstat',
+            options={'ordering': ['source', 'bucket'], 'verbose_name': 'Статистика корзины переобхода', 'verbose_name_plural': 'Статистика корзин переобхода'},
+        ),
+        migrations.AddField(
+            model_name='pagecrawlstat',
+            name='source',
+            field=models.CharField(default='japantransit', max_length=50, verbose_name='Источник'),
+        ),
+        migrations.AddField(
+            model_name='recrawlbucketstat',
+            name='source',
+            field=models.CharField(default='japantransit', max_length=50, verbose_name='Источник'),
+        ),
+        migrations.AlterField(
+            model_name='pagecrawlstat',
+            name='page',
+            field=models.PositiveIntegerField(verbose_name='Страница'),
+        ),
+        migrations.AlterField(
+            model_name='recrawlbucketstat',
+            name='bucket',
+            field=models.CharField(max_length=20, verbose_name='Корзина'),
+        ),
+        migrations.AddConstraint(
+            model_name='pagecrawlstat',
+            constraint=models.UniqueConstraint(fields=('source', 'page'), name='page_crawl_stat_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='recrawlbucketstat',
+            constraint=models.UniqueConstraint(fields=('source', 'bucket'), name='recrawl_bucket_stat_unique'),
+        ),
+    ]
@@ -1,17 +1,35 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Car(models.Model):
-    brand = models.CharField("Марка", max_length=100)
+    # Сайт-источник (имя адаптера, cars.adapters); номер лота уникален в пределах источника
+    source = models.CharField("Источник", max_length=50, default='japantransit')
+    brand = models.CharField("Марка", max_length=100, db_index=True)
     model = models.CharField("Модель", max_length=100)
-    year = models.PositiveIntegerField("Год выпуска")
-    price = models.IntegerField("Цена", null=True, blank=True)
-    mileage = models.IntegerField("Пробег", null=True, blank=True)
-    lot_number = models.CharField("Номер лота", max_length=50, null=True, blank=True)
+    # Индексы для сортировок списка автомобилей (cars.query_guard.SORT_ORDERINGS)
+    year = models.PositiveIntegerField("Год выпуска", db_index=True)
+    price = models.IntegerField("Цена", null=True, blank=True, db_index=True)
+    mileage = models.IntegerField("Пробег", null=True, blank=True, db_index=True)
+    # Индекс для поиска лота при сохранении (get_or_create) и в админке
+    lot_number = models.CharField("Номер лота", max_length=50, null=True, blank=True, db_index=True)
     lot_url = models.TextField("URL Объявления", null=True, blank=True)
     engine_volume = models.CharField("Объем двигателя", max_length=50, null=True, blank=True)
     auction_date = models.CharField("Дата аукциона", max_length=50, null=True, blank=True)
-    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+    # Типизированные копии auction_date и engine_volume для фильтров и сортировки по индексу
+    auction_at = models.DateTimeField("Дата аукциона (дата)", null=True, blank=True, db_index=True)
+    engine_cc = models.PositiveIntegerField("Объем двигателя, куб. см", null=True, blank=True, db_index=True)
+    # Хеш марки, модели, года, пробега, даты аукциона и первого изображения (cars.dedupe):
+    # по нему повторно спарсенные лоты без номера не сохраняются заново
+    natural_key = models.CharField("Естественный ключ", max_length=40, null=True, blank=True, db_index=True)
+    # Оценка по аналогам (cars.valuation): ожидаемая цена и z-оценка отклонения цены от нее
+    expected_price = models.IntegerField("Ожидаемая цена", null=True, blank=True)
+    price_zscore = models.FloatField("Отклонение цены (z)", null=True, blank=True, db_index=True)
+    # Индекс для сортировки по умолчанию; при секционировании (manage_partitions) - ключ секций
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True, db_index=True)
+    # Время последнего изменения лота или его изображений (ETag пакетного запроса лотов).
+    # Запись через update()/bulk_update должна выставлять его явно
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
 
     def __str__(self):
         return f"{self.brand} {self.model} ({self.year})"
@@ -20,6 +38,10 @@ class Car(models.Model):
         verbose_name = "Автомобиль"
         verbose_name_plural = "Автомобили"
         ordering = ['-year', 'brand', 'model']
+        constraints = [
+            # На секционированной таблице - обычный индекс, см. cars.partitioning
+            models.UniqueConstraint(fields=['source', 'lot_number'], name='car_source_lot_unique'),
+        ]
 
 
 class Image(models.Model):
@@ -30,6 +52,9 @@ class Image(models.Model):
         verbose_name="Автомобиль"
     )
     url = models.URLField("URL изображения", max_length=500)
+    # Ключ секционирования. Парсер и слияние копий записывают дату создания
+    # автомобиля, чтобы изображение попадало в тот же месяц, что и автомобиль
+    created_at = models.DateTimeField("Дата создания", default=timezone.now)
 
     def __str__(self):
         return f"Изображение для {self.car}"
@@ -44,6 +69,7 @@ class ParserLog(models.Model):
         ('running', 'Выполняется'),
         ('completed', 'Завершен'),
         ('error', 'Ошибка'),
+        ('interrupted', 'Прерван'),
     ]
 
     url = models.URLField("URL для парсинга", max_length=500)
@@ -54,9 +80,36 @@ class ParserLog(models.Model):
     created_at = models.DateTimeField("Дата запуска", auto_now_add=True)
     finished_at = models.DateTimeField("Дата завершения", null=True, blank=True)
 
+    # Суммарное время по этапам и пиковая память процесса
+    fetch_seconds = models.FloatField("Загрузка страниц, сек", default=0)
+    parse_seconds = models.FloatField("Разбор HTML, сек", default=0)
+    persist_seconds = models.FloatField("Запись в БД, сек", default=0)
+    sleep_seconds = models.FloatField("Паузы, сек", default=0)
+    peak_memory_kb = models.IntegerField("Пиковая память, КБ", null=True, blank=True)
+
+    # Лоты без номера и найденные среди них повторы уже сохраненных (cars.dedupe)
+    keyless_lots = models.IntegerField("Лотов без номера", default=0)
+    duplicate_lots = models.IntegerField("Повторов среди них", default=0)
+
+    # Контрольная точка многостраничного запуска (cars.checkpoints): параметры
+    # для продолжения, последняя сохраненная страница и сигнал жизни процесса.
+    # cars_parsed/images_parsed во время запуска - частичные итоги по сохраненным страницам
+    run_params = models.JSONField("Параметры запуска", default=dict, blank=True)
+    last_page = models.IntegerField("Последняя сохраненная страница", null=True, blank=True)
+    heartbeat_at = models.DateTimeField("Последний сигнал процесса", null=True, blank=True)
+
+    # Результаты профилирования (только для запусков с профилированием)
+    profile_data = models.BinaryField("Профиль cProfile", null=True, blank=True)
+    profile_report = models.TextField("Отчет профилирования", blank=True, default='')
+
     def __str__(self):
         return f"Парсинг {self.url} - {self.status}"
 
+    @property
+    def resumable(self):
+        """Многостраничный запуск, который можно продолжить с последней сохраненной страницы"""
+        return bool(self.run_params) and self.status in ('interrupted', 'error')
+
     def mark_completed(self, cars_count=0, images_count=0):
         """Отметить парсинг как завершенный"""
         from django.utils import timezone
@@ -76,4 +129,216 @@ class ParserLog(models.Model):
 
     class Meta:
         verbose_name = "Лог парсинга"
-        verbose_name_plural = "Логи парсинга"
\ No newline at end of file
+        verbose_name_plural = "Логи парсинга"
+
+
+class PageCheckpoint(models.Model):
+    """
+    Сохраненная страница многостраничного запуска. Создается в одной транзакции
+    с данными страницы, поэтому страница либо учтена целиком, либо не учтена вовсе
+    """
+
+    parser_log = models.ForeignKey(ParserLog, on_delete=models.CASCADE, related_name='checkpoints',
+                                   verbose_name="Лог парсинга")
+    page = models.PositiveIntegerField("Страница")
+    cars = models.IntegerField("Автомобилей", default=0)
+    images = models.IntegerField("Изображений", default=0)
+    committed_at = models.DateTimeField("Сохранена", auto_now_add=True)
+
+    def __str__(self):
+        return f"Страница {self.page} ({self.parser_log_id})"
+
+    class Meta:
+        verbose_name = "Контрольная точка страницы"
+        verbose_name_plural = "Контрольные точки страниц"
+        constraints = [
+            models.UniqueConstraint(fields=['parser_log', 'page'], name='unique_checkpoint_page'),
+        ]
+
+
+class PageCrawlStat(models.Model):
+    """Последний обход страницы каталога (адаптивный переобход)"""
+
+    source = models.CharField("Источник", max_length=50, default='japantransit')
+    page = models.PositiveIntegerField("Страница")
+    content_hash = models.CharField("Хеш содержимого", max_length=64, blank=True, default='')
+    lots_count = models.IntegerField("Лотов на странице", default=0)
+    nearest_auction_at = models.DateTimeField("Ближайший аукцион", null=True, blank=True)
+    crawls = models.IntegerField("Обходов", default=0)
+    last_crawled_at = models.DateTimeField("Последний обход", null=True, blank=True)
+    last_changed_at = models.DateTimeField("Последнее изменение", null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.source}: страница {self.page}"
+
+    class Meta:
+        verbose_name = "Статистика страницы"
+        verbose_name_plural = "Статистика страниц"
+        ordering = ['source', 'page']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'page'], name='page_crawl_stat_unique'),
+        ]
+
+
+class LotCrawlStat(models.Model):
+    """
+    Последнее наблюдение лота при адаптивном переобходе. Лоты переходят между
+    страницами (каталог упорядочен по дате аукциона), поэтому изменения
+    считаются по лотам, а не по номерам страниц
+    """
+
+    source = models.CharField("Источник", max_length=50)
+    lot_number = models.CharField("Номер лота", max_length=50)
+    auction_at = models.DateTimeField("Дата аукциона", null=True, blank=True)
+    signature = models.CharField("Хеш значимых полей", max_length=32)
+    checked_at = models.DateTimeField("Последняя проверка")
+
+    def __str__(self):
+        return f"{self.source} {self.lot_number}"
+
+    class Meta:
+        verbose_name = "Наблюдение лота"
+        verbose_name_plural = "Наблюдения лотов"
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'lot_number'], name='lot_crawl_stat_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['source', 'auction_at'], name='lot_crawl_auction_idx'),
+        ]
+
+
+class RecrawlBucketStat(models.Model):
+    """Наблюдаемые изменения лотов сайта по корзине близости аукциона"""
+
+    source = models.CharField("Источник", max_length=50, default='japantransit')
+    bucket = models.CharField("Корзина", max_length=20)
+    changes = models.IntegerField("Обнаружено изменений", default=0)
+    exposure_hours = models.FloatField("Лото-часов наблюдения", default=0)
+
+    def __str__(self):
+        return f"{self.source}: {self.bucket}"
+
+    class Meta:
+        verbose_name = "Статистика корзины переобхода"
+        verbose_name_plural = "Статистика корзин переобхода"
+        ordering = ['source', 'bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'bucket'], name='recrawl_bucket_stat_unique'),
+        ]
+
+
+class ThrottleState(models.Model):
+    """Последнее удачное состояние автоматического регулятора скорости для сайта"""
+
+    host = models.CharField("Сайт", max_length=255, unique=True)
+    delay = models.FloatField("Пауза между запросами, сек")
+    concurrency = models.PositiveIntegerField("Параллельных запросов", default=1)
+    good_delay = models.FloatField("Последняя удачная пауза, сек")
+    good_concurrency = models.PositiveIntegerField("Последнее удачное число запросов", default=1)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    def __str__(self):
+        return f"{self.host}: {self.delay:.1f} сек x {self.concurrency}"
+
+    class Meta:
+        verbose_name = "Состояние регулятора скорости"
+        verbose_name_plural = "Состояния регулятора скорости"
+
+
+
+class MaintenanceJob(models.Model):
+    """Фоновая задача обслуживания данных (очистка, удаление старых лотов) с прогрессом"""
+
+    KIND_CHOICES = [
+        ('purge', 'Полная очистка'),
+        ('retention', 'Удаление старых лотов'),
+    ]
+    STATUS_CHOICES = ParserLog.STATUS_CHOICES
+
+    kind = models.CharField("Тип", max_length=20, choices=KIND_CHOICES)
+    status = models.CharField("Статус", max_length=20, choices=STATUS_CHOICES, default='running')
+    processed = models.IntegerField("Обработано автомобилей", default=0)
+    total = models.IntegerField("Всего автомобилей (оценка)", null=True, blank=True)
+    message = models.TextField("Сообщение", blank=True, default='')
+    created_at = models.DateTimeField("Дата запуска", auto_now_add=True)
+    finished_at = models.DateTimeField("Дата завершения", null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.status}"
+
+    def mark_completed(self, message=''):
+        """Отметить задачу как завершенную"""
+        from django.utils import timezone
+        self.status = 'completed'
+        self.message = message
+        self.finished_at = timezone.now()
+        self.save()
+
+    def mark_error(self, error_message):
+        """Отметить задачу как завершенную с ошибкой"""
+        from django.utils import timezone
+        self.status = 'error'
+        self.message = str(error_message)
+        self.finished_at = timezone.now()
+        self.save()
+
+    class Meta:
+        verbose_name = "Задача обслуживания данных"
+        verbose_name_plural = "Задачи обслуживания данных"
+        ordering = ['-created_at']
+
+
+class SavedSearch(models.Model):
+    """
+    Сохраненный поиск: фильтры списка автомобилей (марка и диапазоны года,
+    цены, пробега). Новые и изменившиеся лоты сверяются с поисками при
+    сохранении (cars.saved_searches), совпадения записываются в SearchMatch.
+    Пустая граница - без ограничения.
+    """
+
+    name = models.CharField("Название", max_length=200, blank=True, default='')
+    brand = models.CharField("Марка", max_length=100, blank=True, default='')
+    year_from = models.PositiveIntegerField("Год от", null=True, blank=True)
+    year_to = models.PositiveIntegerField("Год до", null=True, blank=True)
+    price_from = models.IntegerField("Цена от", null=True, blank=True)
+    price_to = models.IntegerField("Цена до", null=True, blank=True)
+    mileage_from = models.IntegerField("Пробег от", null=True, blank=True)
+    mileage_to = models.IntegerField("Пробег до", null=True, blank=True)
+    is_active = models.BooleanField("Активен", default=True)
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+    # По нему процессы парсинга замечают изменение поисков и перестраивают индекс
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
+
+    def __str__(self):
+        return self.name or f"Поиск {self.pk}"
+
+    class Meta:
+        verbose_name = "Сохраненный поиск"
+        verbose_name_plural = "Сохраненные поиски"
+        ordering = ['-created_at']
+
+
+class SearchMatch(models.Model):
+    """Лот, подошедший под сохраненный поиск после появления или изменения"""
+
+    search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='matches',
+                               verbose_name="Поиск")
+    # Без ограничения в БД: у секционированной cars_car (cars.partitioning) ключ
+    # (id, created_at), внешний ключ на один id создать нельзя. Каскад выполняет Django
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='search_matches',
+                            db_constraint=False, verbose_name="Автомобиль")
+    matched_at = models.DateTimeField("Дата совпадения", auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.search}: {self.car}"
+
+    class Meta:
+        verbose_name = "Совпадение поиска"
+        verbose_name_plural = "Совпадения поисков"
+        constraints = [
+            models.UniqueConstraint(fields=['search', 'car'], name='unique_search_match'),
+        ]
+        indexes = [
+            # Новые совпадения поиска - по убыванию времени
+            models.Index(fields=['search', '-matched_at'], name='search_match_recent_idx'),
+        ]
@@ -0,0 +1,242 @@
+import queue
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection
+from .models import ParserLog
+from .parser import AuctionParser
+from .run_parse import MultiPageParser
+from .transport import CircuitOpenError
+from .profiling import StageTimer
+from .dedupe import DedupeStats
+from .records import batched
+from .checkpoints import Heartbeat
+from .valuation import refresh_scores
+
+
+class PersistenceStage:
+    """
+    Общий этап записи для всех сайтов: страницы приходят в очередь,
+    один поток копит записи по источникам и сохраняет их пачками по
+    batch_size. Очередь ограничена: если запись не успевает, загрузка
+    страниц ждет, а не копит страницы в памяти.
+    """
+
+    def __init__(self, batch_size=100, dry_run=False, delta=False, timings=None, dedupe_stats=None,
+                 max_pending=16):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.delta = delta
+        self.timings = timings or StageTimer()
+        self.parser = AuctionParser(dedupe_stats=dedupe_stats)
+        self.counts = defaultdict(lambda: [0, 0])  # {источник: [автомобили, изображения]}
+        self.failed_batches = 0
+        self.queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def put(self, source, records):
+        self.queue.put((source, records))
+
+    def close(self):
+        """Дожидается записи всех принятых страниц"""
+        self.queue.put(None)
+        self._thread.join()
+        self.parser.transport.close()
+
+    def _run(self):
+        pending = defaultdict(list)
+        try:
+            while (item := self.queue.get()) is not None:
+                source, records = item
+                buffer = pending[source]
+                buffer.extend(records)
+                while len(buffer) >= self.batch_size:
+                    self.flush(source, buffer[:self.batch_size])
+                    del buffer[:self.batch_size]
+            for source, buffer in pending.items():
+                for batch in batched(buffer, self.batch_size):
+                    self.flush(source, batch)
+        finally:
+            # У потока записи свое подключение к БД
+            connection.close()
+
+    def flush(self, source, batch):
+        counts = self.counts[source]
+        if self.dry_run:
+            counts[0] += len(batch)
+            counts[1] += sum(len(car.images) for car in batch)
+            return
+        try:
+            with self.timings.stage('persist'):
+                cars, images = self.parser.save_to_database(batch, update_existing=self.delta)
+        except Exception as e:
+            # Поток записи не должен останавливаться: иначе загрузка всех сайтов встанет на очереди
+            print(f"Ошибка при сохранении пачки {source}: {e}")
+            self.failed_batches += 1
+            return
+        counts[0] += cars
+        counts[1] += images
+
+
+class MultiSiteCrawler:
+    """
+    Обходит каталоги нескольких сайтов (адаптеров) параллельно.
+    На каждый хост - свой поток и свой регулятор скорости (AutoThrottle),
+    так что ограничения одного сайта не тормозят остальные, а два адаптера
+    одного хоста обходятся по очереди. Записи всех сайтов сохраняет общий
+    этап записи (PersistenceStage) пачками.
+    Контрольных точек страниц у такого запуска нет: страницы записываются
+    асинхронно, поэтому прерванный запуск повторяется целиком.
+    """
+
+    def __init__(self, adapters, dry_run=False, delta=False, archive=None, delay=None,
+                 streaming=None, batch_size=100, max_pages=50):
+        # delay - фиксированная пауза между страницами сайта (None - автоподстройка)
+        self.adapters = list(adapters)
+        self.dry_run = dry_run
+        self.delta = delta
+        self.archive = archive
+        self.delay = delay
+        self.streaming = streaming
+        self.batch_size = batch_size
+        self.max_pages = max_pages
+        self.timings = StageTimer()
+        self.dedupe_stats = DedupeStats()
+        self.site_parsers = {}  # {источник: MultiPageParser}
+        self.results = {}  # {источник: итоги обхода}
+
+    def run(self, start_page=1, end_page=None, parser_log=None):
+        """Возвращает (автомобили, изображения, непустые страницы) по всем сайтам"""
+        names = ', '.join(adapter.name for adapter in self.adapters)
+        if not parser_log and not self.dry_run:
+            parser_log = ParserLog.objects.create(url=f"Парсинг сайтов: {names}", status='running')
+        heartbeat = Heartbeat(parser_log.id).start() if parser_log else None
+
+        by_host = defaultdict(list)
+        for adapter in self.adapters:
+            by_host[adapter.host].append(adapter)
+
+        writer = PersistenceStage(self.batch_size, self.dry_run, self.delta, self.timings, self.dedupe_stats)
+        writer.start()
+        threads = [
+            threading.Thread(target=self.crawl_host, args=(adapters, start_page, end_page, writer), daemon=True)
+            for adapters in by_host.values()
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            writer.close()
+            if heartbeat:
+                heartbeat.stop()
+
+        for name, (cars, images) in writer.counts.items():
+            self.results[name].update(cars=cars, images=images)
+        total_cars = sum(result['cars'] for result in self.results.values())
+        total_images = sum(result['images'] for result in self.results.values())
+        total_pages = sum(result['pages'] for result in self.results.values())
+
+        print(f"\n=== ПАРСИНГ САЙТОВ ЗАВЕРШЕН ({names}) ===")
+        for name, result in self.results.items():
+            print(f"{name}: страниц {result['pages']}, автомобилей {result['cars']}, "
+                  f"изображений {result['images']}, ошибок страниц {len(result['failed_pages'])}")
+
+        if parser_log:
+            self.timings.apply_to(parser_log)
+            self.dedupe_stats.apply_to(parser_log)
+            errors = [f"{name}: {result['error']}" for name, result in self.results.items() if result['error']]
+            if len(errors) == len(self.results):
+                parser_log.mark_error('; '.join(errors))
+            else:
+                parser_log.mark_completed(total_cars, total_images)
+                if total_cars and settings.VALUATION_AUTO_REFRESH:
+                    self.refresh_valuations()
+        return total_cars, total_images, total_pages
+
+    def crawl_host(self, adapters, start_page, end_page, writer):
+        """Поток одного хоста: сайты этого хоста по очереди"""
+        try:
+            for adapter in adapters:
+                self.crawl_site(adapter, start_page, end_page, writer)
+        finally:
+            connection.close()
+
+    def crawl_site(self, adapter, start_page, end_page, writer):
+        """Обходит каталог одного сайта, страницы отдаются на общий этап записи"""
+        site_parser = MultiPageParser(
+            dry_run=self.dry_run, archive=self.archive, autothrottle=self.delay is None,
+            streaming=self.streaming, adapter=adapter,
+        )
+        if self.delay is not None:
+            site_parser.delay_between_pages = self.delay
+            site_parser.delay_variation = min(site_parser.delay_variation, self.delay)
+        # Время этапов - общее на запуск
+        site_parser.timings = self.timings
+        self.site_parsers[adapter.name] = site_parser
+        result = self.results[adapter.name] = {
+            'host': adapter.host, 'pages': 0, 'cars': 0, 'images': 0,
+            'failed_pages': site_parser.failed_pages, 'error': None,
+        }
+
+        last_page = end_page or start_page + self.max_pages - 1
+        empty_page_count = 0
+        try:
+            for page in range(start_page, last_page + 1):
+                url = adapter.listing_url(page)
+                print(f"\n=== {adapter.name}: страница {page} ===")
+                try:
+                    records = site_parser.fetch_page_data(url)
+                    cars_data = list(records) if records is not None else None
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    print(f"Ошибка при парсинге страницы {url}: {e}")
+                    site_parser.failed_pages.append(url)
+                    cars_data = None
+
+                if cars_data:
+                    empty_page_count = 0
+                    result['pages'] += 1
+                    if self.archive:
+                        site_parser.write_archive(cars_data)
+                    writer.put(adapter.name, cars_data)
+                elif cars_data is not None:
+                    empty_page_count += 1
+                    # Без заданной последней страницы 3 пустых подряд - конец каталога
+                    if end_page is None and empty_page_count >= 3:
+                        print(f"{adapter.name}: найдено 3 пустых страницы подряд")
+                        break
+
+                if page < last_page:
+                    site_parser.pause()
+        except Exception as e:
+            print(f"Ошибка при обходе {adapter.name}: {e}")
+            result['error'] = str(e)
+        finally:
+            if site_parser.throttle and not self.dry_run:
+                site_parser.throttle.save()
+            site_parser.parser.transport.close()
+
+    def refresh_valuations(self):
+        try:
+            summary = refresh_scores()
+            print(f"Оценка лотов: {summary['lots']} лотов, обновлено {summary['written']}, "
+                  f"недооцененных {summary['underpriced']}")
+        except Exception as e:
+            print(f"Ошибка при пересчете оценок лотов: {e}")
+
+    def summary(self):
+        """Итоги по сайтам для сводки scrape"""
+        return {
+            name: {
+                **result,
+                'throttle': self.site_parsers[name].throttle.state() if self.site_parsers[name].throttle else None,
+            }
+            for name, result in self.results.items()
+        }
@@ -1,55 +1,81 @@
 import os
 import json
-import requests
+import time
 from bs4 import BeautifulSoup
-import re
 from django.utils import timezone
+from django.db import transaction
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from .models import Car, Image, ParserLog
+from .dedupe import DedupeStats, existing_by_key, lock_lot, record_key
+from . import metrics
+from .profiling import StageTimer
+from .transport import HttpTransport, CircuitOpenError
+from .streaming import CarBlockSplitter
+from .adapters import DEFAULT_SOURCE, get_adapter
+from .saved_searches import record_matches
 
 
 class AuctionParser:
-    def __init__(self):
-        self.session = requests.Session()
-        self.setup_headers()
-
-    def setup_headers(self):
-        """Настройка заголовков для обхода защиты"""
-        self.session.headers.update({
+    def __init__(self, concurrency=1, throttle=None, dedupe_stats=None, streaming=None, adapter=None):
+        # concurrency - сколько потоков используют парсер одновременно (размер пула соединений),
+        # throttle - регулятор скорости, которому сообщается о каждом ответе сайта,
+        # dedupe_stats - общие на запуск счетчики повторов лотов без номера,
+        # streaming - разбирать страницы по мере загрузки (по умолчанию PARSER_STREAMING),
+        # adapter - сайт-источник: поиск блоков лотов и извлечение полей (cars.adapters)
+        self.dedupe_stats = dedupe_stats or DedupeStats()
+        self.adapter = adapter or get_adapter()
+        self.streaming = settings.PARSER_STREAMING if streaming is None else streaming
+        self.transport = HttpTransport(
+            headers=self.default_headers(),
+            concurrency=concurrency,
+            http2=settings.PARSER_HTTP2,
+            observer=throttle.observe if throttle else None,
+        )
+
+    def default_headers(self):
+        """Заголовки для обхода защиты (Accept-Encoding выставляет транспорт)"""
+        return {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
             'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
             'DNT': '1',
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
-        })
+        }
 
     def run_parser(self, url, parser_log):
         """
         Основной метод парсинга
         """
+        timings = StageTimer()
         try:
             # Получаем HTML
-            html_content = self.fetch_html(url)
+            with timings.stage('fetch'):
+                html_content = self.fetch_html(url)
             if not html_content:
+                timings.apply_to(parser_log)
                 parser_log.mark_error("Не удалось получить HTML содержимое")
                 return
 
             # Парсим данные
-            cars_data = self.parse_car_data(html_content)
+            with timings.stage('parse'):
+                cars_data = self.parse_car_data(html_content)
 
             if not cars_data:
+                timings.apply_to(parser_log)
                 parser_log.mark_error("Не найдено данных об автомобилях")
                 return
 
-            # Сохраняем в JSON
-            json_filename = self.save_to_json(cars_data, parser_log.id)
+            with timings.stage('persist'):
+                # Сохраняем в JSON
+                json_filename = self.save_to_json(cars_data, parser_log.id)
 
-            # Сохраняем в базу данных
-            cars_count, images_count = self.save_to_database(cars_data)
+                # Сохраняем в базу данных
+                cars_count, images_count = self.save_to_database(cars_data)
 
             # Обновляем лог
+            timings.apply_to(parser_log)
             parser_log.mark_completed(cars_count, images_count)
 
             print(f"Парсинг завершен. Создано: {cars_count} автомобилей, {images_count} изображений")
@@ -60,273 +86,122 @@ class AuctionParser:
 
     def fetch_html(self, url):
         """
-        Получает HTML содержимое по URL
+        Получает HTML содержимое по URL (с повторами при временных ошибках).
+        Если сайт считается недоступным, бросает CircuitOpenError.
         """
+        started = time.perf_counter()
         try:
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            return response.text
+            html_content, size = self.transport.get_text(url)
+            metrics.FETCH_SECONDS.observe(time.perf_counter() - started)
+            metrics.FETCH_RESPONSE_BYTES.observe(size)
+            return html_content
+        except CircuitOpenError:
+            metrics.HTTP_ERRORS.labels('circuit_open').inc()
+            raise
         except Exception as e:
-            print(f"Ошибка при получении HTML: {e}")
-            return None
+            return self.fetch_failed(e)
 
-    def parse_car_data(self, html_content):
+    def open_stream(self, url):
         """
-        Парсит HTML и извлекает данные об автомобилях
+        Как fetch_html, но возвращает тело ответа потоком (TextStream)
+        сразу после получения заголовков. None - страницу не удалось получить
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        cars = []
-
-        # Находим все блоки с автомобилями
-        car_blocks = soup.find_all('div', class_=lambda x: x and 'flex flex-col md:table-row-group' in x)
-
-        print(f"Найдено блоков автомобилей: {len(car_blocks)}")
-
-        for i, block in enumerate(car_blocks):
-            print(f"Обрабатываем блок {i + 1}...")
-            car_data = self.extract_car_from_block(block)
-            if car_data:
-                cars.append(car_data)
-                print(
-                    f"  ✓ Автомобиль: {car_data.get('brand', '')} {car_data.get('model', '')} - Цена: {car_data.get('price', 'не указана')}")
+        try:
+            return self.transport.open_stream(url)
+        except CircuitOpenError:
+            metrics.HTTP_ERRORS.labels('circuit_open').inc()
+            raise
+        except Exception as e:
+            return self.fetch_failed(e)
 
-        return cars
+    def fetch_failed(self, error):
+        reason = str(error.status_code) if getattr(error, 'status_code', None) else type(error).__name__
+        metrics.HTTP_ERRORS.labels(reason).inc()
+        print(f"Ошибка при получении HTML: {error}")
+        return None
 
-    def extract_car_from_block(self, block):
+    def parse_car_data(self, html_content):
         """
-        Извлекает данные об одном автомобиле из блока
+        Парсит HTML и возвращает список записей CarRecord
         """
-        try:
-            car = {}
-
-            # Лот номер
-            lot_info = block.find('span', class_='font-semibold')
-            if lot_info:
-                lot_text = lot_info.get_text(strip=True)
-                car['lot_number'] = re.sub(r'[^\d]', '', lot_text)
-
-            # Марка и модель
-            brand_model_div = block.find('div', class_='mt-1 text-sm font-bold')
-            if brand_model_div:
-                brand_model_text = brand_model_div.get_text(strip=True)
-                car['brand'], car['model'] = self.split_brand_model(brand_model_text)
-
-            # Дата аукциона
-            date_div = block.find('div', class_='text-darkblue')
-            if date_div:
-                car['auction_date'] = date_div.get_text(strip=True)
-
-            # Год выпуска
-            year_span = block.find('span', class_='text-red-700')
-            if year_span:
-                year_text = year_span.get_text(strip=True)
-                year_match = re.search(r'\d{4}', year_text)
-                if year_match:
-                    car['year'] = int(year_match.group())
-
-            # Объем двигателя
-            engine_div = block.find('div', string=lambda x: x and 'cc' in str(x))
-            if engine_div:
-                parent_div = engine_div.parent
-                if parent_div:
-                    engine_text = parent_div.get_text()
-                    engine_match = re.search(r'(\d+)\s*cc', engine_text)
-                    if engine_match:
-                        car['engine_volume'] = engine_match.group(1) + ' cc'
-
-            # Пробег
-            mileage_div = block.find('div', string=lambda x: x and 'км' in str(x))
-            if mileage_div:
-                mileage_text = mileage_div.get_text(strip=True)
-                mileage_match = re.search(r'([\d\s]+)\s*км', mileage_text)
-                if mileage_match:
-                    mileage_clean = mileage_match.group(1).replace(' ', '')
-                    if mileage_clean.isdigit():
-                        car['mileage'] = int(mileage_clean)
-
-            # ЦЕНА - УЛУЧШЕННЫЙ ПАРСИНГ
-            car['price'] = self.extract_price(block)
-
-            # Ссылка на аукцион
-            link = block.find('a', href=lambda x: x and '/auctions/' in x)
-            if link:
-                href = link.get('href', '')
-                if href.startswith('/'):
-                    car['lot_url'] = f"https://japantransit.ru{href}"
-                else:
-                    car['lot_url'] = href
-
-            # Изображения
-            images = []
-            img_links = block.find_all('a', class_=lambda x: x and 'group h-16 w-20 rounded-md' in x)
-            for img_link in img_links:
-                style = img_link.get('style', '')
-                bg_match = re.search(r"url\('([^']+)'\)", style)
-                if bg_match:
-                    images.append(bg_match.group(1))
-
-            if images:
-                car['images'] = images
-
-            return car
-
-        except Exception as e:
-            print(f"Ошибка при парсинге блока: {e}")
-            return None
+        return list(self.iter_car_records(html_content))
 
-    def extract_price(self, block):
+    def iter_car_records(self, html_content):
         """
-        Парсинг цены для элемента с классом rounded-full shadow-lg shadow-red-800/40
+        Парсит HTML и по одной выдает записи CarRecord.
+        Разобранный блок сразу удаляется из дерева, а по окончании
+        дерево разрушается целиком: в дереве BeautifulSoup циклические
+        ссылки, и без decompose() оно живет до прохода сборщика мусора.
         """
-        print("  Поиск цены в блоке...")
-
-        # Ищем конкретный элемент с ценой из вашего примера
-        price_element = block.select_one('div.rounded-full.shadow-lg.shadow-red-800\\/40')
-
-        if not price_element:
-            # Пробуем другие варианты селектора на случай если классы немного отличаются
-            price_element = block.select_one('div.rounded-full.shadow-lg')
-            if not price_element:
-                price_element = block.select_one('[class*="rounded-full"][class*="shadow-lg"]')
-
-        if price_element:
-            price_text = price_element.get_text(strip=True)
-            print(f"  Найден элемент цены: '{price_text}'")
-
-            # Обрабатываем &nbsp; и другие специальные символы
-            price = self.parse_price_text(price_text)
-
-            if price:
-                print(f"  ✓ Цена найдена: {price}")
-                return price
-            else:
-                print(f"  ✗ Не удалось распарсить цену из текста: '{price_text}'")
-
-        # Альтернативный поиск - ищем любые элементы с символом рубля
-        ruble_elements = block.find_all(text=re.compile('[₽р]'))
-        for element in ruble_elements:
-            price_text = element.strip()
-            print(f"  Найден элемент с символом рубля: '{price_text}'")
-            price = self.parse_price_text(price_text)
-            if price:
-                print(f"  ✓ Цена найдена через символ рубля: {price}")
-                return price
-
-        print("  ✗ Цена не найдена")
-        return None
-
-    def parse_price_text(self, price_text):
+        started = time.perf_counter()
+        elapsed = 0.0
+        soup = BeautifulSoup(html_content, 'html.parser')
+        try:
+            # Находим все блоки с автомобилями
+            car_blocks = self.adapter.find_blocks(soup)
+
+            print(f"Найдено блоков автомобилей: {len(car_blocks)}")
+            metrics.BLOCKS_PER_PAGE.observe(len(car_blocks))
+
+            for i, block in enumerate(car_blocks):
+                print(f"Обрабатываем блок {i + 1}...")
+                car = self.extract_car_from_block(block)
+                block.decompose()
+                if car:
+                    print(f"  ✓ Автомобиль: {car.brand} {car.model} - Цена: {car.price or 'не указана'}")
+                    # Время, пока запись обрабатывает потребитель, в разбор страницы не входит
+                    elapsed += time.perf_counter() - started
+                    yield car
+                    started = time.perf_counter()
+        finally:
+            soup.decompose()
+            metrics.PARSE_SECONDS.observe(elapsed + time.perf_counter() - started)
+
+    def iter_stream_records(self, stream):
         """
-        Парсит текст цены, обрабатывает все виды пробелов и специальные символы
+        Разбирает страницу по мере загрузки (поток из open_stream) и по одной
+        выдает записи CarRecord. Блок автомобиля разбирается, как только
+        закрыт его тег, и сразу удаляется: в памяти одна часть ответа и один
+        блок, а не вся страница с деревом. Обрыв соединения посреди страницы -
+        TransportError из итерации (записи страницы откатываются вместе с ней).
         """
-        if not price_text:
-            return None
-
-        print(f"    Парсим текст цены: '{price_text}'")
-        print(f"    Длина текста: {len(price_text)}")
-        print(f"    Коды символов: {[ord(c) for c in price_text]}")
-
-        # Заменяем ВСЕ виды неразрывных пробелов на обычные
-        # Unicode для разных типов неразрывных пробелов:
-        # \xa0 - NO-BREAK SPACE (самый распространенный)
-        # \u202f - NARROW NO-BREAK SPACE
-        # \u2009 - THIN SPACE
-        # \u2007 - FIGURE SPACE
-        # \u2060 - WORD JOINER
-
-        replacements = {
-            '&nbsp;': ' ',
-            '\xa0': ' ',  # NO-BREAK SPACE
-            '\u202f': ' ',  # NARROW NO-BREAK SPACE
-            '\u2009': ' ',  # THIN SPACE
-            '\u2007': ' ',  # FIGURE SPACE
-            '\u2060': ' ',  # WORD JOINER
-            '\u200a': ' ',  # HAIR SPACE
-            '\u200b': '',  # ZERO WIDTH SPACE (удаляем)
-            '\ufeff': '',  # ZERO WIDTH NO-BREAK SPACE (удаляем)
-        }
-
-        clean_text = price_text
-        for old, new in replacements.items():
-            clean_text = clean_text.replace(old, new)
-
-        print(f"    После замены пробелов: '{clean_text}'")
-
-        # Убираем тильду, приблизительные символы и валюту
-        clean_text = re.sub(r'[~≈₽рRUBруб]', '', clean_text, flags=re.IGNORECASE)
-
-        print(f"    После удаления символов: '{clean_text}'")
-
-        # Убираем ВСЕ пробелы
-        clean_text = clean_text.replace(' ', '')
-
-        print(f"    Без пробелов: '{clean_text}'")
-
-        if clean_text and clean_text.isdigit():
-            price = int(clean_text)
-            # Проверяем, что цена реалистичная
-            if 10000 <= price <= 1000000000:  # увеличил до 1 млрд
-                print(f"    ✓ Валидная цена: {price}")
-                return price
-            else:
-                print(f"    ✗ Цена не в диапазоне: {price}")
-        else:
-            print(f"    ✗ Нечисловой текст после очистки: '{clean_text}'")
-
-        return None
-
+        started = time.perf_counter()
+        elapsed = 0.0
+        blocks = 0
+        try:
+            splitter = CarBlockSplitter(self.adapter.block_class, self.adapter.block_tag)
+            for block_html in splitter.iter_blocks(stream):
+                blocks += 1
+                print(f"Обрабатываем блок {blocks}...")
+                soup = BeautifulSoup(block_html, 'html.parser')
+                car = self.extract_car_from_block(soup.find(self.adapter.block_tag))
+                soup.decompose()
+                if car:
+                    print(f"  ✓ Автомобиль: {car.brand} {car.model} - Цена: {car.price or 'не указана'}")
+                    elapsed += time.perf_counter() - started
+                    yield car
+                    started = time.perf_counter()
+        finally:
+            stream.close()
+            print(f"Найдено блоков автомобилей: {blocks}")
+            metrics.BLOCKS_PER_PAGE.observe(blocks)
+            # Ожидание частей ответа относится к загрузке, а не к разбору
+            elapsed += time.perf_counter() - started
+            metrics.PARSE_SECONDS.observe(max(0.0, elapsed - stream.read_seconds))
+            metrics.FETCH_SECONDS.observe(stream.open_seconds + stream.read_seconds)
+            metrics.FETCH_RESPONSE_BYTES.observe(stream.size)
 
-    def split_brand_model(self, text):
+    def extract_car_from_block(self, block):
         """
-        Разделяет текст на марку и модель
+        Извлекает данные об одном автомобиле из блока (селекторы - в адаптере сайта)
         """
-        if not text:
-            return "", ""
-
-        # Очищаем текст
-        text = re.sub(r'&nbsp;', ' ', text)
-        text = re.sub(r'\s+', ' ', text).strip()
-
-        # Специальные случаи (многословные марки)
-        special_cases = {
-            'MERCEDES-BENZ': 'MERCEDES-BENZ',
-            'LAND ROVER': 'LAND ROVER',
-            'ALFA ROMEO': 'ALFA ROMEO',
-            'ASTON MARTIN': 'ASTON MARTIN',
-        }
+        return self.adapter.extract_car(block)
+
+    def parse_auction_date(self, text):
+        return self.adapter.parse_auction_date(text)
 
-        text_upper = text.upper()
-        for multi_brand, brand_name in special_cases.items():
-            if text_upper.startswith(multi_brand):
-                brand = brand_name
-                model = text[len(multi_brand):].strip()
-                return brand.title(), model
-
-        # Известные марки
-        known_brands = [
-            'TOYOTA', 'NISSAN', 'HONDA', 'MAZDA', 'SUBARU', 'MITSUBISHI', 'SUZUKI',
-            'DAIHATSU', 'ISUZU', 'LEXUS', 'INFINITI', 'ACURA', 'BMW', 'AUDI',
-            'VOLKSWAGEN', 'VOLVO', 'FORD', 'CHEVROLET', 'HYUNDAI', 'KIA', 'PEUGEOT',
-            'RENAULT', 'FIAT', 'JEEP', 'CHRYSLER', 'DODGE', 'CADILLAC', 'BUICK',
-        ]
-
-        for brand in known_brands:
-            if text_upper.startswith(brand):
-                brand_part = brand
-                model_part = text[len(brand):].strip()
-                return brand_part.title(), model_part
-
-        # Базовый алгоритм
-        words = text.split()
-        if len(words) == 0:
-            return "", ""
-        elif len(words) == 1:
-            return words[0], ""
-        else:
-            brand = words[0]
-            model = ' '.join(words[1:])
-            model = re.sub(r'^[\s\-–—]+', '', model).strip()
-            return brand, model
+    def parse_engine_cc(self, text):
+        return self.adapter.parse_engine_cc(text)
 
     def save_to_json(self, cars_data, log_id):
         """
@@ -344,69 +219,133 @@ class AuctionParser:
 
         try:
             with open(full_path, 'w', encoding='utf-8') as f:
-                json.dump(cars_data, f, ensure_ascii=False, indent=2)
+                json.dump([car.to_dict() for car in cars_data], f, ensure_ascii=False, indent=2,
+                          cls=DjangoJSONEncoder)
             print(f"Данные сохранены в JSON: {full_path}")
             return full_path
         except Exception as e:
             print(f"Ошибка при сохранении JSON: {e}")
             return None
 
-    def save_to_database(self, cars_data):
+    @metrics.SAVE_SECONDS.time()
+    def save_to_database(self, cars_data, update_existing=False):
         """
-        Сохраняет данные в базу данных Django
+        Сохраняет записи CarRecord (список или поток) в базу данных Django.
+        При update_existing изменившиеся поля существующих лотов обновляются
+        и такие лоты тоже попадают в счетчик.
+        Лоты с номером уникальны в пределах источника (source, lot_number),
+        лоты без номера сопоставляются с сохраненными того же источника по
+        естественному ключу (один запрос на пачку), повторы не создаются заново.
+        Новые и обновленные лоты пачки сверяются с сохраненными поисками.
         """
         cars_count = 0
         images_count = 0
+        matched_cars = []
+        cars_data = list(cars_data)
+        known = existing_by_key(cars_data)
+        keyless = 0
+        duplicates = 0
 
         for car_data in cars_data:
             try:
                 # Проверяем обязательные поля
-                if not car_data.get('brand') or not car_data.get('year'):
+                if not car_data.brand or not car_data.year:
                     print(f"  Пропускаем автомобиль без марки или года: {car_data}")
                     continue
 
-                if car_data.get('lot_number'):
-                    car, created = Car.objects.get_or_create(
-                        lot_number=car_data.get('lot_number'),
-                        defaults={
-                            'brand': car_data.get('brand', ''),
-                            'model': car_data.get('model', ''),
-                            'year': car_data.get('year', 0),
-                            'price': car_data.get('price'),
-                            'mileage': car_data.get('mileage'),
-                            'engine_volume': car_data.get('engine_volume'),
-                            'auction_date': car_data.get('auction_date'),
-                            'lot_url': car_data.get('lot_url'),
-                        }
-                    )
-                else:
-                    car = Car.objects.create(
-                        brand=car_data.get('brand', ''),
-                        model=car_data.get('model', ''),
-                        year=car_data.get('year', 0),
-                        price=car_data.get('price'),
-                        mileage=car_data.get('mileage'),
-                        engine_volume=car_data.get('engine_volume'),
-                        auction_date=car_data.get('auction_date'),
-                        lot_url=car_data.get('lot_url'),
-                    )
-                    created = True
-
+                source = car_data.source or DEFAULT_SOURCE
+                fields = {
+                    'source': source,
+                    'brand': car_data.brand,
+                    'model': car_data.model,
+                    'year': car_data.year,
+                    'price': car_data.price,
+                    'mileage': car_data.mileage,
+                    'engine_volume': car_data.engine_volume,
+                    'auction_date': car_data.auction_date,
+                    'auction_at': car_data.auction_at,
+                    'engine_cc': car_data.engine_cc,
+                    'lot_url': car_data.lot_url,
+                }
+                fields['natural_key'] = key = record_key(car_data)
+                if not car_data.lot_number:
+                    keyless += 1
+
+                # Автомобиль с изображениями - одна транзакция (внутри транзакции
+                # страницы - точка сохранения), ошибка не затрагивает остальные лоты
+                with transaction.atomic():
+                    if car_data.lot_number:
+                        lock_lot(source, car_data.lot_number)
+                        car, created = Car.objects.get_or_create(
+                            source=source, lot_number=car_data.lot_number, defaults=fields,
+                        )
+                    else:
+                        car = known.get((source, key))
+                        created = car is None
+                        if created:
+                            car = Car.objects.create(**fields)
+
+                    updated = not created and update_existing and self.update_changed_fields(car, car_data)
+
+                    # Сохраняем изображения
+                    new_images = 0
+                    for img_url in car_data.images:
+                        img, img_created = Image.objects.get_or_create(
+                            car=car,
+                            url=img_url,
+                            defaults={'created_at': car.created_at},
+                        )
+                        if img_created:
+                            new_images += 1
+                    if new_images and not created and not updated:
+                        # Новые изображения - тоже изменение лота (ETag пакетного запроса)
+                        Car.objects.filter(pk=car.pk).update(updated_at=timezone.now())
+
+                if not car_data.lot_number:
+                    if created:
+                        # Повтор внутри той же пачки тоже найдется
+                        known[(source, key)] = car
+                    else:
+                        duplicates += 1
+                if created or updated:
+                    matched_cars.append(car)
                 if created:
                     cars_count += 1
                     print(f"  Создан автомобиль: {car.brand} {car.model} ({car.year}) - Цена: {car.price}")
-
-                # Сохраняем изображения
-                for img_url in car_data.get('images', []):
-                    img, img_created = Image.objects.get_or_create(
-                        car=car,
-                        url=img_url
-                    )
-                    if img_created:
-                        images_count += 1
+                elif updated:
+                    cars_count += 1
+                    print(f"  Обновлен автомобиль: {car.brand} {car.model} ({car.year}) - Цена: {car.price}")
+                images_count += new_images
 
             except Exception as e:
                 print(f"Ошибка при сохранении автомобиля в БД: {e}")
                 continue
 
-        return cars_count, images_count
\ No newline at end of file
+        if matched_cars:
+            try:
+                with transaction.atomic():
+                    record_matches(matched_cars)
+            except Exception as e:
+                # Лоты уже сохранены, ошибка сверки не должна прерывать парсинг
+                print(f"Ошибка при сверке с сохраненными поисками: {e}")
+
+        metrics.ROWS_WRITTEN.observe(cars_count + images_count)
+        self.dedupe_stats.record(keyless, duplicates)
+        return cars_count, images_count
+
+    def update_changed_fields(self, car, car_data):
+        """
+        Обновляет у существующего автомобиля поля, значения которых изменились.
+        Возвращает True, если что-то было сохранено.
+        """
+        changed_fields = []
+        for field in ('price', 'mileage', 'engine_volume', 'engine_cc',
+                      'auction_date', 'auction_at', 'lot_url'):
+            value = getattr(car_data, field)
+            if value is not None and getattr(car, field) != value:
+                setattr(car, field, value)
+                changed_fields.append(field)
+
+        if changed_fields:
+            car.save(update_fields=changed_fields + ['updated_at'])
+        return bool(changed_fields)
@@ -0,0 +1,249 @@
+import re
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Car, Image
+
+# Таблицы, которые можно секционировать по месяцу created_at.
+# created_at не меняется после вставки, поэтому строки не переезжают между секциями,
+# а изображения попадают в тот же месяц, что и их автомобиль.
+PARTITIONED_MODELS = (Car, Image)
+PARTITION_KEY = 'created_at'
+# Уникальные ограничения без ключа секций: в секционированной таблице они
+# становятся обычными индексами, уникальность при записи держит блокировка
+# по ключу (cars.dedupe.lock_lot)
+LOCK_ENFORCED_UNIQUE = {'car_source_lot_unique'}
+
+
+class PartitioningError(Exception):
+    """Секционирование невозможно или не включено"""
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+
+
+def partition_name(model, month):
+    return f"{model._meta.db_table}_p{month:%Y%m}"
+
+
+def require_postgresql():
+    if connection.vendor != 'postgresql':
+        raise PartitioningError("Секционирование поддерживается только на PostgreSQL")
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def is_partitioned(model):
+    """Таблица модели уже секционирована"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+                       [model._meta.db_table])
+        return cursor.fetchone() is not None
+
+
+def list_partitions(model):
+    """
+    Секции таблицы: [(имя, начало или None, конец или None, оценка строк)].
+    None - открытая граница (MINVALUE/MAXVALUE) или секция DEFAULT.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            ORDER BY c.relname
+            """,
+            [model._meta.db_table],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound, rows_estimate in rows:
+        lower, upper = parse_bound(bound)
+        partitions.append((name, lower, upper, max(rows_estimate, 0)))
+    return partitions
+
+
+def parse_bound(bound):
+    """Границы из выражения FOR VALUES FROM (...) TO (...)"""
+    match = re.search(r"FROM \((.+?)\) TO \((.+?)\)", bound or '')
+    if not match:
+        return None, None
+    return tuple(
+        parse_datetime(value.strip("'")) if value.startswith("'") else None
+        for value in match.groups()
+    )
+
+
+def enable_partitioning(model):
+    """
+    Переводит таблицу на секционирование по месяцу created_at.
+
+    Данные не копируются: существующая таблица переименовывается в *_legacy
+    и подключается секцией для всех строк до конца текущего месяца, дальше
+    идут помесячные секции. Первичный ключ становится (id, created_at),
+    ограничения из LOCK_ENFORCED_UNIQUE - обычными индексами, а
+    внешние ключи на таблицу удаляются - PostgreSQL не поддерживает ссылки
+    на секционированную таблицу без ключа секционирования (каскадное
+    удаление изображений выполняет Django).
+    При подключении старая таблица проверяется полным проходом под
+    эксклюзивной блокировкой - запускайте в окно обслуживания.
+    """
+    require_postgresql()
+    if is_partitioned(model):
+        raise PartitioningError(f"Таблица {model._meta.db_table} уже секционирована")
+
+    table = model._meta.db_table
+    legacy = f"{table}_legacy"
+    pk_column = model._meta.pk.column
+    sequence = f"{table}_{pk_column}_seq"
+    legacy_upper = add_months(month_start(timezone.now()), 1)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+
+        cursor.execute(
+            """
+            SELECT conname, conrelid::regclass::text FROM pg_constraint
+            WHERE contype = 'f' AND confrelid = %s::regclass
+            """,
+            [table],
+        )
+        for constraint, referencing_table in cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {referencing_table} DROP CONSTRAINT {quote(constraint)}")
+
+        cursor.execute(
+            """
+            SELECT i.relname, pg_get_indexdef(i.oid), x.indisunique, x.indisprimary
+            FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = %s::regclass
+            """,
+            [table],
+        )
+        indexes = cursor.fetchall()
+        for index, definition, unique, primary in indexes:
+            if unique and not primary and index not in LOCK_ENFORCED_UNIQUE:
+                raise PartitioningError(
+                    f"Уникальный индекс {index} не содержит {PARTITION_KEY}, секционирование невозможно"
+                )
+
+        cursor.execute(f"SELECT COALESCE(MAX({quote(pk_column)}), 0) + 1 FROM {quote(table)}")
+        next_id = cursor.fetchone()[0]
+
+        # Освобождаем имена таблицы, индексов и последовательности для новой таблицы
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}")
+        for index, definition, unique, primary in indexes:
+            cursor.execute(f"ALTER INDEX {quote(index)} RENAME TO {quote(legacy_name(index))}")
+        cursor.execute(f"ALTER TABLE {quote(legacy)} ALTER COLUMN {quote(pk_column)} DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {quote(legacy)} ALTER COLUMN {quote(pk_column)} DROP DEFAULT")
+        cursor.execute(f"DROP SEQUENCE IF EXISTS {quote(sequence)}")
+
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(legacy)} "
+            f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS) "
+            f"PARTITION BY RANGE ({quote(PARTITION_KEY)})"
+        )
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.{quote(pk_column)}")
+        cursor.execute("SELECT setval(%s, %s, false)", [sequence, next_id])
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk_column)} "
+            f"SET DEFAULT nextval('{sequence}'::regclass)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD PRIMARY KEY ({quote(pk_column)}, {quote(PARTITION_KEY)})"
+        )
+        for index, definition, unique, primary in indexes:
+            if not primary:
+                if index in LOCK_ENFORCED_UNIQUE:
+                    definition = definition.replace('CREATE UNIQUE INDEX', 'CREATE INDEX', 1)
+                # Определение индекса уже ссылается на имя новой таблицы
+                cursor.execute(definition)
+
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(legacy)} "
+            f"FOR VALUES FROM (MINVALUE) TO (%s)",
+            [legacy_upper],
+        )
+        cursor.execute(f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT")
+
+
+def legacy_name(index):
+    # Имена в PostgreSQL ограничены 63 байтами
+    return f"{index[:55]}_legacy"
+
+
+def create_partition(model, month):
+    """
+    Создает секцию на месяц. Строки этого месяца, успевшие попасть
+    в секцию DEFAULT, переносятся в новую секцию.
+    """
+    table = model._meta.db_table
+    name = partition_name(model, month)
+    lower, upper = month, add_months(month, 1)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE partition_moved ON COMMIT DROP AS "
+            f"WITH moved AS (DELETE FROM {quote(table + '_default')} "
+            f"WHERE {quote(PARTITION_KEY)} >= %s AND {quote(PARTITION_KEY)} < %s RETURNING *) "
+            f"SELECT * FROM moved",
+            [lower, upper],
+        )
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper],
+        )
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM partition_moved")
+    return name
+
+
+def ensure_partitions(model, months_ahead=3):
+    """Создает недостающие секции на текущий и months_ahead следующих месяцев"""
+    if not is_partitioned(model):
+        raise PartitioningError(f"Таблица {model._meta.db_table} не секционирована (manage_partitions --enable)")
+
+    covered_until = max(
+        (upper for name, lower, upper, rows in list_partitions(model) if upper), default=None,
+    )
+    created = []
+    month = month_start(timezone.now())
+    for offset in range(months_ahead + 1):
+        current = add_months(month, offset)
+        if covered_until and current < covered_until:
+            continue
+        created.append(create_partition(model, current))
+    return created
+
+
+def expire_partitions(model, retain_months, drop=False):
+    """
+    Отключает (drop=True - удаляет) секции, все строки которых старше
+    retain_months месяцев. Отключенная секция остается обычной таблицей
+    для архивирования. Возвращает имена обработанных секций.
+    """
+    if not is_partitioned(model):
+        raise PartitioningError(f"Таблица {model._meta.db_table} не секционирована (manage_partitions --enable)")
+
+    table = model._meta.db_table
+    cutoff = add_months(month_start(timezone.now()), -retain_months)
+    expired = [
+        name for name, lower, upper, rows in list_partitions(model)
+        if upper is not None and upper <= cutoff
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name in expired:
+            cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+            if drop:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+    return expired
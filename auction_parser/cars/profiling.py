@@ -0,0 +1,132 @@
+import io
+import time
+import marshal
+import pstats
+import cProfile
+import resource
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+STAGES = ('fetch', 'parse', 'persist', 'sleep')
+# До Python 3.12 cProfile видит только поток, в котором включен; с 3.12
+# он работает через sys.monitoring и видит все потоки процесса
+PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+class StageTimer:
+    """
+    Суммарное время по этапам запуска: загрузка, разбор, запись в БД, паузы.
+    В многопоточном режиме время потоков складывается.
+    """
+
+    def __init__(self):
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.totals[name] += elapsed
+
+    def move(self, source, target, seconds):
+        """Переносит время из одного этапа в другой (этапы, идущие вперемешку)"""
+        with self._lock:
+            self.totals[source] -= seconds
+            self.totals[target] += seconds
+
+    def iterate(self, name, iterable):
+        """
+        Проходит по потоку, относя к этапу только время получения элементов
+        (обработка элементов потребителем в этап не входит)
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def apply_to(self, parser_log):
+        """Переносит замеры в поля ParserLog (без сохранения)"""
+        parser_log.fetch_seconds = round(self.totals['fetch'], 3)
+        parser_log.parse_seconds = round(self.totals['parse'], 3)
+        parser_log.persist_seconds = round(self.totals['persist'], 3)
+        parser_log.sleep_seconds = round(self.totals['sleep'], 3)
+        parser_log.peak_memory_kb = peak_rss_kb()
+
+
+def peak_rss_kb():
+    """Пиковое потребление памяти процессом (RSS), КБ"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class RunProfiler:
+    """
+    Профилирование запуска: cProfile и снимок tracemalloc (память всех потоков).
+    Потоки, запущенные во время профилирования (многопоточный режим), до
+    Python 3.12 профилируются отдельными cProfile, и статистика складывается.
+    Результат - файл статистики pstats и текстовый отчет о памяти.
+    """
+
+    def __init__(self, top_allocations=30):
+        self.top_allocations = top_allocations
+        self.profile = cProfile.Profile()
+        self.thread_profiles = []  # профили рабочих потоков
+        self._lock = threading.Lock()
+        self.profile_data = None
+        self.report = ''
+
+    def start(self):
+        tracemalloc.start()
+        self.profile.enable()
+        if not PROFILES_ALL_THREADS:
+            threading.setprofile(self._profile_thread)
+
+    def _profile_thread(self, frame, event, arg):
+        # Вызывается первым событием нового потока: включенный cProfile
+        # заменяет эту функцию своей на все время жизни потока
+        profile = cProfile.Profile()
+        with self._lock:
+            self.thread_profiles.append(profile)
+        profile.enable()
+
+    def stop(self):
+        if not tracemalloc.is_tracing():
+            return
+        self.profile.disable()
+        threading.setprofile(None)
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Рабочие потоки к этому моменту завершены
+        stats = pstats.Stats(self.profile)
+        with self._lock:
+            for profile in self.thread_profiles:
+                stats.add(profile)
+        self.profile_data = marshal.dumps(stats.stats)
+
+        report = io.StringIO()
+        report.write(f"tracemalloc: текущая {current / 1024:.0f} КБ, пик {peak / 1024:.0f} КБ\n\n")
+        report.write(f"Топ-{self.top_allocations} мест выделения памяти:\n")
+        for stat in snapshot.statistics('lineno')[:self.top_allocations]:
+            report.write(f"{stat}\n")
+
+        report.write("\nТоп-30 функций по суммарному времени:\n")
+        stats.stream = report
+        stats.sort_stats('cumulative').print_stats(30)
+        self.report = report.getvalue()
+
+    def apply_to(self, parser_log):
+        """Переносит результаты в поля ParserLog (без сохранения)"""
+        parser_log.profile_data = self.profile_data
+        parser_log.profile_report = self.report
@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import OperationalError, connections, router
+from django.db.models import F, Q
+from . import metrics
+
+# Защита БД от тяжелых запросов из параметров пользователя (список автомобилей):
+# сортировки только по индексам, ограниченный размер страницы, поиск по началу
+# строки (индексы UPPER(...) text_pattern_ops), лимит времени запроса на уровне БД.
+# Отклоненные запросы считаются в web_query_rejections_total{view, reason}.
+
+# Допустимые сортировки -> упорядочивание по индексированным полям;
+# id - для устойчивого порядка при равных значениях
+SORT_ORDERINGS = {
+    '-created_at': ('-created_at', '-id'),
+    'created_at': ('created_at', 'id'),
+    '-price': ('-price', '-id'),
+    'price': ('price', 'id'),
+    '-year': ('-year', '-id'),
+    'year': ('year', 'id'),
+    '-mileage': ('-mileage', '-id'),
+    'mileage': ('mileage', 'id'),
+    '-auction_at': ('-auction_at', '-id'),
+    'auction_at': ('auction_at', 'id'),
+    '-engine_cc': ('-engine_cc', '-id'),
+    'engine_cc': ('engine_cc', 'id'),
+    # Лоты без оценки - в конце при любом направлении
+    'price_zscore': (F('price_zscore').asc(nulls_last=True), 'id'),
+    '-price_zscore': (F('price_zscore').desc(nulls_last=True), 'id'),
+}
+DEFAULT_SORT = '-created_at'
+# Поиск: не больше слов и символов в слове
+MAX_SEARCH_TERMS = 4
+MAX_SEARCH_TERM_LENGTH = 50
+# Код ошибки PostgreSQL при отмене запроса по statement_timeout
+QUERY_CANCELED = '57014'
+
+
+class QueryRejected(Exception):
+    """Параметры запроса отклонены до обращения к БД (reason - метка метрики)"""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+def reject(view, reason):
+    metrics.QUERY_REJECTIONS.labels(view, reason).inc()
+
+
+def parse_int(params, name, minimum=None, maximum=None, default=None):
+    """Целое из параметра запроса (пустое - default) в допустимых границах"""
+    value = params.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise QueryRejected('invalid', f"Параметр {name} должен быть целым числом")
+    if minimum is not None and value < minimum or maximum is not None and value > maximum:
+        raise QueryRejected('out_of_range', f"Параметр {name} должен быть от {minimum} до {maximum}")
+    return value
+
+
+def page_size(params, default=50):
+    return parse_int(params, 'per_page', minimum=1, maximum=settings.CARS_MAX_PER_PAGE, default=default)
+
+
+def ordering(sort):
+    """Упорядочивание для параметра sort из списка допустимых"""
+    sort = sort or DEFAULT_SORT
+    if sort not in SORT_ORDERINGS:
+        raise QueryRejected('sort', f"Недопустимая сортировка: {sort}")
+    return SORT_ORDERINGS[sort]
+
+
+def check_range(name, low, high):
+    """Пустой диапазон (от > до) отклоняется без запроса к БД"""
+    if low is not None and high is not None and low > high:
+        raise QueryRejected('empty_range', f"Пустой диапазон {name}: {low} > {high}")
+
+
+def search_filter(search):
+    """
+    Условие поиска по словам: каждое слово - начало марки или модели
+    (или точный номер лота). Подстрока в середине (LIKE '%...%') индексом
+    не обслуживается, поэтому не используется.
+    """
+    terms = search.split()
+    if len(terms) > MAX_SEARCH_TERMS:
+        raise QueryRejected('search', f"В поиске не больше {MAX_SEARCH_TERMS} слов")
+    condition = Q()
+    for term in terms:
+        if len(term) > MAX_SEARCH_TERM_LENGTH:
+            raise QueryRejected('search', f"Слово поиска длиннее {MAX_SEARCH_TERM_LENGTH} символов")
+        term_condition = Q(brand__istartswith=term) | Q(model__istartswith=term)
+        if term.isdigit():
+            term_condition |= Q(lot_number=term)
+        condition &= term_condition
+    return condition
+
+
+@contextmanager
+def statement_timeout(model, milliseconds=None):
+    """
+    Ограничивает время каждого запроса чтения модели внутри блока (PostgreSQL,
+    statement_timeout на подключении, по которому читает модель - основном или
+    реплике). Дольше выполняющийся запрос отменяется самой БД.
+    """
+    milliseconds = settings.WEB_STATEMENT_TIMEOUT_MS if milliseconds is None else milliseconds
+    connection = connections[router.db_for_read(model) or 'default']
+    if connection.vendor != 'postgresql' or not milliseconds:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SET statement_timeout = %s", [int(milliseconds)])
+    try:
+        yield
+    finally:
+        # Подключение переиспользуется следующими запросами - возвращаем значение по умолчанию
+        with connection.cursor() as cursor:
+            cursor.execute("RESET statement_timeout")
+
+
+def is_statement_timeout(error):
+    """Ошибка - отмена запроса по statement_timeout"""
+    return isinstance(error, OperationalError) and getattr(error.__cause__, 'pgcode', None) == QUERY_CANCELED
@@ -0,0 +1,37 @@
+from dataclasses import dataclass, fields
+from datetime import datetime
+from itertools import islice
+
+
+@dataclass(slots=True)
+class CarRecord:
+    """
+    Данные одного лота, извлеченные со страницы каталога.
+    Компактная замена словарю: фиксированный набор полей без __dict__.
+    """
+    lot_number: str | None = None
+    brand: str = ''
+    model: str = ''
+    year: int | None = None
+    price: int | None = None
+    mileage: int | None = None
+    engine_volume: str | None = None
+    engine_cc: int | None = None
+    auction_date: str | None = None
+    auction_at: datetime | None = None
+    lot_url: str | None = None
+    images: tuple = ()
+    source: str | None = None  # имя адаптера сайта (Car.source)
+
+    def to_dict(self):
+        """Словарь для JSON-выгрузки и архива"""
+        data = {field.name: getattr(self, field.name) for field in fields(self)}
+        data['images'] = list(self.images)
+        return data
+
+
+def batched(iterable, size):
+    """Разбивает поток записей на списки по size штук (последний может быть короче)"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
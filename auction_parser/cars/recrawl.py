@@ -0,0 +1,266 @@
+import math
+import hashlib
+import statistics
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .adapters import DEFAULT_SOURCE
+from .models import LotCrawlStat, PageCrawlStat, RecrawlBucketStat
+
+# Корзины по близости аукциона и априорная частота изменений лота (изменений в час).
+# Чем ближе аукцион, тем чаще меняются цены и статусы лотов.
+BUCKETS = [
+    # (название, верхняя граница в часах до аукциона, априорная частота)
+    ('ended', 0, 0.01),
+    ('0-1d', 24, 0.5),
+    ('1-3d', 72, 0.2),
+    ('3-7d', 168, 0.08),
+    ('7d+', None, 0.03),
+]
+UNKNOWN_BUCKET = 'unknown'
+UNKNOWN_PRIOR = 1.0
+# Пустые страницы за концом каталога проверяем редко: каталог растет медленно
+EMPTY_PRIOR = 0.01
+# Вес априорной оценки, выраженный в "лото-часах наблюдения"
+PRIOR_WEIGHT_HOURS = 24
+# Лотов на странице, пока не обойдено ни одной непустой страницы
+DEFAULT_PAGE_SIZE = 50
+# Наблюдения лотов, чей аукцион прошел раньше, удаляются при записи обхода
+KEEP_ENDED = timedelta(days=7)
+
+
+class RecrawlScheduler:
+    """
+    Выбирает страницы каталога сайта source для переобхода в пределах бюджета
+    запросов. Вся статистика (страницы, лоты, корзины) ведется по сайтам отдельно.
+
+    Изменения считаются по лотам: при обходе страницы каждый лот сравнивается
+    со своим прошлым наблюдением, а изменения и время наблюдения копятся
+    по корзинам близости аукциона (на момент прошлой проверки лота).
+    Частота изменений корзины сглаживается априорной оценкой.
+
+    Каталог упорядочен по дате аукциона, и лоты сдвигаются к началу по мере
+    завершения торгов, поэтому состав страниц восстанавливается при выборе:
+    известные лоты с непрошедшим аукционом сортируются по дате и режутся
+    по размеру страницы. Вероятность изменения страницы -
+    1 - exp(-sum(rate * hours)) по ее лотам, в бюджет попадают страницы
+    с наибольшей вероятностью.
+    """
+
+    def __init__(self, max_page=None, source=DEFAULT_SOURCE):
+        self.max_page = max_page  # ограничение номера страницы сверху
+        self.source = source  # сайт-источник (Car.source)
+
+    def select_pages(self, budget, now=None):
+        """
+        Возвращает до budget номеров страниц в порядке приоритета
+        """
+        now = now or timezone.now()
+        candidates = [
+            (probability, page) for page, probability in self.page_probabilities(now).items()
+            if not self.max_page or page <= self.max_page
+        ]
+        # При равной вероятности раньше идут страницы с меньшим номером (ближние аукционы)
+        candidates.sort(key=lambda item: (-item[0], item[1]))
+        return [page for probability, page in candidates[:budget]]
+
+    def page_probabilities(self, now):
+        """Номер страницы -> вероятность того, что она изменилась с последней проверки"""
+        rates = self.bucket_rates(self.source)
+        stats = {stat.page: stat for stat in PageCrawlStat.objects.filter(source=self.source)}
+
+        candidates = []
+        mapped_pages = self.expected_pages(now, self.page_size(stats.values()))
+        for page, lots in mapped_pages.items():
+            expected_changes = sum(
+                self.rate_for(rates, self.bucket_for(auction_at, now))
+                * self.hours_between(checked_at, now)
+                for auction_at, checked_at in lots
+            )
+            candidates.append((1 - math.exp(-expected_changes), page))
+
+        # Обойденные страницы за известными лотами: пустые (конец каталога)
+        # или с лотами без даты аукциона
+        for page, stat in stats.items():
+            if page in mapped_pages:
+                continue
+            rate = EMPTY_PRIOR if stat.lots_count == 0 else UNKNOWN_PRIOR
+            candidates.append((1 - math.exp(-rate * self.hours_between(stat.last_crawled_at, now)), page))
+
+        # Следующая неизвестная страница - кандидат для разведки,
+        # если она не лежит за уже найденным концом каталога
+        known_pages = set(stats) | set(mapped_pages)
+        empty_pages = [page for page, stat in stats.items() if stat.lots_count == 0 and page not in mapped_pages]
+        next_page = 1
+        while next_page in known_pages:
+            next_page += 1
+        if not empty_pages or next_page < min(empty_pages):
+            candidates.append((1.0, next_page))
+
+        return {page: probability for probability, page in candidates}
+
+    def expected_pages(self, now, page_size):
+        """
+        Номер страницы -> [(дата аукциона, последняя проверка)] ее лотов:
+        известные лоты с непрошедшим аукционом в порядке каталога
+        """
+        lots = (
+            LotCrawlStat.objects.filter(source=self.source, auction_at__gte=now)
+            .order_by('auction_at', 'lot_number')
+            .values_list('auction_at', 'checked_at')
+        )
+        pages = {}
+        for position, lot in enumerate(lots.iterator()):
+            pages.setdefault(position // page_size + 1, []).append(lot)
+        return pages
+
+    @staticmethod
+    def page_size(stats):
+        sizes = [stat.lots_count for stat in stats if stat.lots_count]
+        return int(statistics.median(sizes)) if sizes else DEFAULT_PAGE_SIZE
+
+    def record_crawl(self, page, cars_data, now=None):
+        """
+        Сохраняет результат обхода страницы и наблюдения ее лотов.
+        Возвращает True, если содержимое страницы изменилось
+        """
+        now = now or timezone.now()
+        cars_data = cars_data or []
+        stat, created = PageCrawlStat.objects.get_or_create(source=self.source, page=page)
+
+        content_hash = self.page_signature(cars_data)
+        changed = not created and bool(stat.content_hash) and stat.content_hash != content_hash
+        if changed:
+            stat.last_changed_at = now
+
+        auction_dates = [car.auction_at for car in cars_data if car.auction_at]
+        stat.nearest_auction_at = min(auction_dates) if auction_dates else None
+        stat.lots_count = len(cars_data)
+        stat.content_hash = content_hash
+        stat.crawls += 1
+        stat.last_crawled_at = now
+        with transaction.atomic():
+            stat.save()
+            self.record_lots(cars_data, now)
+            LotCrawlStat.objects.filter(source=self.source, auction_at__lt=now - KEEP_ENDED).delete()
+
+        return changed
+
+    def record_lots(self, cars_data, now):
+        """Сравнивает лоты с прошлыми наблюдениями и копит изменения по корзинам"""
+        observed = {car.lot_number: car for car in cars_data if car.lot_number}
+        if not observed:
+            return
+        known = {
+            lot.lot_number: lot
+            for lot in LotCrawlStat.objects.filter(source=self.source, lot_number__in=list(observed))
+        }
+
+        totals = defaultdict(lambda: [0, 0.0])  # корзина -> [изменения, лото-часы]
+        new_lots = []
+        for lot_number, car in observed.items():
+            signature = self.lot_signature(car)
+            lot = known.get(lot_number)
+            if lot is None:
+                new_lots.append(LotCrawlStat(
+                    source=self.source, lot_number=lot_number, auction_at=car.auction_at,
+                    signature=signature, checked_at=now,
+                ))
+                continue
+            # Интервал относится к корзине, в которой лот был при прошлой проверке
+            bucket = self.bucket_for(lot.auction_at, lot.checked_at)
+            totals[bucket][0] += lot.signature != signature
+            totals[bucket][1] += self.hours_between(lot.checked_at, now)
+            lot.auction_at, lot.signature, lot.checked_at = car.auction_at, signature, now
+
+        LotCrawlStat.objects.bulk_update(list(known.values()), ['auction_at', 'signature', 'checked_at'])
+        LotCrawlStat.objects.bulk_create(new_lots, ignore_conflicts=True)
+        for bucket, (changes, hours) in totals.items():
+            RecrawlBucketStat.objects.get_or_create(source=self.source, bucket=bucket)
+            RecrawlBucketStat.objects.filter(source=self.source, bucket=bucket).update(
+                changes=F('changes') + changes, exposure_hours=F('exposure_hours') + hours,
+            )
+
+    @staticmethod
+    def page_signature(cars_data):
+        """Хеш значимых полей лотов страницы (порядок лотов не важен)"""
+        rows = sorted(
+            '|'.join(str(getattr(car, field) or '') for field in ('lot_number', 'price', 'auction_date', 'mileage'))
+            for car in cars_data
+        )
+        return hashlib.sha256('\n'.join(rows).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def lot_signature(car):
+        """Хеш полей лота, изменение которых считается изменением"""
+        row = '|'.join(str(getattr(car, field) or '') for field in ('price', 'auction_date', 'mileage'))
+        return hashlib.md5(row.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def hours_between(start, end):
+        """Часы от start до end (0, если одна из дат неизвестна)"""
+        if not start or not end:
+            return 0.0
+        return max(0.0, (end - start).total_seconds() / 3600)
+
+    @staticmethod
+    def bucket_for(auction_at, moment):
+        """Корзина лота по близости аукциона на момент moment"""
+        if not auction_at:
+            return UNKNOWN_BUCKET
+        hours_left = (auction_at - moment).total_seconds() / 3600
+        for name, upper_hours, prior in BUCKETS:
+            if upper_hours is None or hours_left < upper_hours:
+                return name
+        return UNKNOWN_BUCKET
+
+    @staticmethod
+    def bucket_rates(source=DEFAULT_SOURCE):
+        """Сглаженная частота изменений лота сайта по корзинам (изменений в час)"""
+        observed = {stat.bucket: stat for stat in RecrawlBucketStat.objects.filter(source=source)}
+        rates = {}
+        for name, upper, prior in BUCKETS:
+            stat = observed.get(name)
+            changes, hours = (stat.changes, stat.exposure_hours) if stat else (0, 0.0)
+            rates[name] = (changes + prior * PRIOR_WEIGHT_HOURS) / (hours + PRIOR_WEIGHT_HOURS)
+        return rates
+
+    @staticmethod
+    def rate_for(rates, bucket):
+        return rates.get(bucket, UNKNOWN_PRIOR)
+
+    @classmethod
+    def freshness_by_bucket(cls, now=None, source=DEFAULT_SOURCE):
+        """
+        Метрики свежести по корзинам: число лотов, средний возраст данных,
+        средняя вероятность устаревания, наблюдаемая и сглаженная частота изменений
+        """
+        now = now or timezone.now()
+        rates = cls.bucket_rates(source)
+        buckets = {}
+        lots = LotCrawlStat.objects.filter(source=source).values_list('auction_at', 'checked_at')
+        for auction_at, checked_at in lots.iterator():
+            bucket = cls.bucket_for(auction_at, now)
+            age = cls.hours_between(checked_at, now)
+            item = buckets.setdefault(bucket, {'lots': 0, 'age_hours': 0.0, 'stale_probability': 0.0})
+            item['lots'] += 1
+            item['age_hours'] += age
+            item['stale_probability'] += 1 - math.exp(-cls.rate_for(rates, bucket) * age)
+
+        observed = {stat.bucket: stat for stat in RecrawlBucketStat.objects.filter(source=source)}
+        result = {}
+        for bucket, item in buckets.items():
+            lots_count = item['lots']
+            stat = observed.get(bucket)
+            result[bucket] = {
+                'lots': lots_count,
+                'avg_age_hours': round(item['age_hours'] / lots_count, 2),
+                'avg_stale_probability': round(item['stale_probability'] / lots_count, 3),
+                'observed_changes_per_hour': (
+                    round(stat.changes / stat.exposure_hours, 4) if stat and stat.exposure_hours else None
+                ),
+                'changes_per_hour': round(cls.rate_for(rates, bucket), 4),
+            }
+        return result
@@ -1,34 +1,78 @@
 import time
+import json
 import random
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
+from django.conf import settings
 from .parser import AuctionParser
+from .adapters import get_adapter
 from .models import ParserLog
+from .profiling import StageTimer, RunProfiler
+from .transport import CircuitOpenError
+from .throttle import AutoThrottle
+from .records import batched
+from .valuation import refresh_scores
+from .dedupe import DedupeStats
+from .checkpoints import RunProgress, Heartbeat, commit_page, reset_totals
 import threading
 
 
 class MultiPageParser:
-    def __init__(self):
-        self.parser = AuctionParser()
-        self.base_url = "https://japantransit.ru/auctions/?sortstat=AUCTION_DATE+asc&page={}"
-        self.delay_between_pages = 3  # секунды между страницами
+    def __init__(self, dry_run=False, delta=False, archive=None, profile=False, autothrottle=True,
+                 streaming=None, adapter=None):
+        # adapter - сайт-источник (cars.adapters), по умолчанию japantransit.ru
+        self.adapter = adapter or get_adapter()
+        self.delay_between_pages = 3  # секунды между страницами (без автоподстройки)
         self.delay_variation = 2  # ± секунды для случайной задержки
+        # Автоподстройка скорости по ответам сайта, стартует с последней удачной скорости
+        self.throttle = (
+            AutoThrottle.for_url(self.base_url, delay=self.delay_between_pages) if autothrottle else None
+        )
+        self.dedupe_stats = DedupeStats()  # повторы лотов без номера за запуск
+        # streaming - разбор страниц по мере загрузки (None - по настройке PARSER_STREAMING)
+        self.parser = AuctionParser(
+            throttle=self.throttle, dedupe_stats=self.dedupe_stats, streaming=streaming, adapter=self.adapter,
+        )
         self.max_pages = 50  # максимальное количество страниц для парсинга
+        self.dry_run = dry_run  # парсить без записи в БД
+        self.delta = delta  # обновлять изменившиеся лоты вместо пропуска
+        self.archive = archive  # файл для архива спарсенных записей (JSON Lines)
+        self.failed_pages = []  # страницы, которые не удалось получить или обработать
+        self._archive_lock = threading.Lock()
+        self.timings = StageTimer()  # суммарное время по этапам запуска
+        self.profiler = RunProfiler() if profile else None  # cProfile + tracemalloc по запросу
+        self.throttled_slots = False  # многопоточный режим: запросы идут через слоты регулятора
+        self.batch_size = 20  # записей в одной пачке архива и сохранения в БД
+        self.progress = RunProgress()  # сохраненные страницы запуска (контрольные точки)
+        self.heartbeat = None
+
+    @property
+    def base_url(self):
+        """URL страницы каталога с {} вместо номера (из адаптера сайта)"""
+        return self.adapter.listing_url_template
+
+    @base_url.setter
+    def base_url(self, value):
+        self.adapter.listing_url_template = value
 
     def run_multi_page_parser(self, start_page=1, end_page=None, parser_log=None):
         """
         Запускает парсинг нескольких страниц
         """
+        self.begin_run()
         try:
-            if not parser_log:
+            if not parser_log and not self.dry_run:
                 # Создаем новый лог если не передан
                 parser_log = ParserLog.objects.create(
                     url=f"Многостраничный парсинг с {start_page}",
                     status='running'
                 )
-
-            total_cars = 0
-            total_images = 0
-            successful_pages = 0
+            self.track(parser_log, {
+                'start_page': start_page, 'end_page': end_page, 'concurrency': 1,
+                'max_pages': self.max_pages, 'delta': self.delta, 'source': self.adapter.name,
+            })
 
             if end_page is None:
                 # Будем парсить пока не получим пустой результат или не достигнем max_pages
@@ -36,14 +80,24 @@ class MultiPageParser:
                 empty_page_count = 0
 
                 while current_page <= (start_page + self.max_pages - 1):
-                    url = self.base_url.format(current_page)
+                    url = self.adapter.listing_url(current_page)
                     print(f"\n=== Страница {current_page} ===")
-                    print(f"URL: {url}")
+                    failed_before = len(self.failed_pages)
+                    restored = current_page in self.progress
 
-                    # Выполняем парсинг страницы
-                    page_cars, page_images = self.parse_single_page(url, parser_log)
+                    if restored:
+                        # Страница сохранена до прерывания запуска: учитываем ее без повторной загрузки
+                        page_cars, page_images = self.progress.counts(current_page)
+                        print("Страница уже сохранена, пропускаем")
+                    else:
+                        print(f"URL: {url}")
+                        # Выполняем парсинг страницы
+                        page_cars, page_images = self.parse_single_page(url, parser_log, page=current_page)
 
-                    if page_cars == 0 and page_images == 0:
+                    if len(self.failed_pages) > failed_before:
+                        # Ошибка загрузки не означает конец каталога
+                        print(f"Страница {current_page} не загружена, продолжаем")
+                    elif page_cars == 0 and page_images == 0:
                         empty_page_count += 1
                         print(f"Страница {current_page} пустая")
 
@@ -53,51 +107,38 @@ class MultiPageParser:
                             break
                     else:
                         empty_page_count = 0
-                        total_cars += page_cars
-                        total_images += page_images
-                        successful_pages += 1
                         print(f"Страница {current_page}: {page_cars} авто, {page_images} изображений")
 
                     # Случайная задержка между страницами
-                    if current_page < (start_page + self.max_pages - 1):
-                        delay = self.delay_between_pages + random.uniform(
-                            -self.delay_variation, self.delay_variation
-                        )
-                        delay = max(1, delay)  # Минимум 1 секунда
-                        print(f"Пауза {delay:.1f} сек...")
-                        time.sleep(delay)
+                    if current_page < (start_page + self.max_pages - 1) and not restored:
+                        self.pause()
 
                     current_page += 1
             else:
                 # Парсим конкретный диапазон страниц
-                for page in range(start_page, end_page + 1):
-                    url = self.base_url.format(page)
+                pages = [page for page in range(start_page, end_page + 1) if page not in self.progress]
+                for index, page in enumerate(pages):
+                    url = self.adapter.listing_url(page)
                     print(f"\n=== Страница {page} ===")
                     print(f"URL: {url}")
 
-                    page_cars, page_images = self.parse_single_page(url, parser_log)
+                    page_cars, page_images = self.parse_single_page(url, parser_log, page=page)
 
                     if page_cars == 0 and page_images == 0:
                         print(f"Страница {page} пустая, пропускаем...")
                     else:
-                        total_cars += page_cars
-                        total_images += page_images
-                        successful_pages += 1
                         print(f"Страница {page}: {page_cars} авто, {page_images} изображений")
 
                     # Случайная задержка между страницами
-                    if page < end_page:
-                        delay = self.delay_between_pages + random.uniform(
-                            -self.delay_variation, self.delay_variation
-                        )
-                        delay = max(1, delay)
-                        print(f"Пауза {delay:.1f} сек...")
-                        time.sleep(delay)
+                    if index < len(pages) - 1:
+                        self.pause()
 
+            # Итоги - по всем сохраненным страницам, включая сохраненные до прерывания
+            total_cars, total_images, successful_pages = self.progress.totals
             # Обновляем лог
-            parser_log.mark_completed(total_cars, total_images)
+            self.finish_run(parser_log, total_cars, total_images)
 
-            print(f"\n=== ПАРСИНГ ЗАВЕРШЕН ===")
+            print("\n=== ПАРСИНГ ЗАВЕРШЕН ===")
             print(f"Обработано страниц: {successful_pages}")
             print(f"Всего автомобилей: {total_cars}")
             print(f"Всего изображений: {total_images}")
@@ -106,37 +147,338 @@ class MultiPageParser:
 
         except Exception as e:
             print(f"Ошибка при многостраничном парсинге: {e}")
-            if parser_log:
-                parser_log.mark_error(str(e))
+            self.finish_run(parser_log, error=e)
             return 0, 0, 0
 
-    def parse_single_page(self, url, parser_log):
+    def run_pages_concurrently(self, start_page, end_page, concurrency, parser_log=None):
         """
-        Парсит одну страницу
+        Парсит диапазон страниц в несколько потоков (без задержек между страницами)
         """
+        self.begin_run()
         try:
-            # Получаем HTML
-            html_content = self.parser.fetch_html(url)
-            if not html_content:
-                print(f"Не удалось получить HTML с {url}")
-                return 0, 0
+            if not parser_log and not self.dry_run:
+                parser_log = ParserLog.objects.create(
+                    url=f"Многостраничный парсинг {start_page}-{end_page}",
+                    status='running'
+                )
+            self.track(parser_log, {
+                'start_page': start_page, 'end_page': end_page, 'concurrency': concurrency,
+                'max_pages': self.max_pages, 'delta': self.delta, 'source': self.adapter.name,
+            })
 
-            # Парсим данные
-            cars_data = self.parser.parse_car_data(html_content)
+            # Страницы, сохраненные до прерывания запуска, не загружаются повторно
+            pages = [page for page in range(start_page, end_page + 1) if page not in self.progress]
+            # Один парсер на все потоки: пул соединений транспорта рассчитан на concurrency
+            shared_parser = AuctionParser(
+                concurrency=concurrency, throttle=self.throttle, dedupe_stats=self.dedupe_stats,
+                streaming=self.parser.streaming, adapter=self.adapter,
+            )
+            if self.throttle:
+                # concurrency - верхняя граница, внутри нее число запросов подбирает регулятор
+                self.throttle.use_slots(concurrency)
+                self.throttled_slots = True
 
-            if not cars_data:
-                print(f"Не найдено данных на странице {url}")
-                return 0, 0
+            def parse_page(page):
+                # У каждого потока свое подключение к БД
+                try:
+                    return self.parse_single_page(self.adapter.listing_url(page), parser_log, shared_parser, page)
+                finally:
+                    connection.close()
 
-            # Сохраняем в базу данных
-            cars_count, images_count = self.parser.save_to_database(cars_data)
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(parse_page, pages))
+
+            total_cars, total_images, successful_pages = self.progress.totals
+
+            self.finish_run(parser_log, total_cars, total_images)
+
+            print("\n=== ПАРСИНГ ЗАВЕРШЕН ===")
+            print(f"Обработано страниц: {successful_pages}")
+            print(f"Всего автомобилей: {total_cars}")
+            print(f"Всего изображений: {total_images}")
+
+            return total_cars, total_images, successful_pages
+
+        except Exception as e:
+            print(f"Ошибка при многостраничном парсинге: {e}")
+            self.finish_run(parser_log, error=e)
+            return 0, 0, 0
 
+    def parse_single_page(self, url, parser_log, parser=None, page=None):
+        """
+        Парсит одну страницу. Страница многостраничного запуска (page)
+        сохраняется вместе с контрольной точкой одной транзакцией
+        """
+        parser = parser or self.parser
+        try:
+            records = self.fetch_page_data(url, parser)
+            if records is None:
+                return 0, 0
+
+            if page is not None and parser_log is not None and not self.dry_run:
+                # Страница дочитывается до транзакции: загрузка (в потоковом режиме
+                # вместе с разбором) не держит подключение к БД и блокировку
+                # контрольной точки, а повтор запроса не идет внутри транзакции
+                records = list(records)
+                counts = commit_page(parser_log, page, lambda: self.store_page_data(records, parser))
+                if counts is None:
+                    print(f"Страница {page} уже сохранена другим процессом")
+                    return 0, 0
+            else:
+                counts = self.store_page_data(records, parser)
+            cars_count, images_count = counts
+            if page is not None:
+                self.progress.record(page, cars_count, images_count)
+            if not cars_count and not images_count:
+                print(f"Не найдено новых данных на странице {url}")
             return cars_count, images_count
 
+        except CircuitOpenError:
+            # Сайт недоступен - прерываем весь запуск
+            raise
         except Exception as e:
             print(f"Ошибка при парсинге страницы {url}: {e}")
+            self.failed_pages.append(url)
             return 0, 0
 
+    def fetch_page_data(self, url, parser=None):
+        """
+        Загружает страницу и возвращает поток записей CarRecord
+        (разбор идет по мере чтения). None - страницу не удалось получить
+        """
+        parser = parser or self.parser
+
+        # Получаем HTML (в потоковом режиме - только заголовки ответа)
+        with self.timings.stage('fetch'):
+            if self.throttled_slots:
+                self.throttle.acquire()
+            try:
+                if parser.streaming:
+                    page = parser.open_stream(url)
+                else:
+                    page = parser.fetch_html(url)
+            finally:
+                if self.throttled_slots:
+                    self.throttle.release()
+        if not page:
+            print(f"Не удалось получить HTML с {url}")
+            self.failed_pages.append(url)
+            return None
+
+        if parser.streaming:
+            return self.iter_streamed_page(page, parser)
+        # Разбор учитывается по мере чтения записей потребителем
+        return self.timings.iterate('parse', parser.iter_car_records(page))
+
+    def iter_streamed_page(self, stream, parser):
+        """Записи страницы, разбираемой по мере загрузки тела ответа"""
+        try:
+            yield from self.timings.iterate('parse', parser.iter_stream_records(stream))
+        finally:
+            # Загрузка и разбор идут вперемешку: ожидание сети относим к загрузке
+            self.timings.move('parse', 'fetch', stream.read_seconds)
+
+    def store_page_data(self, records, parser=None):
+        """
+        Архивирует и сохраняет поток записей пачками по batch_size,
+        возвращает (автомобили, изображения)
+        """
+        parser = parser or self.parser
+        cars_count = 0
+        images_count = 0
+
+        for batch in batched(records, self.batch_size):
+            if self.archive:
+                self.write_archive(batch)
+
+            if self.dry_run:
+                # Без записи в БД считаем все найденные записи
+                cars_count += len(batch)
+                images_count += sum(len(car.images) for car in batch)
+                continue
+
+            # Сохраняем в базу данных
+            with self.timings.stage('persist'):
+                batch_cars, batch_images = parser.save_to_database(batch, update_existing=self.delta)
+            cars_count += batch_cars
+            images_count += batch_images
+
+        return cars_count, images_count
+
+    def run_adaptive(self, scheduler, budget, parser_log=None):
+        """
+        Переобходит до budget страниц, выбранных планировщиком по вероятности изменений
+        """
+        self.begin_run()
+        try:
+            if not parser_log and not self.dry_run:
+                parser_log = ParserLog.objects.create(
+                    url=f"Адаптивный переобход ({budget} страниц)",
+                    status='running'
+                )
+            self.track(parser_log)
+
+            pages = scheduler.select_pages(budget)
+            total_cars = 0
+            total_images = 0
+            changed_pages = 0
+
+            for index, page in enumerate(pages):
+                url = self.adapter.listing_url(page)
+                print(f"\n=== Страница {page} (адаптивный переобход) ===")
+
+                try:
+                    records = self.fetch_page_data(url)
+                    # Для сигнатуры страницы нужны все ее записи (компактные, дерево уже разрушено)
+                    cars_data = list(records) if records is not None else None
+                    if cars_data is not None and not self.dry_run:
+                        if scheduler.record_crawl(page, cars_data):
+                            changed_pages += 1
+                    if cars_data:
+                        page_cars, page_images = self.store_page_data(cars_data)
+                        total_cars += page_cars
+                        total_images += page_images
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    print(f"Ошибка при парсинге страницы {url}: {e}")
+                    self.failed_pages.append(url)
+
+                if index < len(pages) - 1:
+                    self.pause()
+
+            self.finish_run(parser_log, total_cars, total_images)
+
+            print("\n=== ПЕРЕОБХОД ЗАВЕРШЕН ===")
+            print(f"Страниц: {len(pages)}, изменились: {changed_pages}")
+
+            return total_cars, total_images, len(pages), changed_pages
+
+        except Exception as e:
+            print(f"Ошибка при адаптивном переобходе: {e}")
+            self.finish_run(parser_log, error=e)
+            return 0, 0, 0, 0
+
+    def pause(self):
+        """
+        Случайная задержка между страницами
+        """
+        if self.throttle:
+            delay = self.throttle.pause_seconds()
+            state = self.throttle.state()
+            print(f"Пауза {delay:.1f} сек (регулятор: {state['delay']} сек, "
+                  f"+{state['increases']}/-{state['decreases']})...")
+        else:
+            delay = self.delay_between_pages + random.uniform(
+                -self.delay_variation, self.delay_variation
+            )
+            delay = max(1, delay)  # Минимум 1 секунда
+            print(f"Пауза {delay:.1f} сек...")
+        with self.timings.stage('sleep'):
+            time.sleep(delay)
+
+    def begin_run(self):
+        """Начало запуска: включает профилирование, если оно запрошено"""
+        if self.profiler:
+            self.profiler.start()
+
+    def track(self, parser_log, run_params=None):
+        """
+        Подключает к запуску сигнал жизни процесса и контрольные точки.
+        run_params сохраняются в лог для продолжения (только многостраничные запуски);
+        если у лога уже есть сохраненные страницы, запуск продолжается с них.
+        """
+        self.progress = RunProgress()
+        if parser_log is None or self.dry_run:
+            return
+        if run_params and not parser_log.run_params:
+            parser_log.run_params = run_params
+            parser_log.save(update_fields=['run_params'])
+        self.progress = RunProgress.load(parser_log)
+        if len(self.progress):
+            print(f"Продолжение запуска #{parser_log.id}: уже сохранено страниц {len(self.progress)}")
+        self.heartbeat = Heartbeat(parser_log.id).start()
+
+    @classmethod
+    def for_run(cls, parser_log, **kwargs):
+        """Парсер для продолжения запуска: с адаптером сайта, с которого запуск начинался"""
+        return cls(adapter=get_adapter(parser_log.run_params.get('source')), **kwargs)
+
+    def resume(self, parser_log):
+        """
+        Продолжает прерванный многостраничный запуск с тем же логом:
+        сохраненные страницы не загружаются повторно и не учитываются дважды
+        """
+        params = parser_log.run_params
+        if not params:
+            raise ValueError(f"Запуск #{parser_log.id} нельзя продолжить: нет параметров запуска")
+        parser_log.status = 'running'
+        parser_log.error_message = None
+        parser_log.finished_at = None
+        reset_totals(parser_log)
+        parser_log.save()
+
+        if params.get('source', self.adapter.name) != self.adapter.name:
+            raise ValueError(f"Запуск #{parser_log.id} - источник {params['source']}, "
+                             f"а парсер настроен на {self.adapter.name}")
+        self.max_pages = params.get('max_pages', self.max_pages)
+        self.delta = params.get('delta', self.delta)
+        if params.get('concurrency', 1) > 1:
+            return self.run_pages_concurrently(
+                params['start_page'], params['end_page'], params['concurrency'], parser_log
+            )
+        return self.run_multi_page_parser(params['start_page'], params.get('end_page'), parser_log)
+
+    def finish_run(self, parser_log, cars_count=0, images_count=0, error=None):
+        """
+        Завершает запуск: сохраняет в лог время этапов, память и профиль
+        """
+        if self.heartbeat:
+            self.heartbeat.stop()
+            self.heartbeat = None
+        if self.profiler:
+            self.profiler.stop()
+        if self.throttle and not self.dry_run:
+            self.throttle.save()
+        if not parser_log:
+            return
+        if parser_log.run_params:
+            # Поля контрольной точки обновлялись запросами, не затираем их при сохранении лога
+            parser_log.refresh_from_db(fields=['last_page', 'heartbeat_at'])
+
+        self.timings.apply_to(parser_log)
+        self.dedupe_stats.apply_to(parser_log)
+        if self.profiler:
+            self.profiler.apply_to(parser_log)
+
+        if error is not None:
+            parser_log.mark_error(str(error))
+        else:
+            parser_log.mark_completed(cars_count, images_count)
+            if cars_count and settings.VALUATION_AUTO_REFRESH:
+                self.refresh_valuations()
+
+    def refresh_valuations(self):
+        """
+        Обновляет оценки лотов по аналогам после запуска (записываются только изменившиеся)
+        """
+        try:
+            summary = refresh_scores()
+            print(f"Оценка лотов: {summary['lots']} лотов, обновлено {summary['written']}, "
+                  f"недооцененных {summary['underpriced']}")
+        except Exception as e:
+            print(f"Ошибка при пересчете оценок лотов: {e}")
+
+    def write_archive(self, cars_data):
+        """
+        Дописывает записи в архив, по одной JSON-строке на автомобиль
+        """
+        lines = ''.join(
+            json.dumps(car.to_dict(), ensure_ascii=False, cls=DjangoJSONEncoder) + '\n' for car in cars_data
+        )
+        with self._archive_lock:
+            self.archive.write(lines)
+
     def run_in_thread(self, start_page=1, end_page=None, log_id=None):
         """
         Запускает парсинг в отдельном потоке
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import defaultdict
+from math import inf
+from django.db.models import Count, Max
+from .models import SavedSearch, SearchMatch
+from . import metrics
+
+# Поля лота с диапазонами в сохраненных поисках (границы <поле>_from и <поле>_to)
+RANGE_FIELDS = ('year', 'price', 'mileage')
+
+
+class IntervalTree:
+    """
+    Статическое центрированное дерево интервалов: все интервалы [start, end]
+    (границы включительно), содержащие значение, находятся за O(log n + k).
+    Строится один раз по списку (start, end, key).
+    """
+
+    def __init__(self, intervals):
+        self.root = self.build(list(intervals))
+
+    @classmethod
+    def build(cls, intervals):
+        if not intervals:
+            return None
+        points = sorted(point for start, end, key in intervals for point in (start, end))
+        center = points[len(points) // 2]
+        left, right, crossing = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                crossing.append(interval)
+        # Интервалы через центр: по возрастанию начала и по убыванию конца
+        return (
+            center,
+            sorted(crossing, key=lambda interval: interval[0]),
+            sorted(crossing, key=lambda interval: interval[1], reverse=True),
+            cls.build(left),
+            cls.build(right),
+        )
+
+    def stab(self, value):
+        """Ключи интервалов, содержащих value"""
+        found = []
+        node = self.root
+        while node:
+            center, by_start, by_end, left, right = node
+            if value < center:
+                for start, end, key in by_start:
+                    if start > value:
+                        break
+                    found.append(key)
+                node = left
+            elif value > center:
+                for start, end, key in by_end:
+                    if end < value:
+                        break
+                    found.append(key)
+                node = right
+            else:
+                found.extend(key for start, end, key in by_start)
+                break
+        return found
+
+
+class RangeIndex:
+    """
+    Деревья интервалов по году, цене и пробегу для группы поисков.
+    Поиски без ограничения по полю в дерево не попадают и подходят любому
+    значению, в том числе пустому.
+    """
+
+    def __init__(self, searches):
+        self.unbounded = {field: set() for field in RANGE_FIELDS}
+        intervals = {field: [] for field in RANGE_FIELDS}
+        for search in searches:
+            for field in RANGE_FIELDS:
+                low = getattr(search, f'{field}_from')
+                high = getattr(search, f'{field}_to')
+                if low is None and high is None:
+                    self.unbounded[field].add(search.id)
+                else:
+                    intervals[field].append((-inf if low is None else low, inf if high is None else high, search.id))
+        self.trees = {field: IntervalTree(intervals[field]) for field in RANGE_FIELDS}
+
+    def match(self, car):
+        candidates = None
+        for field in RANGE_FIELDS:
+            value = getattr(car, field)
+            allowed = set(self.unbounded[field])
+            # Как и фильтр списка автомобилей, граница не пропускает пустое значение
+            if value is not None:
+                allowed.update(self.trees[field].stab(value))
+            candidates = allowed if candidates is None else candidates & allowed
+            if not candidates:
+                break
+        return candidates
+
+
+class SearchIndex:
+    """
+    Индекс предикатов сохраненных поисков в памяти: по марке лота словарь
+    дает группу поисков (поиски этой марки и поиски без марки), внутри
+    группы диапазоны проверяются деревьями интервалов (RangeIndex). Лот
+    сверяется со всеми поисками без запросов к БД и без перебора поисков
+    чужих марок.
+    """
+
+    def __init__(self, searches):
+        by_brand = defaultdict(list)  # марка -> поиски ('' - любая марка)
+        for search in searches:
+            by_brand[search.brand].append(search)
+        self.size = sum(len(group) for group in by_brand.values())
+        self.by_brand = {brand: RangeIndex(group) for brand, group in by_brand.items()}
+
+    def match(self, car):
+        """id поисков, под которые подходит лот"""
+        matched = set()
+        for brand in (car.brand, ''):
+            group = self.by_brand.get(brand)
+            if group is not None:
+                matched |= group.match(car)
+        return matched
+
+
+_index_lock = threading.Lock()
+_index = None
+_index_version = None
+
+
+def current_index():
+    """
+    Индекс активных поисков процесса. Перестраивается, только если поиски
+    изменились (число и последнее изменение), проверка - один запрос.
+    """
+    global _index, _index_version
+    state = SavedSearch.objects.aggregate(count=Count('id'), changed=Max('updated_at'))
+    version = (state['count'], state['changed'])
+    with _index_lock:
+        if _index is None or version != _index_version:
+            bounds = [f'{field}_{side}' for field in RANGE_FIELDS for side in ('from', 'to')]
+            _index = SearchIndex(SavedSearch.objects.filter(is_active=True).only('id', 'brand', *bounds))
+            _index_version = version
+        return _index
+
+
+def record_matches(cars):
+    """
+    Сверяет новые и изменившиеся лоты (объекты Car) с сохраненными поисками
+    и записывает совпадения; уже записанные пары (поиск, лот) не повторяются.
+    Возвращает число новых совпадений.
+    """
+    started = time.perf_counter()
+    index = current_index()
+    if not index.size:
+        return 0
+    pairs = {(search_id, car.id) for car in cars for search_id in index.match(car)}
+    if pairs:
+        # Повторно сохраненный лот (обновился updated_at) не дает нового совпадения
+        pairs -= set(SearchMatch.objects.filter(car_id__in={car_id for search_id, car_id in pairs})
+                     .values_list('search_id', 'car_id'))
+    matches = [SearchMatch(search_id=search_id, car_id=car_id) for search_id, car_id in sorted(pairs)]
+    # ignore_conflicts - на случай параллельной записи тех же пар другим процессом
+    SearchMatch.objects.bulk_create(matches, ignore_conflicts=True, batch_size=1000)
+    metrics.SEARCH_MATCH_SECONDS.observe(time.perf_counter() - started)
+    metrics.SEARCH_MATCHES.inc(len(matches))
+    return len(matches)
@@ -0,0 +1,70 @@
+from html.parser import HTMLParser
+
+# Класс блока одного автомобиля в каталоге japantransit.ru (cars.adapters)
+CAR_BLOCK_CLASS = 'flex flex-col md:table-row-group'
+
+
+class CarBlockSplitter(HTMLParser):
+    """
+    Инкрементальный разбор страницы каталога: на вход - части HTML по мере
+    загрузки, на выход - разметка блоков автомобилей, как только блок закрыт.
+    Остальная разметка (меню, скрипты) только просматривается и не хранится,
+    в памяти - недочитанный хвост последней части и текущий блок.
+    """
+
+    def __init__(self, block_class=CAR_BLOCK_CLASS, block_tag='div'):
+        # Ссылки на символы не раскрываются: разметка блока восстанавливается как в исходнике
+        super().__init__(convert_charrefs=False)
+        self.block_class = block_class
+        self.block_tag = block_tag
+        self.blocks = []  # закрытые блоки, еще не отданные потребителю
+        self._parts = None  # разметка текущего блока (None - вне блока)
+        self._depth = 0  # вложенность тегов block_tag внутри текущего блока
+
+    def iter_blocks(self, chunks):
+        """Подает части HTML и по одной выдает разметку закрытых блоков"""
+        for chunk in chunks:
+            self.feed(chunk)
+            yield from self.take_blocks()
+        self.close()
+        yield from self.take_blocks()
+
+    def take_blocks(self):
+        blocks, self.blocks = self.blocks, []
+        return blocks
+
+    def handle_starttag(self, tag, attrs):
+        if self._parts is None:
+            if tag == self.block_tag and self.block_class in (dict(attrs).get('class') or ''):
+                self._parts = [self.get_starttag_text()]
+                self._depth = 1
+            return
+        self._parts.append(self.get_starttag_text())
+        if tag == self.block_tag:
+            self._depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if self._parts is not None:
+            self._parts.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if self._parts is None:
+            return
+        self._parts.append(f'</{tag}>')
+        if tag == self.block_tag:
+            self._depth -= 1
+            if self._depth == 0:
+                self.blocks.append(''.join(self._parts))
+                self._parts = None
+
+    def handle_data(self, data):
+        if self._parts is not None:
+            self._parts.append(data)
+
+    def handle_entityref(self, name):
+        if self._parts is not None:
+            self._parts.append(f'&{name};')
+
+    def handle_charref(self, name):
+        if self._parts is not None:
+            self._parts.append(f'&#{name};')
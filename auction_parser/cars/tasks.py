@@ -0,0 +1,78 @@
+import logging
+from .models import ParserLog, MaintenanceJob
+from .checkpoints import Heartbeat
+from .lifecycle import purge_all, apply_retention
+from .parser import AuctionParser
+from .run_parse import MultiPageParser
+
+# Исполнение фоновых задач: здесь подключается весь стек парсинга
+# (requests, BeautifulSoup, NumPy). Веб-процесс импортирует модуль
+# только при запуске задачи в потоке, см. cars.jobs.
+
+logger = logging.getLogger(__name__)
+
+
+def run_single_page_job(url, log_id):
+    """Запуск парсера одной страницы для существующего лога"""
+    heartbeat = None
+    try:
+        parser_log = ParserLog.objects.get(id=log_id)
+        # Долгая загрузка страницы не должна выглядеть как погибший процесс
+        heartbeat = Heartbeat(parser_log.id).start()
+        parser = AuctionParser()
+        parser.run_parser(url, parser_log)
+    except Exception as e:
+        # Обновляем лог с ошибкой
+        try:
+            parser_log = ParserLog.objects.get(id=log_id)
+            parser_log.mark_error(str(e))
+        except ParserLog.DoesNotExist:
+            pass
+
+        logger.error(f"Ошибка в задаче парсера: {e}")
+    finally:
+        if heartbeat:
+            heartbeat.stop()
+
+
+def run_multi_page_job(start_page, end_page, log_id):
+    """Запуск многостраничного парсера для существующего лога"""
+    parser_log = ParserLog.objects.get(id=log_id)
+    multi_parser = MultiPageParser()
+    return multi_parser.run_multi_page_parser(start_page, end_page, parser_log)
+
+
+def run_resume_job(log_id):
+    """Продолжение прерванного многостраничного запуска с последней сохраненной страницы"""
+    parser_log = ParserLog.objects.get(id=log_id)
+    multi_parser = MultiPageParser.for_run(parser_log)
+    return multi_parser.resume(parser_log)
+
+
+def run_maintenance_job(job_id, retention_days=None, batch_size=1000, archive=None):
+    """Выполняет задачу обслуживания данных, обновляя прогресс в MaintenanceJob"""
+    job = MaintenanceJob.objects.get(id=job_id)
+    try:
+        if job.kind == 'purge':
+            counts = purge_all()
+            job.processed = counts['car']
+            job.mark_completed(
+                f"Удалено: {counts['car']} автомобилей, {counts['image']} изображений, "
+                f"{counts['parserlog']} логов"
+            )
+            return job
+
+        def progress(processed, total):
+            job.processed = processed
+            job.total = total
+            job.save(update_fields=['processed', 'total'])
+            print(f"Удалено {processed} из {total} лотов")
+
+        deleted = apply_retention(retention_days, batch_size=batch_size, archive=archive, progress=progress)
+        job.processed = deleted
+        job.mark_completed(f"Удалено лотов: {deleted}")
+    except Exception as e:
+        job.mark_error(e)
+        logger.error(f"Ошибка в задаче обслуживания данных: {e}")
+        raise
+    return job
@@ -1,3 +1,1723 @@
-from django.test import TestCase
+import json
+import math
+import random
+import threading
+import time
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import brotli
+import numpy as np
+import zstandard
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.views import View
+from prometheus_client import REGISTRY
+from django.utils import timezone
+from .transport import HttpTransport, CircuitBreaker, TransportError, CircuitOpenError
+from .fake_site import FakeAuctionSite, synthetic_page
+from .models import (Car, Image, MaintenanceJob, ParserLog, PageCheckpoint, RecrawlBucketStat, SavedSearch,
+                     SearchMatch)
+from .checkpoints import commit_page, mark_stale_runs, stale_runs
+from .adapters import JapanTransitAdapter
+from .parser import AuctionParser
+from .records import CarRecord
+from .recrawl import RecrawlScheduler
+from .saved_searches import RANGE_FIELDS, SearchIndex
+from . import comparables, db_router
 
-# Create your tests here.
+PAGE_HTML = '<html><body><div class="flex flex-col md:table-row-group">Лот 1</div></body></html>'
+
+
+class FaultInjectingServer:
+    """
+    Локальный HTTP-сервер со сценариями ответов.
+    Для каждого пути задается список ответов (status, headers, body);
+    последний ответ повторяется. Специальный ответ 'drop' закрывает
+    соединение без ответа.
+    """
+
+    def __init__(self):
+        self.scenarios = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                responses = server.scenarios.get(self.path, [(404, {}, b'')])
+                response = responses.pop(0) if len(responses) > 1 else responses[0]
+
+                if response == 'drop':
+                    self.close_connection = True
+                    self.connection.close()
+                    return
+
+                status, headers, body = response
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.httpd.server_port}{path}'
+
+    def hits(self, path):
+        return sum(1 for request_path, headers in self.requests if request_path == path)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def html_response(body=PAGE_HTML, status=200, headers=None):
+    return status, {'Content-Type': 'text/html; charset=utf-8', **(headers or {})}, body.encode('utf-8')
+
+
+@mock.patch('cars.transport.time.sleep')
+class HttpTransportTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = FaultInjectingServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+
+    def make_transport(self, **kwargs):
+        transport = HttpTransport(**kwargs)
+        self.addCleanup(transport.close)
+        return transport
+
+    def test_retries_transient_server_errors(self, sleep):
+        self.server.scenarios['/page'] = [html_response(status=503), html_response(status=502), html_response()]
+
+        text, size = self.make_transport().get_text(self.server.url('/page'))
+
+        self.assertEqual(text, PAGE_HTML)
+        self.assertEqual(self.server.hits('/page'), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_backoff_is_exponential_with_jitter(self, sleep):
+        transport = self.make_transport(backoff_base=1, backoff_cap=10)
+        with mock.patch('cars.transport.random.uniform', side_effect=lambda low, high: high):
+            delays = [transport.backoff_delay(attempt) for attempt in range(6)]
+        self.assertEqual(delays, [1, 2, 4, 8, 10, 10])
+
+    def test_honors_retry_after(self, sleep):
+        self.server.scenarios['/page'] = [html_response(status=429, headers={'Retry-After': '7'}), html_response()]
+
+        self.make_transport().get_text(self.server.url('/page'))
+
+        sleep.assert_called_once_with(7.0)
+
+    def test_retry_after_is_capped(self, sleep):
+        self.server.scenarios['/page'] = [html_response(status=503, headers={'Retry-After': '3600'}), html_response()]
+
+        self.make_transport(max_retry_after=20).get_text(self.server.url('/page'))
+
+        sleep.assert_called_once_with(20)
+
+    def test_retries_dropped_connections(self, sleep):
+        self.server.scenarios['/page'] = ['drop', html_response()]
+
+        text, size = self.make_transport().get_text(self.server.url('/page'))
+
+        self.assertEqual(text, PAGE_HTML)
+        self.assertEqual(self.server.hits('/page'), 2)
+
+    def test_stream_yields_decoded_chunks_after_retries(self, sleep):
+        self.server.scenarios['/page'] = [html_response(status=503), html_response()]
+
+        stream = self.make_transport().open_stream(self.server.url('/page'), chunk_size=16)
+        chunks = list(stream)
+
+        # Части по 16 байт, кириллица на границе частей декодируется целиком
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), PAGE_HTML)
+        self.assertEqual(stream.size, len(PAGE_HTML.encode('utf-8')))
+        self.assertEqual(self.server.hits('/page'), 2)
+
+    def test_client_errors_are_not_retried(self, sleep):
+        self.server.scenarios['/missing'] = [html_response(status=404)]
+
+        with self.assertRaises(TransportError) as context:
+            self.make_transport().get_text(self.server.url('/missing'))
+
+        self.assertEqual(context.exception.status_code, 404)
+        self.assertEqual(self.server.hits('/missing'), 1)
+        sleep.assert_not_called()
+
+    def test_gives_up_after_max_retries(self, sleep):
+        self.server.scenarios['/page'] = [html_response(status=500)]
+
+        with self.assertRaises(TransportError):
+            self.make_transport(max_retries=2).get_text(self.server.url('/page'))
+
+        self.assertEqual(self.server.hits('/page'), 3)
+
+    def test_circuit_breaker_fails_fast_when_open(self, sleep):
+        self.server.scenarios['/page'] = [html_response(status=503)]
+        transport = self.make_transport(
+            max_retries=0, circuit_breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        )
+
+        for _ in range(2):
+            with self.assertRaises(TransportError):
+                transport.get_text(self.server.url('/page'))
+        with self.assertRaises(CircuitOpenError):
+            transport.get_text(self.server.url('/page'))
+
+        self.assertEqual(self.server.hits('/page'), 2)
+
+    def test_circuit_breaker_closes_after_successful_probe(self, sleep):
+        self.server.scenarios['/page'] = [html_response(status=503), html_response()]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        transport = self.make_transport(max_retries=0, circuit_breaker=breaker)
+
+        with self.assertRaises(TransportError):
+            transport.get_text(self.server.url('/page'))
+        self.assertEqual(breaker.state, 'half-open')
+
+        transport.get_text(self.server.url('/page'))
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_half_open_circuit_lets_one_probe_through(self, sleep):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        breaker.before_request()
+
+        rejected = []
+
+        def other_thread():
+            try:
+                breaker.before_request()
+            except CircuitOpenError:
+                rejected.append(True)
+
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+        self.assertEqual(rejected, [True])
+        # Повторы пробного запроса идут в том же потоке
+        breaker.before_request()
+
+        breaker.record_failure()
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+        # После неудачной пробы следующий запрос снова пробный
+        self.assertEqual(rejected, [True])
+        self.assertEqual(breaker.probing, thread.ident)
+
+    def test_client_error_releases_probe(self, sleep):
+        self.server.scenarios['/missing'] = [html_response(status=404)]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        with self.assertRaises(TransportError):
+            self.make_transport(max_retries=0, circuit_breaker=breaker).get_text(self.server.url('/missing'))
+
+        self.assertIsNone(breaker.probing)
+        self.assertEqual(breaker.state, 'half-open')
+
+    def test_accept_encoding_lists_installed_decoders(self, sleep):
+        from .transport import supported_encodings
+
+        self.assertEqual(supported_encodings(http2=True), 'gzip, deflate, br, zstd')
+        with mock.patch('cars.transport.installed', side_effect=lambda *modules: 'zstandard' not in modules):
+            self.assertEqual(supported_encodings(http2=True), 'gzip, deflate, br')
+
+    def test_decodes_brotli_and_zstd(self, sleep):
+        body = PAGE_HTML.encode('utf-8')
+        self.server.scenarios['/br'] = [(200, {'Content-Type': 'text/html; charset=utf-8',
+                                               'Content-Encoding': 'br'}, brotli.compress(body))]
+        self.server.scenarios['/zstd'] = [(200, {'Content-Type': 'text/html; charset=utf-8',
+                                                 'Content-Encoding': 'zstd'},
+                                           zstandard.ZstdCompressor().compress(body))]
+        transport = self.make_transport()
+
+        self.assertEqual(transport.get_text(self.server.url('/br'))[0], PAGE_HTML)
+        self.assertEqual(transport.get_text(self.server.url('/zstd'))[0], PAGE_HTML)
+        accept_encoding = self.server.requests[0][1]['Accept-Encoding']
+        self.assertIn('br', accept_encoding)
+        self.assertIn('zstd', accept_encoding)
+
+    def test_missing_charset_defaults_to_utf8(self, sleep):
+        self.server.scenarios['/page'] = [(200, {'Content-Type': 'text/html'}, PAGE_HTML.encode('utf-8'))]
+
+        text, size = self.make_transport().get_text(self.server.url('/page'))
+
+        self.assertEqual(text, PAGE_HTML)
+
+    def test_http2_client_works_with_http1_server(self, sleep):
+        self.server.scenarios['/page'] = [html_response(status=503), html_response()]
+
+        text, size = self.make_transport(http2=True).get_text(self.server.url('/page'))
+
+        self.assertEqual(text, PAGE_HTML)
+        self.assertEqual(self.server.hits('/page'), 2)
+
+
+@mock.patch('cars.transport.time.sleep')
+class FakeAuctionSiteTests(SimpleTestCase):
+    """Сквозной запуск MultiPageParser (без записи в БД) против локальной замены сайта"""
+
+    def run_parser(self, site, end_page=None, concurrency=1, streaming=None):
+        from .run_parse import MultiPageParser
+
+        multi_parser = MultiPageParser(dry_run=True, autothrottle=False, streaming=streaming)
+        multi_parser.base_url = site.base_url
+        multi_parser.pause = lambda: None
+        with mock.patch('builtins.print'):
+            if concurrency > 1:
+                result = multi_parser.run_pages_concurrently(1, end_page, concurrency)
+            else:
+                result = multi_parser.run_multi_page_parser(1, end_page)
+        return multi_parser, result
+
+    def test_parses_every_lot_until_catalog_ends(self, sleep):
+        with FakeAuctionSite(pages=3, lots=5) as site:
+            multi_parser, (cars, images, pages) = self.run_parser(site)
+
+        self.assertEqual((cars, images, pages), (15, 90, 3))
+        # После каталога - три пустые страницы подряд
+        self.assertEqual(site.requests, 6)
+
+    def test_recovers_from_injected_errors(self, sleep):
+        with FakeAuctionSite(pages=4, lots=5, error_rate=0.3, seed=1) as site:
+            multi_parser, (cars, images, pages) = self.run_parser(site, end_page=4, concurrency=2)
+
+        self.assertGreater(site.errors, 0)
+        self.assertEqual(cars, 20)
+        self.assertEqual(multi_parser.failed_pages, [])
+
+    def test_streaming_parse_matches_buffered_parse(self, sleep):
+        from .parser import AuctionParser
+
+        parser = AuctionParser(streaming=True)
+        self.addCleanup(parser.transport.close)
+        with FakeAuctionSite(pages=1, lots=5, padding_kb=10) as site, mock.patch('builtins.print'):
+            # Маленькие части: блоки и теги разрезаны между частями ответа
+            stream = parser.transport.open_stream(site.base_url.format(1), chunk_size=97)
+            streamed = [car.to_dict() for car in parser.iter_stream_records(stream)]
+            buffered = [car.to_dict() for car in parser.iter_car_records(synthetic_page(1, 5, 10))]
+
+        self.assertEqual(len(streamed), 5)
+        self.assertEqual(streamed, buffered)
+
+    def test_streaming_run(self, sleep):
+        with FakeAuctionSite(pages=3, lots=5, padding_kb=10) as site:
+            multi_parser, (cars, images, pages) = self.run_parser(site, streaming=True)
+
+        self.assertEqual((cars, images, pages), (15, 90, 3))
+        self.assertEqual(site.requests, 6)
+        self.assertGreater(multi_parser.timings.totals['fetch'], 0)
+
+
+@override_settings(VALUATION_AUTO_REFRESH=False)
+@mock.patch('builtins.print')
+@mock.patch('cars.run_parse.time.sleep')
+class MultiSiteCrawlerTests(TransactionTestCase):
+    """Параллельный обход нескольких сайтов с общим этапом записи"""
+
+    def test_sites_are_saved_under_their_own_source(self, sleep, _print):
+        from .multisite import MultiSiteCrawler
+
+        with FakeAuctionSite(pages=2, lots=3) as first, FakeAuctionSite(pages=3, lots=3) as second:
+            adapters = [JapanTransitAdapter(first.base_url, name='first'),
+                        JapanTransitAdapter(second.base_url, name='second')]
+            crawler = MultiSiteCrawler(adapters, delay=0, batch_size=4)
+            cars, images, pages = crawler.run()
+            # Повторный обход не создает копий
+            repeat = MultiSiteCrawler(adapters, delay=0, batch_size=4).run()
+
+        self.assertEqual((cars, images, pages), (15, 90, 5))
+        self.assertEqual(crawler.results['first']['cars'], 6)
+        self.assertEqual(crawler.results['second']['cars'], 9)
+        self.assertEqual(repeat[:2], (0, 0))
+        # Номера лотов у замен сайта совпадают, ключ автомобиля - (источник, номер)
+        self.assertEqual(Car.objects.filter(lot_number='1000').count(), 2)
+        self.assertEqual(ParserLog.objects.filter(status='completed').count(), 2)
+
+    def test_lot_number_is_unique_per_source(self, sleep, _print):
+        Car.objects.create(source='first', lot_number='1', brand='TOYOTA', model='PRIUS', year=2015)
+        Car.objects.create(source='second', lot_number='1', brand='TOYOTA', model='PRIUS', year=2015)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Car.objects.create(source='first', lot_number='1', brand='TOYOTA', model='PRIUS', year=2015)
+
+
+class SimulatedCrash(BaseException):
+    """Гибель процесса посреди запуска: не перехватывается обработчиками Exception"""
+
+
+@override_settings(VALUATION_AUTO_REFRESH=False)
+@mock.patch('builtins.print')
+class RunCheckpointTests(TestCase):
+
+    def make_parser(self, site):
+        from .run_parse import MultiPageParser
+
+        multi_parser = MultiPageParser(autothrottle=False)
+        multi_parser.base_url = site.base_url
+        multi_parser.pause = lambda: None
+        self.addCleanup(lambda: multi_parser.heartbeat and multi_parser.heartbeat.stop())
+        return multi_parser
+
+    def test_resume_continues_after_last_committed_page(self, _print):
+        with FakeAuctionSite(pages=4, lots=3) as site:
+            parser_log = ParserLog.objects.create(url='test')
+            multi_parser = self.make_parser(site)
+            fetch_page_data = multi_parser.fetch_page_data
+
+            def crash_on_third_page(url, parser=None):
+                if url.endswith('page=3'):
+                    raise SimulatedCrash()
+                return fetch_page_data(url, parser)
+
+            multi_parser.fetch_page_data = crash_on_third_page
+            with self.assertRaises(SimulatedCrash):
+                multi_parser.run_multi_page_parser(1, None, parser_log)
+            multi_parser.heartbeat.stop()
+
+            parser_log.refresh_from_db()
+            self.assertEqual((parser_log.status, parser_log.last_page, parser_log.cars_parsed), ('running', 2, 6))
+
+            ParserLog.objects.filter(id=parser_log.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+            self.assertEqual(mark_stale_runs(), 1)
+            parser_log.refresh_from_db()
+            self.assertTrue(parser_log.resumable)
+
+            requests_before = site.requests
+            cars, images, pages = self.make_parser(site).resume(parser_log)
+
+        # Загружены только страницы 3-4 и три пустые после конца каталога
+        self.assertEqual(site.requests - requests_before, 5)
+        self.assertEqual((cars, images, pages), (12, 72, 4))
+        parser_log.refresh_from_db()
+        self.assertEqual((parser_log.status, parser_log.cars_parsed, parser_log.images_parsed),
+                         ('completed', 12, 72))
+        self.assertEqual(Car.objects.count(), 12)
+        self.assertEqual(PageCheckpoint.objects.filter(parser_log=parser_log).count(), 7)
+
+    def test_page_is_read_before_checkpoint_transaction(self, _print):
+        parser_log = ParserLog.objects.create(url='test')
+        multi_parser = self.make_parser(mock.Mock(base_url='http://example.test'))
+        outer_blocks = len(connection.atomic_blocks)
+        blocks_while_reading = []
+
+        def streamed_records(url, parser=None):
+            # Чтение потока страницы: загрузка и разбор по мере поступления
+            blocks_while_reading.append(len(connection.atomic_blocks))
+            yield CarRecord(brand='TOYOTA', model='PRIUS', year=2015, lot_number='1')
+
+        multi_parser.fetch_page_data = streamed_records
+        self.assertEqual(multi_parser.parse_single_page('http://example.test/?page=1', parser_log, page=1), (1, 0))
+
+        self.assertEqual(blocks_while_reading, [outer_blocks])
+        self.assertTrue(PageCheckpoint.objects.filter(parser_log=parser_log, page=1).exists())
+
+    def test_page_commit_is_idempotent(self, _print):
+        parser_log = ParserLog.objects.create(url='test')
+
+        def store():
+            Car.objects.create(brand='TOYOTA', model='PRIUS', year=2015)
+            return 1, 0
+
+        self.assertEqual(commit_page(parser_log, 1, store), (1, 0))
+        self.assertIsNone(commit_page(parser_log, 1, store))
+
+        parser_log.refresh_from_db()
+        self.assertEqual(parser_log.cars_parsed, 1)
+        self.assertEqual(Car.objects.count(), 1)
+
+    def test_only_runs_without_heartbeat_are_marked_interrupted(self, _print):
+        stale = ParserLog.objects.create(url='stale', heartbeat_at=timezone.now() - timedelta(hours=1))
+        alive = ParserLog.objects.create(url='alive', heartbeat_at=timezone.now())
+
+        self.assertEqual(mark_stale_runs(), 1)
+
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((stale.status, alive.status), ('interrupted', 'running'))
+
+    def test_status_request_reports_stale_run_without_changing_it(self, _print):
+        stale = ParserLog.objects.create(url='stale', heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        data = self.client.get('/parser/status/').json()
+
+        self.assertEqual((data['log_id'], data['status'], data['stale']), (stale.id, 'running', True))
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'running')
+
+    def test_single_page_job_heartbeats_while_running(self, _print):
+        from . import tasks
+
+        parser_log = ParserLog.objects.create(url='test', heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        def slow_run_parser(parser, url, log):
+            self.assertFalse(stale_runs().exists())
+            log.mark_completed(0, 0)
+
+        with mock.patch.object(tasks.AuctionParser, 'run_parser', slow_run_parser):
+            tasks.run_single_page_job('test', parser_log.id)
+
+        parser_log.refresh_from_db()
+        self.assertEqual(parser_log.status, 'completed')
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    """Маршрутизация чтения на реплику; сама реплика не нужна - проверяется выбор базы"""
+
+    def setUp(self):
+        self.enterContext(override_settings(REPLICA_STICKY_SECONDS=30))
+        self.enterContext(mock.patch.object(db_router, 'replica_configured', return_value=True))
+        self.health = self.enterContext(mock.patch.object(db_router.replica_health, 'available',
+                                                          return_value=True))
+        self.router = db_router.ReplicaRouter()
+        self.seen = []
+        test = self
+
+        class ReadView(View):
+            replica_reads = True
+
+            def get(self, request):
+                test.seen.append(test.router.db_for_read(Car))
+                return HttpResponse('ok')
+
+            def post(self, request):
+                return HttpResponse('ok')
+
+        self.view = ReadView.as_view()
+
+    def request(self, method='get', cookies=None):
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        middleware = db_router.ReplicaRoutingMiddleware(
+            lambda request: middleware.process_view(request, self.view, (), {}) or self.view(request)
+        )
+        return middleware(request)
+
+    def test_reads_go_to_replica_only_inside_replica_views(self):
+        self.assertIsNone(self.router.db_for_read(Car))
+        self.request()
+        self.assertEqual(self.seen, ['replica'])
+        self.assertIsNone(self.router.db_for_read(Car))
+        self.assertEqual(self.router.db_for_write(Car), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'cars'))
+
+    def test_user_is_pinned_to_primary_after_write(self):
+        response = self.request('post')
+        self.assertEqual(response.cookies[db_router.STICKY_COOKIE]['max-age'], 30)
+
+        self.request(cookies={db_router.STICKY_COOKIE: '1'})
+        self.assertEqual(self.seen, [None])
+
+    def test_falls_back_to_primary_when_replica_lags(self):
+        self.health.return_value = False
+        self.request()
+        self.assertEqual(self.seen, [None])
+
+    def test_view_is_retried_on_primary_after_replica_error(self):
+        request = RequestFactory().get('/')
+        middleware = db_router.ReplicaRoutingMiddleware(lambda request: None)
+        calls = []
+
+        def view(request):
+            calls.append(self.router.db_for_read(Car))
+            return HttpResponse('ok')
+        view.view_class = type('ReadView', (View,), {'replica_reads': True})
+
+        with mock.patch.object(db_router.replica_health, 'mark_failed') as mark_failed, \
+                db_router.replica_reads(False):
+            middleware.process_view(request, view, (), {})
+            response = middleware.process_exception(request, OperationalError('replica is gone'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(calls, [None])
+        mark_failed.assert_called_once()
+
+
+class ReplicaFailoverTests(TestCase):
+    """Отказ реплики посреди настоящего представления: запрос повторяется с основной БД"""
+
+    def setUp(self):
+        # Реплика - второе подключение к тестовой БД, каждый запрос через него падает
+        connections.settings['replica'] = dict(connections.settings['default'])
+        self.addCleanup(self.drop_replica)
+        self.enterContext(mock.patch.object(type(self), 'databases', self.databases | {'replica'}))
+        self.queries_to_replica = []
+
+        def replica_is_gone(execute, sql, params, many, context):
+            self.queries_to_replica.append(sql)
+            raise OperationalError('server closed the connection unexpectedly')
+
+        self.enterContext(connections['replica'].execute_wrapper(replica_is_gone))
+        self.enterContext(mock.patch.object(db_router, 'replica_configured', return_value=True))
+        # Реплика только что проверена и считается исправной
+        self.health = db_router.ReplicaHealth()
+        self.health.checked_at = time.monotonic()
+        self.enterContext(mock.patch.object(db_router, 'replica_health', self.health))
+        Car.objects.create(brand='Toyota', model='Prius', year=2015, price=500000, lot_number='1')
+
+    @staticmethod
+    def drop_replica():
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def test_cars_list_is_served_from_primary(self):
+        with mock.patch('builtins.print'):
+            response = self.client.get('/cars/ajax/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual([car['lot_number'] for car in data['cars']], ['1'])
+        self.assertTrue(self.queries_to_replica)
+        self.assertFalse(self.health.healthy)
+        self.assertEqual(self.health.reason, 'error')
+
+    def test_errors_without_replica_stay_json(self):
+        with mock.patch('cars.views.CarsAjaxView.load_page', side_effect=ValueError('broken')), \
+                mock.patch('builtins.print'):
+            response = self.client.get('/cars/ajax/', HTTP_COOKIE=f'{db_router.STICKY_COOKIE}=1')
+
+        self.assertEqual(response.json(), {'success': False, 'error': 'broken'})
+        self.assertEqual(self.queries_to_replica, [])
+        self.assertTrue(self.health.healthy)
+
+
+class AdminChangelistQueryTests(TestCase):
+    """Число запросов страницы списка в админке не зависит от количества строк"""
+
+    # Сессия, пользователь, число строк, строки страницы и варианты фильтров
+    MAX_QUERIES = 6
+
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def add_cars(self, count):
+        for number in range(count):
+            car = Car.objects.create(brand=f'BRAND{number % 5}', model=f'MODEL{number}', year=2000 + number % 20,
+                                     lot_number=str(Car.objects.count() + 1))
+            Image.objects.bulk_create(Image(car=car, url=f'https://img.example/{car.id}/{index}.jpg')
+                                      for index in range(3))
+        ParserLog.objects.create(url='test', profile_report='x' * 1000)
+
+    def changelist_queries(self, url):
+        # Худший случай: варианты фильтров еще не в кеше
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_count_is_bounded(self):
+        urls = ['/admin/cars/car/', '/admin/cars/image/', '/admin/cars/parserlog/',
+                '/admin/cars/car/?brand=BRAND1', '/admin/cars/image/?q=1']
+        self.add_cars(3)
+        small = [self.changelist_queries(url) for url in urls]
+        self.add_cars(40)
+        large = [self.changelist_queries(url) for url in urls]
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(max(large), self.MAX_QUERIES)
+
+
+class LotLookupTests(TestCase):
+    """Пакетный запрос лотов cars/lookup/"""
+
+    def setUp(self):
+        for number in range(1, 21):
+            car = Car.objects.create(brand='TOYOTA', model=f'MODEL{number}', year=2015, price=number * 100000,
+                                     lot_number=str(number))
+            Image.objects.bulk_create(Image(car=car, url=f'https://img.example/{car.id}/{index}.jpg')
+                                      for index in range(2))
+
+    def lookup(self, body, **headers):
+        return self.client.post('/cars/lookup/', json.dumps(body), content_type='application/json', **headers)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        counts = []
+        for lot_numbers in (['1', '2'], [str(number) for number in range(1, 21)]):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.lookup({'lot_numbers': lot_numbers + ['404']})
+            counts.append(len(queries))
+
+        data = response.json()
+        self.assertEqual(len(data['cars']), 20)
+        self.assertEqual(len(data['cars'][0]['images']), 2)
+        self.assertEqual(data['missing_lot_numbers'], ['404'])
+        # Состояние для ETag, лоты и изображения
+        self.assertEqual(counts, [3, 3])
+
+    def test_field_selection(self):
+        car_id = Car.objects.get(lot_number='3').id
+        response = self.lookup({'ids': [car_id, 999999], 'fields': ['price']})
+
+        data = response.json()
+        self.assertEqual(data['cars'], [{'id': car_id, 'source': 'japantransit', 'lot_number': '3', 'price': 300000}])
+        self.assertEqual(data['missing_ids'], [999999])
+        self.assertEqual(self.lookup({'ids': [car_id], 'fields': ['secret']}).status_code, 400)
+
+    def test_unchanged_lots_return_not_modified(self):
+        body = {'lot_numbers': ['1', '2'], 'fields': ['price', 'images']}
+        etag = self.lookup(body)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.lookup(body, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+        # Новое изображение меняет ETag
+        AuctionParser().save_to_database([CarRecord(lot_number='2', brand='TOYOTA', year=2015,
+                                                    images=('https://img.example/new.jpg',))])
+        response = self.lookup(body, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['cars'][1]['images']), 3)
+
+
+class SavedSearchTests(TestCase):
+    """Сверка новых лотов с сохраненными поисками через индекс предикатов"""
+
+    @staticmethod
+    def brute_force_match(search, car):
+        if search.brand and search.brand != car.brand:
+            return False
+        for field in RANGE_FIELDS:
+            low, high, value = getattr(search, f'{field}_from'), getattr(search, f'{field}_to'), getattr(car, field)
+            if (low is not None or high is not None) and value is None:
+                return False
+            if low is not None and value < low or high is not None and value > high:
+                return False
+        return True
+
+    def test_index_matches_brute_force(self):
+        rng = random.Random(7)
+        brands = ['TOYOTA', 'NISSAN', 'HONDA', 'MAZDA']
+
+        def bounds(low, high):
+            values = sorted(rng.randint(low, high) for _ in range(2))
+            return [rng.choice([None, values[0]]), rng.choice([None, values[1]])]
+
+        searches = []
+        for number in range(1, 501):
+            year, price, mileage = bounds(1995, 2024), bounds(100000, 5000000), bounds(0, 300000)
+            searches.append(SavedSearch(id=number, brand=rng.choice(brands + ['']),
+                                        year_from=year[0], year_to=year[1], price_from=price[0], price_to=price[1],
+                                        mileage_from=mileage[0], mileage_to=mileage[1]))
+        index = SearchIndex(searches)
+
+        for number in range(300):
+            car = Car(id=number, brand=rng.choice(brands), year=rng.randint(1995, 2024),
+                      price=rng.choice([None, rng.randint(100000, 5000000)]),
+                      mileage=rng.choice([None, rng.randint(0, 300000)]))
+            expected = {search.id for search in searches if self.brute_force_match(search, car)}
+            self.assertEqual(index.match(car), expected)
+
+    @mock.patch('builtins.print')
+    def test_new_and_changed_lots_are_recorded(self, _print):
+        search = SavedSearch.objects.create(brand='TOYOTA', price_to=500000)
+        parser = AuctionParser()
+        parser.save_to_database([
+            CarRecord(lot_number='1', brand='TOYOTA', model='PRIUS', year=2015, price=400000),
+            CarRecord(lot_number='2', brand='TOYOTA', model='AQUA', year=2016, price=900000),
+            CarRecord(lot_number='3', brand='NISSAN', model='NOTE', year=2016, price=300000),
+        ])
+        self.assertEqual(list(search.matches.values_list('car__lot_number', flat=True)), ['1'])
+
+        # Поиск, добавленный после первой пачки, тоже участвует в сверке
+        nissan = SavedSearch.objects.create(brand='NISSAN')
+        matches_before = REGISTRY.get_sample_value('parser_search_matches_total')
+        # Подешевевший лот подходит, повторно сохраненный не дублируется и не считается
+        parser.save_to_database([
+            CarRecord(lot_number='1', brand='TOYOTA', model='PRIUS', year=2015, price=390000),
+            CarRecord(lot_number='2', brand='TOYOTA', model='AQUA', year=2016, price=450000),
+            CarRecord(lot_number='3', brand='NISSAN', model='NOTE', year=2016, price=280000),
+        ], update_existing=True)
+        self.assertEqual(sorted(search.matches.values_list('car__lot_number', flat=True)), ['1', '2'])
+        self.assertEqual(list(nissan.matches.values_list('car__lot_number', flat=True)), ['3'])
+        self.assertEqual(REGISTRY.get_sample_value('parser_search_matches_total'), matches_before + 2)
+
+        from .saved_searches import record_matches
+
+        self.assertEqual(record_matches(Car.objects.all()), 0)
+        self.assertEqual(SearchMatch.objects.count(), 3)
+
+        response = self.client.get(f'/searches/{search.id}/matches/')
+        self.assertEqual(sorted(lot['lot_number'] for lot in response.json()['lots']), ['1', '2'])
+
+
+class ComparablesTests(TestCase):
+    """Индекс аналогов: KD-дерево и инкрементальное обновление"""
+
+    def setUp(self):
+        comparables.reset()
+
+    def test_kd_tree_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        # Повторяющиеся точки проверяют деление при нулевом разбросе
+        points = np.concatenate([rng.normal(size=(2000, 3)), np.zeros((100, 3))])
+        tree = comparables.KDTree(points, leaf_size=16)
+        for point in rng.normal(size=(50, 3)):
+            distances, positions = tree.query(point, 7)
+            expected = np.sort(np.linalg.norm(points - point, axis=1))[:7]
+            np.testing.assert_allclose(distances, expected)
+            np.testing.assert_allclose(np.linalg.norm(points[positions] - point, axis=1), expected)
+
+    @mock.patch('builtins.print')
+    def test_comparables_follow_new_and_changed_lots(self, _print):
+        with override_settings(COMPARABLES_REFRESH_SECONDS=0):
+            target = Car.objects.create(brand='TOYOTA', model='PRIUS', year=2015, mileage=80000, engine_cc=1800,
+                                        price=1000000, lot_number='1')
+            near = Car.objects.create(brand='TOYOTA', model='PRIUS', year=2015, mileage=85000, engine_cc=1800,
+                                      price=900000, lot_number='2')
+            Car.objects.create(brand='TOYOTA', model='PRIUS', year=2008, mileage=200000, engine_cc=1500,
+                               price=400000, lot_number='3')
+            Car.objects.create(brand='TOYOTA', model='AQUA', year=2015, mileage=80000, engine_cc=1500,
+                               price=700000, lot_number='4')
+
+            data = self.client.get(f'/analytics/comparables/?car_id={target.id}&k=5').json()
+            self.assertEqual([car['lot_number'] for car in data['comparables']], ['2', '3'])
+            self.assertEqual(data['comparables'][0]['price_delta'], -100000)
+
+            previous = comparables.current_index()
+            # Новый лот и изменение цены видны без полной перестройки индекса
+            closer = Car.objects.create(brand='TOYOTA', model='PRIUS', year=2015, mileage=80000, engine_cc=1800,
+                                        price=1100000, lot_number='5')
+            AuctionParser().save_to_database([CarRecord(lot_number='2', brand='TOYOTA', model='PRIUS', year=2015,
+                                                        price=950000)], update_existing=True)
+            data = self.client.get(f'/analytics/comparables/?car_id={target.id}&k=2').json()
+            self.assertEqual([car['id'] for car in data['comparables']], [closer.id, near.id])
+            self.assertEqual(data['comparables'][1]['price'], 950000)
+            # Обновление строится на копии: тот, кто еще держит прежний индекс, видит прежние данные
+            self.assertEqual(previous.query('TOYOTA', 'PRIUS', 2015, 80000, 1800, k=1, exclude_id=target.id)[0][:2],
+                             (near.id, 900000.0))
+            self.assertIsNot(comparables.current_index(), previous)
+
+
+class QueryGuardTests(TestCase):
+    """Проверка параметров списка автомобилей до обращения к БД"""
+
+    def setUp(self):
+        for number, (brand, model) in enumerate([('Toyota', 'Prius'), ('Toyota', 'Aqua'), ('Nissan', 'Note')]):
+            Car.objects.create(brand=brand, model=model, year=2015 + number, price=500000 + number,
+                               lot_number=str(1000 + number))
+
+    @staticmethod
+    def rejections(reason):
+        return REGISTRY.get_sample_value('web_query_rejections_total', {'view': 'cars_ajax', 'reason': reason}) or 0
+
+    def test_pathological_parameters_are_rejected_and_counted(self):
+        cases = [
+            ('sort=lot_url', 'sort'),
+            ('per_page=1000000', 'out_of_range'),
+            ('year_from=abc', 'invalid'),
+            ('price_from=900000&price_to=100000', 'empty_range'),
+            ('auction_from=2026-02-31', 'invalid'),
+            ('search=' + '+'.join(['a'] * 10), 'search'),
+        ]
+        for query, reason in cases:
+            before = self.rejections(reason)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f'/cars/ajax/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertFalse(response.json()['success'])
+            self.assertEqual(len(queries), 0, query)
+            self.assertEqual(self.rejections(reason), before + 1, query)
+
+    def test_search_matches_word_prefixes(self):
+        def lots(query):
+            return sorted(car['lot_number'] for car in self.client.get(f'/cars/ajax/?{query}').json()['cars'])
+
+        self.assertEqual(lots('search=toy'), ['1000', '1001'])
+        self.assertEqual(lots('search=toyota+pri'), ['1000'])
+        self.assertEqual(lots('search=1002'), ['1002'])
+        self.assertEqual(lots('search=rius'), [])
+        self.assertEqual(lots('sort=-price&per_page=2'), ['1001', '1002'])
+
+    def test_statement_timeout_is_reported(self):
+        cause = Exception('canceling statement due to statement timeout')
+        cause.pgcode = '57014'
+        canceled = OperationalError(str(cause))
+        canceled.__cause__ = cause
+        before = self.rejections('timeout')
+        with mock.patch('cars.views.CarsAjaxView.load_page', side_effect=canceled):
+            response = self.client.get('/cars/ajax/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.rejections('timeout'), before + 1)
+
+
+class SiteAdapterTests(SimpleTestCase):
+    """Базовый класс адаптеров сайтов"""
+
+    def test_adapter_without_extract_car_is_rejected(self):
+        from .adapters import ADAPTERS, SiteAdapter, register
+
+        class HalfWrittenAdapter(SiteAdapter):
+            name = 'half-written'
+            listing_url_template = 'https://example.test/?page={}'
+
+        with self.assertRaises(TypeError):
+            register(HalfWrittenAdapter)
+        with self.assertRaises(TypeError):
+            HalfWrittenAdapter()
+        self.assertNotIn('half-written', ADAPTERS)
+
+
+class TypedFieldsTests(TestCase):
+    """Типизированные дата аукциона и объем двигателя: разбор, заполнение и фильтры"""
+
+    def setUp(self):
+        self.adapter = JapanTransitAdapter()
+
+    def test_auction_date_formats(self):
+        moment = timezone.make_aware(timezone.datetime(2026, 1, 17, 10, 30))
+        day = timezone.make_aware(timezone.datetime(2026, 1, 17))
+
+        self.assertEqual(self.adapter.parse_auction_date('17.01.2026 10:30'), moment)
+        self.assertEqual(self.adapter.parse_auction_date(' 17.01.2026 '), day)
+        self.assertEqual(self.adapter.parse_auction_date('2026-01-17 10:30'), moment)
+        self.assertEqual(self.adapter.parse_auction_date('Аукцион: 17.01.2026'), day)
+        for text in (None, '', 'скоро', '31.02.2026'):
+            self.assertIsNone(self.adapter.parse_auction_date(text), text)
+
+    def test_engine_volume_formats(self):
+        cases = {
+            '1500cc': 1500,
+            '1500 CC': 1500,
+            '1 500 см3': 1500,
+            '660 см³': 660,
+            '1.5L': 1500,
+            '2,0 л': 2000,
+            'garbage': None,
+            '': None,
+            None: None,
+        }
+        for text, expected in cases.items():
+            self.assertEqual(self.adapter.parse_engine_cc(text), expected, text)
+
+    def test_backfill_fills_only_missing_values(self):
+        from django.core.management import call_command
+
+        filled_at = timezone.make_aware(timezone.datetime(2025, 5, 1))
+        pending = Car.objects.create(brand='TOYOTA', year=2015, auction_date='17.01.2026', engine_volume='1.8L')
+        filled = Car.objects.create(brand='TOYOTA', year=2015, auction_date='17.01.2026', engine_volume='1500cc',
+                                    auction_at=filled_at, engine_cc=1490)
+        unparsable = Car.objects.create(brand='TOYOTA', year=2015, auction_date='скоро', engine_volume='?')
+
+        stdout = StringIO()
+        call_command('backfill_typed_fields', '--batch-size', '1', stdout=stdout)
+
+        pending.refresh_from_db()
+        filled.refresh_from_db()
+        unparsable.refresh_from_db()
+        self.assertEqual((pending.auction_at, pending.engine_cc),
+                         (timezone.make_aware(timezone.datetime(2026, 1, 17)), 1800))
+        self.assertEqual((filled.auction_at, filled.engine_cc), (filled_at, 1490))
+        self.assertEqual((unparsable.auction_at, unparsable.engine_cc), (None, None))
+        self.assertIn('Обработано: 2, обновлено: 1', stdout.getvalue())
+
+    def test_ajax_filters_by_auction_date_and_engine(self):
+        def day(value):
+            return timezone.make_aware(timezone.datetime.strptime(value, '%Y-%m-%d'))
+
+        Car.objects.create(brand='TOYOTA', year=2015, lot_number='1', auction_at=day('2026-01-16') + timedelta(hours=23), engine_cc=660)
+        Car.objects.create(brand='TOYOTA', year=2015, lot_number='2', auction_at=day('2026-01-17') + timedelta(hours=10), engine_cc=1500)
+        Car.objects.create(brand='TOYOTA', year=2015, lot_number='3', auction_at=day('2026-01-18'), engine_cc=2500)
+
+        def lots(query):
+            response = self.client.get(f'/cars/ajax/?{query}')
+            self.assertEqual(response.status_code, 200, query)
+            return sorted(car['lot_number'] for car in response.json()['cars'])
+
+        self.assertEqual(lots('auction_from=2026-01-17&auction_to=2026-01-17'), ['2'])
+        self.assertEqual(lots('auction_from=2026-01-17'), ['2', '3'])
+        self.assertEqual(lots('auction_to=2026-01-17'), ['1', '2'])
+        self.assertEqual(lots('engine_from=1000&engine_to=2000'), ['2'])
+        self.assertEqual(lots('engine_from=1500&auction_to=2026-01-18'), ['2', '3'])
+
+
+class JobsTests(SimpleTestCase):
+    """Запуск задач парсинга из веб-процесса"""
+
+    @override_settings(PARSER_JOBS_MODE='process')
+    def test_process_mode_spawns_manage_py_and_reaps_it(self):
+        from . import jobs
+
+        with mock.patch('cars.jobs.subprocess.Popen') as popen, \
+                mock.patch('cars.tasks.run_single_page_job') as run_job:
+            reaped = threading.Event()
+            popen.return_value.pid = 4321
+            popen.return_value.wait.side_effect = reaped.set
+            self.assertEqual(jobs.start_single_page_job('https://example.com', 7), 4321)
+            self.assertTrue(reaped.wait(5))
+
+        command = popen.call_args.args[0]
+        self.assertEqual(command[2:], ['run_parser_job', '--log-id', '7', '--url', 'https://example.com'])
+        self.assertTrue(popen.call_args.kwargs['start_new_session'])
+        run_job.assert_not_called()
+
+    @override_settings(PARSER_JOBS_MODE='thread')
+    def test_thread_mode_runs_job_in_process(self):
+        from . import jobs
+
+        done = threading.Event()
+        with mock.patch('cars.jobs.subprocess.Popen') as popen, \
+                mock.patch('cars.tasks.run_multi_page_job', side_effect=lambda *args: done.set()) as run_job:
+            jobs.start_multi_page_job(1, 3, 7)
+            self.assertTrue(done.wait(5))
+
+        run_job.assert_called_once_with(1, 3, 7)
+        popen.assert_not_called()
+
+
+@override_settings(VALUATION_AUTO_REFRESH=False)
+@mock.patch('builtins.print')
+@mock.patch('cars.run_parse.time.sleep')
+class ScrapeCommandTests(TestCase):
+    """manage.py scrape: сводка в stdout и коды завершения"""
+
+    def scrape(self, site, *args):
+        from django.core.management import call_command
+
+        stdout, stderr = StringIO(), StringIO()
+        with mock.patch('cars.management.commands.scrape.get_adapter',
+                        side_effect=lambda name=None: JapanTransitAdapter(site.base_url)), \
+                self.assertRaises(SystemExit) as exit_info:
+            call_command('scrape', '--delay', '0', *args, stdout=stdout, stderr=stderr)
+        return exit_info.exception.code, json.loads(stdout.getvalue())
+
+    def test_dry_run_parses_without_writing(self, sleep, _print):
+        from .management.commands.scrape import EXIT_OK
+
+        with FakeAuctionSite(pages=2, lots=3) as site:
+            code, summary = self.scrape(site, '--end-page', '2', '--dry-run')
+
+        self.assertEqual(code, EXIT_OK)
+        self.assertEqual((summary['status'], summary['cars'], summary['pages_ok']), ('completed', 6, 2))
+        self.assertIsNone(summary['log_id'])
+        self.assertFalse(Car.objects.exists())
+        self.assertFalse(ParserLog.objects.exists())
+
+    def test_held_lock_exits_without_scraping(self, sleep, _print):
+        from .management.commands.scrape import EXIT_LOCKED, LOCK_NAME, scrape_lock
+
+        with FakeAuctionSite(pages=1, lots=3) as site, scrape_lock(LOCK_NAME) as acquired:
+            self.assertTrue(acquired)
+            code, summary = self.scrape(site, '--end-page', '1')
+            self.assertEqual(site.requests, 0)
+
+        self.assertEqual((code, summary['status']), (EXIT_LOCKED, 'locked'))
+
+    def test_failed_pages_give_partial_exit_code(self, sleep, _print):
+        from .management.commands.scrape import EXIT_PARTIAL
+        from .run_parse import MultiPageParser
+
+        parse_single_page = MultiPageParser.parse_single_page
+
+        def fail_second_page(multi_parser, url, parser_log, *args, **kwargs):
+            if url.endswith('page=2'):
+                multi_parser.failed_pages.append(url)
+                return 0, 0
+            return parse_single_page(multi_parser, url, parser_log, *args, **kwargs)
+
+        with FakeAuctionSite(pages=2, lots=3) as site, \
+                mock.patch.object(MultiPageParser, 'parse_single_page', fail_second_page):
+            code, summary = self.scrape(site, '--end-page', '2')
+
+        self.assertEqual(code, EXIT_PARTIAL)
+        self.assertEqual(summary['cars'], 3)
+        self.assertEqual(len(summary['failed_pages']), 1)
+        self.assertEqual(Car.objects.count(), 3)
+
+    def test_schedule_survives_failed_run(self, sleep, _print):
+        from django.core.management import call_command
+        from .management.commands.scrape import Command, EXIT_ERROR, EXIT_OK
+
+        class StopSchedule(BaseException):
+            pass
+
+        runs = [RuntimeError('database is gone'), {'status': 'completed', 'exit_code': EXIT_OK}]
+
+        def run_once(command, options):
+            result = runs.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        stdout = StringIO()
+        with mock.patch.object(Command, 'run_once', run_once), \
+                mock.patch('cars.management.commands.scrape.time.sleep', side_effect=[None, StopSchedule]), \
+                self.assertRaises(StopSchedule):
+            call_command('scrape', '--schedule', '60', stdout=stdout, stderr=StringIO())
+
+        summaries = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([summary['exit_code'] for summary in summaries], [EXIT_ERROR, EXIT_OK])
+        self.assertEqual(summaries[0]['error'], 'database is gone')
+
+
+class RecrawlSchedulerTests(TestCase):
+    """Адаптивный переобход: частоты изменений по лотам и выбор страниц"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.scheduler = RecrawlScheduler()
+
+    def lots(self, numbers, hours_to_auction, price=100000):
+        return [CarRecord(lot_number=str(number), price=price,
+                          auction_at=self.now + timedelta(hours=hours_to_auction + index))
+                for index, number in enumerate(numbers)]
+
+    def test_observed_changes_are_blended_with_prior(self):
+        from .recrawl import BUCKETS, PRIOR_WEIGHT_HOURS
+
+        priors = {name: prior for name, upper, prior in BUCKETS}
+        for bucket, rate in self.scheduler.bucket_rates().items():
+            self.assertAlmostEqual(rate, priors[bucket])
+
+        self.scheduler.record_crawl(1, self.lots(range(4), 10), now=self.now)
+        changed = self.lots(range(2), 10, price=90000) + self.lots(range(2, 4), 12)
+        self.scheduler.record_crawl(1, changed, now=self.now + timedelta(hours=2))
+
+        # 4 лота по 2 часа в корзине 0-1d, у двух изменилась цена
+        stat = RecrawlBucketStat.objects.get(bucket='0-1d')
+        self.assertEqual((stat.changes, stat.exposure_hours), (2, 8.0))
+        expected = (2 + priors['0-1d'] * PRIOR_WEIGHT_HOURS) / (8 + PRIOR_WEIGHT_HOURS)
+        self.assertAlmostEqual(self.scheduler.bucket_rates()['0-1d'], expected)
+
+    def test_page_probability_sums_lot_rates(self):
+        self.scheduler.record_crawl(1, self.lots(range(3), 10), now=self.now)
+        self.scheduler.record_crawl(2, self.lots(range(3, 6), 200), now=self.now)
+        later = self.now + timedelta(hours=3)
+
+        pages = self.scheduler.expected_pages(later, page_size=3)
+        self.assertEqual(sorted(pages), [1, 2])
+        rates = self.scheduler.bucket_rates()
+        probabilities = self.scheduler.page_probabilities(later)
+        # Страница 1: три лота корзины 0-1d по 3 часа без проверки, страница 2 - корзины 7d+
+        self.assertAlmostEqual(probabilities[1], 1 - math.exp(-3 * rates['0-1d'] * 3))
+        self.assertAlmostEqual(probabilities[2], 1 - math.exp(-3 * rates['7d+'] * 3))
+        # Следующая неизвестная страница - разведка
+        self.assertEqual(probabilities[3], 1.0)
+        self.assertEqual(self.scheduler.select_pages(3, now=later), [3, 1, 2])
+        self.assertEqual(self.scheduler.select_pages(1, now=later), [3])
+
+    def test_lots_are_mapped_to_pages_after_auctions_end(self):
+        self.scheduler.record_crawl(1, self.lots(range(3), 1), now=self.now)
+        self.scheduler.record_crawl(2, self.lots(range(3, 6), 30), now=self.now)
+        self.scheduler.record_crawl(3, [], now=self.now)
+
+        # Аукционы первой страницы прошли: ее лоты ушли из каталога,
+        # лоты второй страницы теперь на первой
+        later = self.now + timedelta(hours=6)
+        pages = self.scheduler.expected_pages(later, page_size=3)
+        self.assertEqual(list(pages), [1])
+        self.assertEqual([auction_at for auction_at, checked_at in pages[1]],
+                         [self.now + timedelta(hours=30 + index) for index in range(3)])
+        # Страница 2 обойдена, но известных лотов на ней больше нет - проверяется первой
+        self.assertEqual(self.scheduler.select_pages(2, now=later), [2, 1])
+        self.assertNotIn(4, self.scheduler.select_pages(10, now=later))
+
+    def test_statistics_are_kept_per_source(self):
+        other = RecrawlScheduler(source='othersite')
+        self.scheduler.record_crawl(1, self.lots(range(3), 10), now=self.now)
+        self.scheduler.record_crawl(1, self.lots(range(3), 10, price=90000), now=self.now + timedelta(hours=1))
+        other.record_crawl(1, [], now=self.now)
+
+        # Пустая страница другого сайта не считается концом этого каталога
+        self.assertEqual(self.scheduler.select_pages(2, now=self.now + timedelta(hours=1)), [2, 1])
+        self.assertEqual(other.select_pages(2, now=self.now + timedelta(hours=1)), [1])
+        # Изменения этого сайта не меняют частоты другого
+        self.assertGreater(self.scheduler.bucket_rates('japantransit')['0-1d'],
+                           other.bucket_rates('othersite')['0-1d'])
+        self.assertEqual(RecrawlScheduler.freshness_by_bucket(now=self.now, source='othersite'), {})
+
+    def test_ended_lots_are_purged_on_record_not_on_select(self):
+        from .models import LotCrawlStat
+        from .recrawl import KEEP_ENDED
+
+        self.scheduler.record_crawl(1, self.lots(range(2), 1), now=self.now)
+        later = self.now + KEEP_ENDED + timedelta(days=1)
+
+        self.scheduler.select_pages(5, now=later)
+        self.assertEqual(LotCrawlStat.objects.count(), 2)
+
+        self.now = later
+        self.scheduler.record_crawl(1, self.lots(range(2, 4), 10), now=later)
+        self.assertEqual(sorted(LotCrawlStat.objects.values_list('lot_number', flat=True)), ['2', '3'])
+
+
+class MetricsTests(TestCase):
+    """Метрики веб-запросов в формате Prometheus"""
+
+    def test_view_requests_are_labelled(self):
+        from .metrics import render_latest
+
+        self.assertEqual(self.client.get('/cars/ajax/?sort=lot_url').status_code, 400)
+        self.client.get('/cars/ajax/')
+
+        output = render_latest().decode()
+        self.assertIn('web_request_seconds_count{method="GET",status="400",view="cars_ajax"}', output)
+        self.assertIn('web_request_seconds_count{method="GET",status="200",view="cars_ajax"}', output)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'web_request_seconds_bucket{', response.content)
+
+
+def profiled_worker_function():
+    return sum(range(10000))
+
+
+class ProfilingTests(TestCase):
+    """Время этапов запуска и профиль cProfile"""
+
+    def test_stage_timer_accumulates_and_moves_time(self):
+        from .profiling import StageTimer
+
+        timer = StageTimer()
+        with mock.patch('cars.profiling.time.perf_counter', side_effect=[0.0, 2.0, 10.0, 10.5, 11.0, 12.0]):
+            with timer.stage('fetch'):
+                pass
+            # Время получения элементов потока - этап parse, обработка элемента - нет
+            self.assertEqual(list(timer.iterate('parse', [1])), [1])
+        timer.move('parse', 'fetch', 0.25)
+        self.assertEqual(timer.totals, {'fetch': 2.25, 'parse': 1.25, 'persist': 0.0, 'sleep': 0.0})
+
+        parser_log = ParserLog(url='test')
+        timer.apply_to(parser_log)
+        self.assertEqual((parser_log.fetch_seconds, parser_log.parse_seconds), (2.25, 1.25))
+        self.assertGreater(parser_log.peak_memory_kb, 0)
+
+    def test_profile_includes_worker_threads(self):
+        import marshal
+        from concurrent.futures import ThreadPoolExecutor
+        from .profiling import RunProfiler
+
+        profiler = RunProfiler()
+        profiler.start()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda _: profiled_worker_function(), range(4)))
+        profiler.stop()
+
+        stats = marshal.loads(profiler.profile_data)
+        calls = [value[1] for key, value in stats.items() if key[2] == 'profiled_worker_function']
+        self.assertEqual(calls, [4])
+        self.assertIn('profiled_worker_function', profiler.report)
+
+    def test_admin_downloads_profile(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        parser_log = ParserLog.objects.create(url='test', profile_data=b'stats')
+        empty_log = ParserLog.objects.create(url='empty')
+
+        response = self.client.get(f'/admin/cars/parserlog/{parser_log.id}/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'stats')
+        self.assertIn(f'parser_log_{parser_log.id}.prof', response['Content-Disposition'])
+        self.assertEqual(self.client.get(f'/admin/cars/parserlog/{empty_log.id}/profile/').status_code, 404)
+
+
+class AutoThrottleTests(TestCase):
+    """AIMD-регулятор скорости обхода"""
+
+    def make_throttle(self, **kwargs):
+        from .throttle import AutoThrottle
+
+        options = dict(delay=2.0, window=3, target_latency=1.0, delay_step=0.5, backoff_factor=2.0)
+        options.update(kwargs)
+        return AutoThrottle('example.com', **options)
+
+    def clean_window(self, throttle):
+        for _ in range(throttle.window):
+            throttle.observe(0.2, 200)
+
+    def test_clean_window_increases_speed(self):
+        throttle = self.make_throttle(concurrency=2)
+        throttle.use_slots(4)
+        self.clean_window(throttle)
+        self.assertEqual((throttle.delay, throttle.concurrency), (1.5, 3))
+        self.assertEqual((throttle.good_delay, throttle.good_concurrency), (2.0, 2))
+
+        # Окно с задержкой выше цели, но без ошибок - скорость не меняется
+        for _ in range(3):
+            throttle.observe(1.5, 200)
+        self.assertEqual((throttle.delay, throttle.concurrency, throttle.increases), (1.5, 3, 1))
+
+    def test_sequential_run_keeps_concurrency(self):
+        throttle = self.make_throttle()
+        for _ in range(5):
+            self.clean_window(throttle)
+        self.assertEqual((throttle.concurrency, throttle.good_concurrency), (1, 1))
+        throttle.observe(0.2, 429)
+        self.assertEqual(throttle.concurrency, 1)
+
+    def test_errors_and_spikes_back_off(self):
+        for status_code, latency in [(429, 0.2), (503, 0.2), (None, 0.2), (200, 10.0)]:
+            throttle = self.make_throttle(concurrency=4)
+            throttle.use_slots(8)
+            throttle.observe(latency, status_code)
+            if status_code in (503, None):
+                # Ошибка учитывается в конце окна
+                self.assertEqual(throttle.decreases, 0)
+                throttle.observe(0.2, 200)
+                throttle.observe(0.2, 200)
+            self.assertEqual((throttle.delay, throttle.concurrency, throttle.decreases), (4.0, 2, 1), status_code)
+            # Без удачного окна известной хорошей остается начальная пауза
+            self.assertEqual(throttle.good_delay, 2.0)
+
+    def test_good_delay_is_last_clean_window(self):
+        throttle = self.make_throttle()
+        self.clean_window(throttle)
+        self.clean_window(throttle)
+        self.assertEqual((throttle.delay, throttle.good_delay), (1.0, 1.5))
+        throttle.observe(0.2, 429)
+        self.assertEqual((throttle.delay, throttle.good_delay), (2.0, 1.5))
+
+    def test_limits_are_respected(self):
+        throttle = self.make_throttle(delay=0.6, min_delay=0.5, max_delay=5.0, concurrency=2)
+        throttle.use_slots(2)
+        self.clean_window(throttle)
+        self.clean_window(throttle)
+        self.assertEqual((throttle.delay, throttle.concurrency), (0.5, 2))
+
+        for _ in range(5):
+            throttle.observe(0.2, 429)
+        self.assertEqual((throttle.delay, throttle.concurrency), (5.0, 1))
+
+    def test_state_is_restored_from_last_good_values(self):
+        from .throttle import AutoThrottle
+
+        throttle = self.make_throttle(concurrency=2)
+        throttle.use_slots(4)
+        self.clean_window(throttle)
+        throttle.observe(0.2, 429)
+        throttle.save()
+
+        restored = AutoThrottle.for_url('https://example.com/catalog?page=1', max_concurrency=4)
+        self.assertEqual((restored.delay, restored.concurrency), (2.0, 1))
+        self.assertEqual((restored.good_delay, restored.good_concurrency), (2.0, 1))
+
+        # Сохраненное значение вне границ нового регулятора приводится к ним
+        restored = AutoThrottle.for_url('https://example.com/', min_delay=3.0)
+        self.assertEqual(restored.delay, 3.0)
+
+
+@mock.patch('builtins.print')
+class DataLifecycleTests(TestCase):
+    """Полная очистка и удаление старых лотов"""
+
+    def make_car(self, lot_number, days_ago, images=1):
+        car = Car.objects.create(lot_number=lot_number, brand='TOYOTA', model='PRIUS', year=2015,
+                                 auction_at=timezone.now() - timedelta(days=days_ago))
+        for index in range(images):
+            Image.objects.create(car=car, url=f'https://example.com/{lot_number}/{index}.jpg')
+        return car
+
+    def test_retention_deletes_and_archives_old_lots_in_batches(self, _print):
+        from .lifecycle import apply_retention
+
+        old = [self.make_car(str(number), days_ago=40 + number) for number in range(3)]
+        recent = self.make_car('100', days_ago=5)
+        Car.objects.create(lot_number='200', brand='TOYOTA', model='PRIUS', year=2015)
+
+        self.assertEqual(apply_retention(30, dry_run=True), 3)
+        self.assertEqual(Car.objects.count(), 5)
+
+        archive = StringIO()
+        progress = []
+        deleted = apply_retention(30, batch_size=2, archive=archive,
+                                  progress=lambda processed, total: progress.append((processed, total)))
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(progress, [(2, 3), (3, 3)])
+        self.assertEqual(sorted(Car.objects.values_list('lot_number', flat=True)), ['100', '200'])
+        self.assertEqual(list(Image.objects.values_list('car_id', flat=True)), [recent.id])
+
+        archived = [json.loads(line) for line in archive.getvalue().splitlines()]
+        self.assertEqual(sorted(item['id'] for item in archived), [car.id for car in old])
+        self.assertEqual(archived[0]['images'], [f"https://example.com/{archived[0]['lot_number']}/0.jpg"])
+
+    def test_purge_deletes_tables_in_dependency_order(self, _print):
+        from .lifecycle import PURGE_MODELS, purge_all
+
+        car = self.make_car('1', days_ago=1, images=2)
+        search = SavedSearch.objects.create(name='Prius', brand='TOYOTA')
+        search.matches.create(car=car)
+        ParserLog.objects.create(url='test')
+
+        with CaptureQueriesContext(connection) as queries:
+            counts = purge_all()
+
+        self.assertEqual((counts['car'], counts['image'], counts['searchmatch']), (1, 2, 1))
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(deletes, [f'DELETE FROM "{model._meta.db_table}"' for model in PURGE_MODELS])
+        for model in PURGE_MODELS:
+            self.assertFalse(model.objects.exists(), model)
+        # Сохраненные поиски остаются
+        self.assertTrue(SavedSearch.objects.filter(id=search.id).exists())
+
+    def test_clear_view_runs_purge_job(self, _print):
+        from .tasks import run_maintenance_job
+
+        self.make_car('1', days_ago=1)
+        with mock.patch('cars.views.start_maintenance_job') as start_job:
+            response = self.client.post('/parser/clear/')
+        self.assertEqual(response.status_code, 302)
+
+        job = MaintenanceJob.objects.get()
+        self.assertEqual((job.kind, job.status), ('purge', 'running'))
+        start_job.assert_called_once_with(job.id)
+
+        run_maintenance_job(job.id)
+        status = self.client.get(f'/parser/maintenance/{job.id}/').json()
+        self.assertEqual((status['status'], status['processed']), ('completed', 1))
+        self.assertIsNotNone(status['finished_at'])
+        self.assertFalse(Car.objects.exists())
+
+    def test_failed_job_is_marked_error(self, _print):
+        from django.core.management import CommandError, call_command
+
+        self.make_car('1', days_ago=40)
+        with mock.patch('cars.tasks.apply_retention', side_effect=RuntimeError('disk full')), \
+                self.assertRaises(CommandError):
+            call_command('purge_data', '--retention', '--days', '30', stdout=StringIO())
+
+        job = MaintenanceJob.objects.get()
+        self.assertEqual((job.kind, job.status, job.message), ('retention', 'error', 'disk full'))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(Car.objects.count(), 1)
+
+
+@override_settings(VALUATION_AUTO_REFRESH=False)
+@mock.patch('builtins.print')
+class PartitioningTests(TestCase):
+    """Помесячное секционирование: границы секций и ключ секций изображений"""
+
+    def test_partition_bounds_and_names(self, _print):
+        from datetime import datetime, timezone as dt_timezone
+        from .partitioning import add_months, month_start, parse_bound, partition_name
+
+        december = datetime(2025, 12, 1, tzinfo=dt_timezone.utc)
+        self.assertEqual(add_months(december, 1), datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(add_months(december, -12), datetime(2024, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(month_start(datetime(2026, 3, 17, 15, 30, tzinfo=dt_timezone.utc)),
+                         datetime(2026, 3, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partition_name(Car, december), 'cars_car_p202512')
+
+        self.assertEqual(
+            parse_bound("FOR VALUES FROM ('2026-01-01 00:00:00+00') TO ('2026-02-01 00:00:00+00')"),
+            (datetime(2026, 1, 1, tzinfo=dt_timezone.utc), datetime(2026, 2, 1, tzinfo=dt_timezone.utc)),
+        )
+        self.assertEqual(parse_bound("FOR VALUES FROM (MINVALUE) TO ('2026-02-01 00:00:00+00')"),
+                         (None, datetime(2026, 2, 1, tzinfo=dt_timezone.utc)))
+        self.assertEqual(parse_bound('DEFAULT'), (None, None))
+
+    def test_partitioning_requires_postgresql(self, _print):
+        from django.core.management import CommandError, call_command
+        from .partitioning import PartitioningError, enable_partitioning, ensure_partitions, expire_partitions
+
+        if connection.vendor == 'postgresql':
+            self.skipTest("проверка для СУБД без секционирования")
+        for action in (lambda: enable_partitioning(Car), lambda: ensure_partitions(Car),
+                       lambda: expire_partitions(Car, 12)):
+            with self.assertRaises(PartitioningError):
+                action()
+        with self.assertRaisesMessage(CommandError, "только на PostgreSQL"):
+            call_command('manage_partitions', '--list', stdout=StringIO())
+
+    def test_images_from_later_crawls_share_car_month(self, _print):
+        created_at = timezone.now() - timedelta(days=65)
+        car = Car.objects.create(lot_number='1', brand='TOYOTA', model='PRIUS', year=2015)
+        Car.objects.filter(id=car.id).update(created_at=created_at)
+
+        record = CarRecord(lot_number='1', brand='TOYOTA', model='PRIUS', year=2015,
+                           images=('https://example.com/1.jpg',))
+        AuctionParser().save_to_database([record])
+
+        self.assertEqual(Image.objects.get(car=car).created_at, created_at)
+
+
+class CarRecordTests(SimpleTestCase):
+    """Поток CarRecord: разбор с разрушением дерева и пачки записей"""
+
+    def test_iterative_parse_matches_list_parse(self):
+        import os
+        from bs4 import BeautifulSoup
+        from django.conf import settings
+
+        path = os.path.join(settings.BASE_DIR, 'benchmarks', 'fixtures', 'catalog_page.html')
+        with open(path, encoding='utf-8') as page:
+            html = page.read()
+        parser = AuctionParser()
+
+        with mock.patch('builtins.print'):
+            # Прежний разбор: все блоки извлекаются из целого дерева, без decompose()
+            soup = BeautifulSoup(html, 'html.parser')
+            expected = [car for car in map(parser.extract_car_from_block, parser.adapter.find_blocks(soup)) if car]
+            records = list(parser.iter_car_records(html))
+
+        self.assertEqual(len(records), 45)
+        self.assertEqual([record.to_dict() for record in records], [car.to_dict() for car in expected])
+        self.assertEqual(sum(1 for record in records if record.images), 44)
+
+    def test_batches_cover_stream_without_loss(self):
+        from .records import batched
+
+        for size, total in [(20, 0), (20, 1), (20, 20), (20, 41), (1, 3)]:
+            batches = list(batched((CarRecord(lot_number=str(number)) for number in range(total)), size))
+            self.assertEqual([len(batch) for batch in batches],
+                             [size] * (total // size) + ([total % size] if total % size else []), (size, total))
+            self.assertEqual([record.lot_number for batch in batches for record in batch],
+                             [str(number) for number in range(total)])
+
+    def test_batches_are_read_lazily(self):
+        from .records import batched
+
+        produced = []
+
+        def records():
+            for number in range(5):
+                produced.append(number)
+                yield CarRecord(lot_number=str(number))
+
+        batches = batched(records(), 2)
+        self.assertEqual(len(next(batches)), 2)
+        self.assertEqual(produced, [0, 1])
+
+    def test_record_is_compact(self):
+        record = CarRecord(lot_number='1', images=('a', 'b'))
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(record.to_dict()['images'], ['a', 'b'])
+
+
+class ValuationTests(TestCase):
+    """Оценка лотов по кривым аналогов (cars.valuation)"""
+
+    CURRENT_YEAR = 2026
+
+    @staticmethod
+    def fixture_lots():
+        # Модель (A, X) - своя кривая; (A, Y) мала - кривая марки A;
+        # марка B мала - общая кривая
+        rng = np.random.default_rng(7)
+        groups = [('A', 'X', 12), ('A', 'Y', 3), ('B', 'Z', 4)]
+        rows = []
+        for brand, model, count in groups:
+            for _ in range(count):
+                year = int(rng.integers(2008, 2024))
+                mileage = float(rng.integers(10_000, 200_000))
+                price = float(np.exp(14 - 0.08 * (2026 - year) - 0.1 * np.log1p(mileage) + rng.normal(0, 0.1)))
+                rows.append((brand, model, year, mileage, price))
+        return rows
+
+    def make_arrays(self, rows):
+        from .valuation import LotArrays
+
+        brand_index, model_index = {}, {}
+        return LotArrays(
+            np.arange(len(rows), dtype=np.int64),
+            np.array([row[4] for row in rows]),
+            np.array([row[2] for row in rows], dtype=float),
+            np.array([row[3] for row in rows]),
+            np.array([brand_index.setdefault(row[0], len(brand_index)) for row in rows]),
+            np.array([model_index.setdefault(row[:2], len(model_index)) for row in rows]),
+        )
+
+    @staticmethod
+    def reference_fit(features, target):
+        """Гребневая регрессия одной группы через lstsq на расширенной системе"""
+        from .valuation import MIN_SIGMA, RIDGE
+
+        penalty = np.diag([np.sqrt(1e-9), np.sqrt(RIDGE), np.sqrt(RIDGE)])
+        coefficients = np.linalg.lstsq(
+            np.vstack([features, penalty]), np.concatenate([target, np.zeros(3)]), rcond=None,
+        )[0]
+        residuals = target - features @ coefficients
+        sigma = max(np.sqrt((residuals ** 2).sum() / max(len(target) - 3, 1)), MIN_SIGMA)
+        return coefficients, sigma
+
+    def test_scores_match_per_group_least_squares(self):
+        from .valuation import design_matrix, fit_groups, score_lots
+
+        rows = self.fixture_lots()
+        lots = self.make_arrays(rows)
+        features = design_matrix(lots, self.CURRENT_YEAR)
+        target = np.log(lots.prices)
+
+        coefficients, sigma, sizes = fit_groups(lots.model_codes, features, target)
+        self.assertEqual(sizes.tolist(), [12, 3, 4])
+        for code in range(3):
+            members = lots.model_codes == code
+            expected_coefficients, expected_sigma = self.reference_fit(features[members], target[members])
+            np.testing.assert_allclose(coefficients[code], expected_coefficients, rtol=1e-6, atol=1e-8)
+            self.assertAlmostEqual(sigma[code], expected_sigma)
+
+        expected_prices, zscores = score_lots(lots, self.CURRENT_YEAR)
+        # Группа для каждого лота: модель X, марка A для модели Y, все лоты для марки B
+        brands = np.array([row[0] for row in rows])
+        models = np.array([row[1] for row in rows])
+        for members, peers in [(models == 'X', models == 'X'), (models == 'Y', brands == 'A'),
+                               (brands == 'B', np.ones(len(rows), dtype=bool))]:
+            peer_coefficients, peer_sigma = self.reference_fit(features[peers], target[peers])
+            predicted = features[members] @ peer_coefficients
+            np.testing.assert_allclose(expected_prices[members], np.exp(predicted), rtol=1e-6)
+            np.testing.assert_allclose(zscores[members], (target[members] - predicted) / peer_sigma,
+                                       rtol=1e-6, atol=1e-8)
+
+    def test_missing_mileage_uses_model_mean(self):
+        from .valuation import design_matrix
+
+        rows = self.fixture_lots()
+        rows[0] = rows[0][:3] + (np.nan,) + rows[0][4:]
+        lots = self.make_arrays(rows)
+        features = design_matrix(lots, self.CURRENT_YEAR)
+        self.assertAlmostEqual(features[0, 2], np.log1p(lots.mileages[1:12]).mean())
+        self.assertEqual(features[0, 1], self.CURRENT_YEAR - rows[0][2])
+
+    def test_refresh_writes_only_changed_rows(self):
+        from .valuation import refresh_scores
+
+        cars = [Car.objects.create(brand=brand, model=model, year=year, mileage=int(mileage), price=int(price))
+                for brand, model, year, mileage, price in self.fixture_lots()]
+        stale = Car.objects.create(brand='A', model='X', year=2015, price=None, expected_price=100, price_zscore=1.0)
+
+        first = refresh_scores()
+        self.assertEqual((first['lots'], first['written'], first['cleared']), (19, 19, 1))
+        stale.refresh_from_db()
+        self.assertEqual((stale.expected_price, stale.price_zscore), (None, None))
+
+        self.assertEqual(refresh_scores()['written'], 0)
+
+        Car.objects.filter(id=cars[0].id).update(price_zscore=F('price_zscore') + 0.5)
+        before = Car.objects.get(id=cars[1].id).updated_at
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(refresh_scores()['written'], 1)
+        updates = [query['sql'] for query in queries if 'UPDATE' in query['sql'] and 'VALUES' in query['sql']]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Car.objects.get(id=cars[1].id).updated_at, before)
+
+
+@override_settings(VALUATION_AUTO_REFRESH=False)
+@mock.patch('builtins.print')
+class NaturalKeyDedupeTests(TestCase):
+    """Повторы лотов без номера: естественный ключ, запись и слияние копий"""
+
+    def record(self, **fields):
+        values = dict(brand='TOYOTA', model='PRIUS', year=2015, mileage=80000, price=500000,
+                      auction_date='01.03.2026', images=('https://img.example/1.jpg',))
+        values.update(fields)
+        return CarRecord(**values)
+
+    def test_key_normalization(self, _print):
+        from datetime import datetime, timezone as dt_timezone
+        from .dedupe import natural_key
+
+        key = natural_key('Toyota', 'Prius  Alpha', 2015, 80000, None, ' 01.03.2026 ', ' https://img/1.jpg ')
+        self.assertEqual(key, natural_key(' TOYOTA', 'prius alpha', 2015, 80000, None, '01.03.2026',
+                                          'https://img/1.jpg'))
+        self.assertNotEqual(key, natural_key('Toyota', 'Prius Alpha', 2015, 90000, None, '01.03.2026',
+                                             'https://img/1.jpg'))
+        # Дата аукциона: при известной auction_at текст даты не учитывается
+        auction_at = datetime(2026, 3, 1, 9, 30, tzinfo=dt_timezone.utc)
+        self.assertEqual(natural_key('Toyota', 'Prius', 2015, None, auction_at, '01.03.2026 9:30', None),
+                         natural_key('Toyota', 'Prius', 2015, None, auction_at.replace(hour=15), 'другой', None))
+        self.assertNotEqual(natural_key('Toyota', 'Prius', 2015, None, None, '01.03.2026', None),
+                            natural_key('Toyota', 'Prius', 2015, None, None, '02.03.2026', None))
+        self.assertIsNone(natural_key('', 'Prius', 2015, None, None, None, None))
+        self.assertIsNone(natural_key('Toyota', 'Prius', None, None, None, None, None))
+
+    def test_repeats_in_batch_and_in_database_are_skipped(self, _print):
+        from .dedupe import DedupeStats
+
+        stats = DedupeStats()
+        parser = AuctionParser(dedupe_stats=stats)
+        cars, images = parser.save_to_database([self.record(), self.record(brand='toyota '), self.record(year=2016)])
+        self.assertEqual((cars, Car.objects.count()), (2, 2))
+        self.assertEqual(stats.as_dict(), {'keyless': 3, 'duplicates': 1, 'rate': 0.333})
+
+        cars, images = parser.save_to_database([self.record(images=('https://img.example/1.jpg',
+                                                                    'https://img.example/2.jpg'))])
+        self.assertEqual((cars, images, Car.objects.count()), (0, 1, 2))
+        self.assertEqual(stats.duplicates, 2)
+        # Лоты с номером сравниваются по номеру, а не по ключу
+        parser.save_to_database([self.record(lot_number='77')])
+        self.assertEqual(Car.objects.count(), 3)
+
+    def make_copies(self):
+        from .dedupe import record_key
+
+        key = record_key(self.record())
+        copies = []
+        for index, (price, urls) in enumerate([(500000, ['a', 'b']), (510000, ['b', 'c']), (520000, ['c', 'd'])]):
+            car = Car.objects.create(brand='TOYOTA', model='PRIUS', year=2015, price=price,
+                                     natural_key=key, lot_url=f'https://lot/{index}')
+            Car.objects.filter(id=car.id).update(created_at=timezone.now() - timedelta(days=40 - index))
+            for url in urls:
+                Image.objects.create(car=car, url=f'https://img.example/{url}.jpg')
+            copies.append(car)
+        return copies
+
+    def test_merge_keeps_earliest_with_newest_fields(self, _print):
+        from .dedupe import merge_duplicates
+
+        keep, middle, newest = self.make_copies()
+        other = Car.objects.create(brand='NISSAN', model='NOTE', year=2015, natural_key='other')
+
+        self.assertEqual(merge_duplicates(), (1, 2))
+
+        self.assertEqual(sorted(Car.objects.values_list('id', flat=True)), [keep.id, other.id])
+        keep.refresh_from_db()
+        self.assertEqual((keep.price, keep.lot_url), (520000, 'https://lot/2'))
+        images = Image.objects.filter(car=keep).order_by('url')
+        self.assertEqual([image.url.rsplit('/', 1)[1] for image in images], ['a.jpg', 'b.jpg', 'c.jpg', 'd.jpg'])
+        self.assertEqual(Image.objects.count(), 4)
+        # Перенесенные изображения - в месяце оставленного автомобиля (ключ секций)
+        self.assertEqual({image.created_at for image in images.filter(url__endswith='d.jpg')}, {keep.created_at})
+
+    def test_dry_run_counts_without_writing(self, _print):
+        from django.core.management import call_command
+
+        self.make_copies()
+        unkeyed = Car.objects.create(brand='NISSAN', model='NOTE', year=2015)
+
+        stdout = StringIO()
+        call_command('dedupe_cars', '--dry-run', stdout=stdout, stderr=StringIO())
+        self.assertEqual(json.loads(stdout.getvalue()),
+                         {'backfilled': 0, 'duplicate_groups': 1, 'removed': 2, 'dry_run': True})
+        self.assertEqual((Car.objects.count(), Image.objects.count()), (4, 6))
+        unkeyed.refresh_from_db()
+        self.assertIsNone(unkeyed.natural_key)
+
+    def test_backfill_fills_missing_keys(self, _print):
+        from .dedupe import backfill_keys, natural_key
+
+        car = Car.objects.create(brand='NISSAN', model='NOTE', year=2015, mileage=1000)
+        Image.objects.create(car=car, url='https://img.example/first.jpg')
+        Image.objects.create(car=car, url='https://img.example/second.jpg')
+
+        self.assertEqual(backfill_keys(batch_size=1), 1)
+        car.refresh_from_db()
+        self.assertEqual(car.natural_key, natural_key('NISSAN', 'NOTE', 2015, 1000, None, None,
+                                                      'https://img.example/first.jpg'))
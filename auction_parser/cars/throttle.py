@@ -0,0 +1,172 @@
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+from .models import ThrottleState
+
+
+class AutoThrottle:
+    """
+    AIMD-регулятор скорости обхода.
+
+    Ответы сайта собираются в окна по window запросов. Если в окне нет
+    ошибок и средняя задержка ответа в пределах target_latency, пауза
+    уменьшается на delay_step, а параллельность растет на 1 (аддитивно).
+    При 429/5xx/сетевых ошибках или всплеске задержки пауза умножается
+    на backoff_factor, а параллельность делится пополам (мультипликативно).
+    Ответ 429 вызывает снижение сразу, не дожидаясь конца окна.
+    Параллельность подбирается только в многопоточном режиме (use_slots):
+    в последовательном запросы идут по одному, и окна о ней ничего не говорят.
+    """
+
+    def __init__(self, host, delay=3.0, concurrency=1, min_delay=0.5, max_delay=60.0,
+                 max_concurrency=8, target_latency=2.0, latency_spike_factor=3.0,
+                 delay_step=0.25, backoff_factor=2.0, window=5):
+        self.host = host
+        self.delay = delay
+        self.concurrency = concurrency
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.latency_spike_factor = latency_spike_factor
+        self.delay_step = delay_step
+        self.backoff_factor = backoff_factor
+        self.window = window
+
+        self.good_delay = delay
+        self.good_concurrency = concurrency
+        self.adapt_concurrency = False  # запросы идут через слоты acquire/release
+        self.increases = 0
+        self.decreases = 0
+
+        self._latencies = []
+        self._errors = 0
+        self._active = 0
+        self._next_start = 0.0
+        self._condition = threading.Condition()
+
+    @classmethod
+    def for_url(cls, url, **kwargs):
+        """
+        Регулятор для сайта из URL; стартует с последнего удачного состояния
+        """
+        host = urlsplit(url).netloc
+        throttle = cls(host, **kwargs)
+        state = ThrottleState.objects.filter(host=host).first()
+        if state:
+            throttle.delay = min(max(state.good_delay, throttle.min_delay), throttle.max_delay)
+            throttle.concurrency = min(max(1, state.good_concurrency), throttle.max_concurrency)
+            throttle.good_delay = throttle.delay
+            throttle.good_concurrency = throttle.concurrency
+        return throttle
+
+    def use_slots(self, max_concurrency):
+        """
+        Многопоточный режим: до max_concurrency запросов одновременно,
+        внутри этой границы параллельность подбирается по ответам сайта
+        """
+        with self._condition:
+            self.max_concurrency = max_concurrency
+            self.concurrency = min(self.concurrency, max_concurrency)
+            self.adapt_concurrency = max_concurrency > 1
+
+    def observe(self, latency, status_code=None):
+        """
+        Учитывает ответ сайта. status_code=None - сетевая ошибка
+        """
+        with self._condition:
+            is_error = status_code is None or status_code == 429 or status_code >= 500
+            if status_code == 429:
+                # Сайт прямо просит снизить скорость
+                self._decrease()
+                return
+
+            self._latencies.append(latency)
+            self._errors += int(is_error)
+
+            spike = latency > self.target_latency * self.latency_spike_factor
+            if spike or len(self._latencies) >= self.window:
+                self._evaluate(spike)
+
+    def _evaluate(self, spike):
+        mean_latency = sum(self._latencies) / len(self._latencies)
+        if self._errors or spike:
+            self._decrease()
+        elif mean_latency <= self.target_latency:
+            self._increase()
+        else:
+            # Задержка выше цели, но без ошибок - держим текущую скорость
+            self._reset_window()
+
+    def _increase(self):
+        # Текущее состояние подтвердилось окном без ошибок
+        self.good_delay = self.delay
+        self.delay = max(self.min_delay, self.delay - self.delay_step)
+        if self.adapt_concurrency:
+            self.good_concurrency = self.concurrency
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+        self.increases += 1
+        self._reset_window()
+        self._condition.notify_all()
+
+    def _decrease(self):
+        # good_delay не меняется: это последняя пауза, прошедшая окно без ошибок
+        self.delay = min(self.max_delay, self.delay * self.backoff_factor)
+        if self.adapt_concurrency:
+            self.concurrency = max(1, self.concurrency // 2)
+            self.good_concurrency = min(self.good_concurrency, self.concurrency)
+        self.decreases += 1
+        self._reset_window()
+
+    def _reset_window(self):
+        self._latencies = []
+        self._errors = 0
+
+    def pause_seconds(self):
+        """Пауза между страницами в последовательном режиме (±20% джиттера)"""
+        return self.delay * random.uniform(0.8, 1.2)
+
+    def acquire(self):
+        """
+        Ждет свободного слота в многопоточном режиме: не больше concurrency
+        запросов одновременно и не чаще одного старта за delay / concurrency секунд
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._active < self.concurrency and now >= self._next_start:
+                    self._active += 1
+                    self._next_start = now + self.delay / self.concurrency
+                    return
+                timeout = max(0.0, self._next_start - now) if self._active < self.concurrency else None
+                self._condition.wait(timeout)
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def state(self):
+        """Состояние для отчетов о ходе парсинга"""
+        return {
+            'host': self.host,
+            'delay': round(self.delay, 2),
+            'concurrency': self.concurrency,
+            'good_delay': round(self.good_delay, 2),
+            'good_concurrency': self.good_concurrency,
+            'increases': self.increases,
+            'decreases': self.decreases,
+        }
+
+    def save(self):
+        """Сохраняет состояние, чтобы следующий запуск начал с удачной скорости"""
+        ThrottleState.objects.update_or_create(
+            host=self.host,
+            defaults={
+                'delay': self.delay,
+                'concurrency': self.concurrency,
+                'good_delay': self.good_delay,
+                'good_concurrency': self.good_concurrency,
+            },
+        )
@@ -0,0 +1,325 @@
+import time
+import random
+import importlib
+import threading
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from django.utils import timezone
+from . import metrics
+
+# Коды ответа, после которых имеет смысл повторить запрос
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# Сетевые ошибки, после которых имеет смысл повторить запрос
+RETRYABLE_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+# Размер части ответа при потоковом чтении, байт
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class TransportError(Exception):
+    """Страницу не удалось получить (после всех повторов)"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(TransportError):
+    """Сайт временно считается недоступным, запросы не отправляются"""
+
+
+def supported_encodings(http2=False):
+    """
+    Значение Accept-Encoding только с теми алгоритмами, которые клиент
+    действительно умеет декодировать (br и zstd - при установленных пакетах)
+    """
+    if http2:
+        # httpx декодирует br и zstd теми же пакетами, что и urllib3
+        encodings = ['gzip', 'deflate']
+        if installed('brotli', 'brotlicffi'):
+            encodings.append('br')
+        if installed('zstandard'):
+            encodings.append('zstd')
+    else:
+        encodings = ACCEPT_ENCODING.split(',')
+    return ', '.join(encodings)
+
+
+def installed(*modules):
+    """Импортируется ли хотя бы один из пакетов"""
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            continue
+        return True
+    return False
+
+
+def set_default_encoding(response):
+    """Без указанной в Content-Type кодировки считаем страницу UTF-8"""
+    content_type = response.headers.get('Content-Type', '')
+    if 'charset' not in content_type.lower():
+        response.encoding = 'utf-8'
+
+
+class TextStream:
+    """
+    Тело ответа, читаемое частями по мере загрузки: итерация выдает
+    декодированный текст. open_seconds - время до получения заголовков
+    (с повторами), read_seconds - время ожидания частей тела.
+    После итерации ответ закрыт, соединение возвращено в пул.
+    """
+
+    def __init__(self, response, chunk_size=STREAM_CHUNK_SIZE):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.open_seconds = 0.0
+        self.read_seconds = 0.0
+        set_default_encoding(response)
+
+    @property
+    def size(self):
+        """Получено байт (до распаковки)"""
+        if hasattr(self.response, 'num_bytes_downloaded'):
+            return self.response.num_bytes_downloaded
+        return self.response.raw.tell()
+
+    def __iter__(self):
+        if hasattr(self.response, 'iter_text'):
+            chunks = self.response.iter_text(self.chunk_size)
+        else:
+            chunks = self.response.iter_content(self.chunk_size, decode_unicode=True)
+        try:
+            while True:
+                started = time.monotonic()
+                try:
+                    chunk = next(chunks, None)
+                except Exception as e:
+                    raise TransportError(f"Обрыв при чтении ответа: {type(e).__name__}: {e}") from e
+                finally:
+                    self.read_seconds += time.monotonic() - started
+                if chunk is None:
+                    return
+                if chunk:
+                    yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        self.response.close()
+
+
+class CircuitBreaker:
+    """
+    Размыкается после failure_threshold неудачных запросов подряд и
+    не пропускает запросы reset_timeout секунд. Затем пропускает один
+    пробный запрос (с его повторами), остальные потоки получают
+    CircuitOpenError: успех замыкает цепь, ошибка снова размыкает.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = None  # поток, выполняющий пробный запрос
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_request(self):
+        with self._lock:
+            state = self.state
+            if state == 'open':
+                raise CircuitOpenError("Сайт временно недоступен (circuit breaker разомкнут)")
+            if state == 'half-open':
+                thread = threading.get_ident()
+                if self.probing not in (None, thread):
+                    raise CircuitOpenError("Сайт временно недоступен (выполняется пробный запрос)")
+                self.probing = thread
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = None
+
+    def record_failure(self):
+        with self._lock:
+            self.probing = None
+            self.failures += 1
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                # В полуоткрытом состоянии одной ошибки достаточно, чтобы снова разомкнуть цепь
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Пробный запрос не сказал ничего о доступности сайта (например, 404): следующий снова пробный"""
+        with self._lock:
+            if self.probing == threading.get_ident():
+                self.probing = None
+
+
+class HttpTransport:
+    """
+    HTTP-клиент парсера: повторы с экспоненциальной задержкой и джиттером,
+    учет Retry-After, circuit breaker, пул соединений по числу потоков,
+    декодирование brotli/zstd и опциональный HTTP/2 (через httpx).
+    """
+
+    def __init__(self, headers=None, concurrency=1, timeout=15, max_retries=4,
+                 backoff_base=1.0, backoff_cap=30.0, max_retry_after=120,
+                 circuit_breaker=None, http2=False, observer=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_retry_after = max_retry_after
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.headers = dict(headers or {})
+        self.headers['Accept-Encoding'] = supported_encodings(http2)
+        self.http2 = http2
+        # observer(latency, status_code) получает результат каждой попытки (None - сетевая ошибка)
+        self.observer = observer
+
+        if http2:
+            import httpx
+            # В HTTP/2 заголовки уровня соединения запрещены
+            self.headers.pop('Connection', None)
+            self.client = httpx.Client(
+                http2=True,
+                headers=self.headers,
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            )
+        else:
+            self.client = requests.Session()
+            self.client.headers.update(self.headers)
+            # Пул по числу потоков: без этого лишние соединения закрываются после каждого запроса
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, concurrency))
+            self.client.mount('http://', adapter)
+            self.client.mount('https://', adapter)
+
+    def get_text(self, url):
+        """
+        Возвращает (текст страницы, размер ответа в байтах) или бросает TransportError
+        """
+        response = self.send(url)
+        return self.decode_text(response), len(response.content)
+
+    def open_stream(self, url, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Возвращает тело ответа потоком TextStream или бросает TransportError.
+        Повторы и circuit breaker - как в get_text, до получения заголовков;
+        обрыв соединения при чтении тела не повторяется (TransportError из итерации)
+        """
+        started = time.monotonic()
+        response = self.send(url, stream=True)
+        stream = TextStream(response, chunk_size)
+        stream.open_seconds = time.monotonic() - started
+        return stream
+
+    def send(self, url, stream=False):
+        """GET с повторами при временных ошибках, возвращает успешный ответ"""
+        attempt = 0
+        while True:
+            self.circuit_breaker.before_request()
+            started = time.monotonic()
+            try:
+                response = self.request(url, stream)
+            except Exception as e:
+                if not self.is_retryable_exception(e):
+                    self.circuit_breaker.release_probe()
+                    raise TransportError(f"{type(e).__name__}: {e}") from e
+                self.notify(time.monotonic() - started, None)
+                delay = self.backoff_delay(attempt)
+                reason = type(e).__name__
+                status_code = None
+            else:
+                self.notify(time.monotonic() - started, response.status_code)
+                if response.status_code < 400:
+                    self.circuit_breaker.record_success()
+                    return response
+
+                if stream:
+                    # Соединение возвращается в пул только после закрытия ответа
+                    response.close()
+                if response.status_code not in RETRYABLE_STATUSES:
+                    # Ошибки клиента (404 и т.п.) не говорят о проблемах сайта
+                    self.circuit_breaker.release_probe()
+                    raise TransportError(f"HTTP {response.status_code}", response.status_code)
+
+                delay = self.retry_after(response)
+                if delay is None:
+                    delay = self.backoff_delay(attempt)
+                reason = str(response.status_code)
+                status_code = response.status_code
+
+            if attempt >= self.max_retries:
+                # В circuit breaker учитываются запросы, а не отдельные попытки
+                self.circuit_breaker.record_failure()
+                raise TransportError(f"Запрос не удался после {attempt + 1} попыток: {reason}", status_code)
+
+            metrics.HTTP_RETRIES.labels(reason).inc()
+            print(f"Повтор запроса через {delay:.1f} сек ({reason}): {url}")
+            time.sleep(delay)
+            attempt += 1
+
+    def request(self, url, stream=False):
+        if not stream:
+            return self.client.get(url, timeout=self.timeout)
+        if self.http2:
+            return self.client.send(self.client.build_request('GET', url, timeout=self.timeout), stream=True)
+        return self.client.get(url, timeout=self.timeout, stream=True)
+
+    def notify(self, latency, status_code):
+        if self.observer:
+            self.observer(latency, status_code)
+
+    @staticmethod
+    def is_retryable_exception(error):
+        if isinstance(error, RETRYABLE_EXCEPTIONS):
+            return True
+        try:
+            import httpx
+        except ImportError:
+            return False
+        return isinstance(error, httpx.TransportError)
+
+    def backoff_delay(self, attempt):
+        """Экспоненциальная задержка с полным джиттером"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def retry_after(self, response):
+        """Задержка из заголовка Retry-After (секунды или HTTP-дата)"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(value) - timezone.now()).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return min(max(0.0, delay), self.max_retry_after)
+
+    @staticmethod
+    def decode_text(response):
+        """Текст ответа; без указанной кодировки считаем страницу UTF-8"""
+        set_default_encoding(response)
+        return response.text
+
+    def close(self):
+        self.client.close()
@@ -5,8 +5,17 @@ urlpatterns = [
     path('', views.ParserView.as_view(), name='parser_view'),
     path('parser/start/', views.StartParserView.as_view(), name='start_parser'),
     path('parser/multi-start/', views.StartMultiPageParserView.as_view(), name='multi_start_parser'),
+    path('parser/resume/<int:log_id>/', views.ResumeParserView.as_view(), name='resume_parser'),
     path('parser/stop/', views.StopParserView.as_view(), name='stop_parser'),
     path('parser/status/', views.ParserStatusView.as_view(), name='parser_status'),
+    path('parser/recrawl/stats/', views.RecrawlStatsView.as_view(), name='recrawl_stats'),
     path('parser/clear/', views.ClearDataView.as_view(), name='clear_data'),
+    path('parser/maintenance/<int:job_id>/', views.MaintenanceJobStatusView.as_view(), name='maintenance_status'),
+    path('cars/lookup/', views.LotLookupView.as_view(), name='lot_lookup'),
+    path('searches/', views.SavedSearchView.as_view(), name='saved_searches'),
+    path('searches/<int:search_id>/matches/', views.SavedSearchMatchesView.as_view(), name='saved_search_matches'),
+    path('analytics/underpriced/', views.UnderpricedLotsView.as_view(), name='underpriced_lots'),
+    path('analytics/comparables/', views.ComparableLotsView.as_view(), name='comparable_lots'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
     path('cars/ajax/', views.CarsAjaxView.as_view(), name='cars_ajax'),  # Новый URL
 ]
\ No newline at end of file
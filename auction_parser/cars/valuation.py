@@ -0,0 +1,205 @@
+import time
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Car
+
+# Минимум лотов, при котором кривая строится по модели; иначе - по марке, затем по всем лотам
+MIN_PEERS = 8
+# Лот считается недооцененным, если его z-оценка не выше порога
+UNDERPRICED_Z = -1.5
+# Регуляризация наклонов: группы из пары лотов не дают вырожденных систем
+RIDGE = 1.0
+# Нижняя граница разброса, чтобы в почти однородных группах z-оценки не взлетали
+MIN_SIGMA = 0.05
+# Перезаписываются только оценки, изменившиеся сильнее порогов
+MIN_ZSCORE_CHANGE = 0.01
+MIN_PRICE_CHANGE = 0.005
+WRITE_BATCH = 2000
+
+
+class LotArrays:
+    """Лоты с ценой в виде массивов NumPy, загруженные одним запросом"""
+
+    def __init__(self, ids, prices, years, mileages, brand_codes, model_codes,
+                 expected_prices=None, zscores=None):
+        self.ids = ids
+        self.prices = prices
+        self.years = years
+        self.mileages = mileages  # NaN - пробег не указан
+        self.brand_codes = brand_codes
+        self.model_codes = model_codes  # код пары (марка, модель)
+        self.expected_prices = expected_prices  # сохраненные оценки (NaN - нет)
+        self.zscores = zscores
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, queryset=None):
+        queryset = queryset if queryset is not None else Car.objects.all()
+        queryset = queryset.filter(price__gt=0, year__gt=0).order_by().values_list(
+            'id', 'price', 'year', 'mileage', 'brand', 'model', 'expected_price', 'price_zscore',
+        )
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        if not rows:
+            empty = np.array([], dtype=np.int64)
+            return cls(empty, empty.astype(float), empty, empty.astype(float), empty, empty,
+                       empty.astype(float), empty.astype(float))
+
+        ids, prices, years, mileages, brands, models, expected_prices, zscores = zip(*rows)
+        brand_index, model_index = {}, {}
+        brand_codes = np.fromiter(
+            (brand_index.setdefault(brand, len(brand_index)) for brand in brands),
+            dtype=np.int64, count=len(rows),
+        )
+        model_codes = np.fromiter(
+            (model_index.setdefault(key, len(model_index)) for key in zip(brands, models)),
+            dtype=np.int64, count=len(rows),
+        )
+        return cls(
+            np.array(ids, dtype=np.int64),
+            np.array(prices, dtype=float),
+            np.array(years, dtype=float),
+            np.array(mileages, dtype=float),
+            brand_codes,
+            model_codes,
+            np.array(expected_prices, dtype=float),
+            np.array(zscores, dtype=float),
+        )
+
+
+def design_matrix(lots, current_year):
+    """
+    Признаки кривой амортизации: свободный член, возраст и log(1 + пробег).
+    Пропущенный пробег заменяется средним по модели (или по всем лотам).
+    """
+    log_mileage = np.log1p(lots.mileages)
+    known = ~np.isnan(log_mileage)
+    groups = lots.model_codes.max() + 1
+    sums = np.bincount(lots.model_codes[known], log_mileage[known], minlength=groups)
+    counts = np.bincount(lots.model_codes[known], minlength=groups)
+    overall = log_mileage[known].mean() if known.any() else 0.0
+    group_means = np.where(counts > 0, sums / np.maximum(counts, 1), overall)
+    log_mileage = np.where(known, log_mileage, group_means[lots.model_codes])
+
+    age = current_year - lots.years
+    return np.column_stack([np.ones(len(lots)), age, log_mileage])
+
+
+def fit_groups(codes, features, target):
+    """
+    Линейная регрессия target ~ features отдельно в каждой группе, разом для всех групп:
+    суммы X'X и X'y собираются через bincount, системы решаются одним вызовом.
+    Возвращает (коэффициенты групп, разброс остатков групп, размеры групп).
+    """
+    groups = codes.max() + 1
+    width = features.shape[1]
+    xtx = np.empty((groups, width, width))
+    xty = np.empty((groups, width))
+    for i in range(width):
+        xty[:, i] = np.bincount(codes, features[:, i] * target, minlength=groups)
+        for j in range(i, width):
+            xtx[:, i, j] = xtx[:, j, i] = np.bincount(codes, features[:, i] * features[:, j], minlength=groups)
+    ridge = np.eye(width) * RIDGE
+    ridge[0, 0] = 1e-9  # свободный член практически не штрафуется (только для пустых групп)
+    coefficients = np.linalg.solve(xtx + ridge, xty[..., None])[..., 0]
+
+    residuals = target - np.einsum('ij,ij->i', features, coefficients[codes])
+    sizes = np.bincount(codes, minlength=groups)
+    squares = np.bincount(codes, residuals ** 2, minlength=groups)
+    sigma = np.sqrt(squares / np.maximum(sizes - width, 1))
+    return coefficients, np.maximum(sigma, MIN_SIGMA), sizes
+
+
+def score_lots(lots, current_year=None):
+    """
+    Оценивает каждый лот относительно аналогов: по кривой своей модели,
+    если у нее не меньше MIN_PEERS лотов, иначе по кривой марки, иначе общей.
+    Возвращает (ожидаемые цены, z-оценки логарифмического остатка).
+    """
+    if not len(lots):
+        return np.array([]), np.array([])
+    current_year = current_year or timezone.now().year
+    features = design_matrix(lots, current_year)
+    target = np.log(lots.prices)
+
+    everyone = np.zeros(len(lots), dtype=np.int64)
+    predicted = np.empty(len(lots))
+    sigma = np.empty(len(lots))
+    chosen = np.zeros(len(lots), dtype=bool)
+    # От самого точного уровня к самому общему
+    for codes, min_size in ((lots.model_codes, MIN_PEERS), (lots.brand_codes, MIN_PEERS), (everyone, 1)):
+        coefficients, group_sigma, sizes = fit_groups(codes, features, target)
+        use = ~chosen & (sizes[codes] >= min_size)
+        predicted[use] = np.einsum('ij,ij->i', features[use], coefficients[codes[use]])
+        sigma[use] = group_sigma[codes[use]]
+        chosen |= use
+
+    return np.exp(predicted), (target - predicted) / sigma
+
+
+def refresh_scores(queryset=None, force=False):
+    """
+    Пересчитывает оценки всех лотов с ценой и сохраняет только изменившиеся.
+    Возвращает сводку: сколько лотов оценено и записано, время этапов.
+    """
+    started = time.perf_counter()
+    lots = LotArrays.load(queryset)
+    loaded = time.perf_counter()
+
+    expected, zscores = score_lots(lots)
+    scored = time.perf_counter()
+
+    if force:
+        changed = np.ones(len(lots), dtype=bool)
+    else:
+        old_expected = lots.expected_prices
+        changed = (
+            np.isnan(lots.zscores) | np.isnan(old_expected)
+            | (np.abs(zscores - lots.zscores) > MIN_ZSCORE_CHANGE)
+            | (np.abs(expected - old_expected) > MIN_PRICE_CHANGE * expected)
+        )
+    written = write_scores(lots.ids[changed], expected[changed], zscores[changed])
+
+    # У лотов, потерявших цену, оценка больше не имеет смысла
+    cleared = Car.objects.filter(price__isnull=True, price_zscore__isnull=False).update(
+        expected_price=None, price_zscore=None, updated_at=timezone.now(),
+    )
+
+    return {
+        'lots': len(lots),
+        'written': written,
+        'cleared': cleared,
+        'underpriced': int((zscores <= UNDERPRICED_Z).sum()),
+        'load_seconds': round(loaded - started, 3),
+        'score_seconds': round(scored - loaded, 3),
+        'write_seconds': round(time.perf_counter() - scored, 3),
+    }
+
+
+def write_scores(ids, expected, zscores):
+    """
+    Записывает оценки пачками: один UPDATE ... FROM (VALUES ...) на WRITE_BATCH лотов
+    вместо отдельного запроса на каждый лот
+    """
+    table = connection.ops.quote_name(Car._meta.db_table)
+    rows = list(zip(ids.tolist(), np.rint(expected).astype(np.int64).tolist(), np.round(zscores, 4).tolist()))
+    now = timezone.now()
+    for start in range(0, len(rows), WRITE_BATCH):
+        batch = rows[start:start + WRITE_BATCH]
+        values = ', '.join(['(%s, %s, %s)'] * len(batch))
+        params = [value for row in batch for value in row]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH scores (id, expected_price, price_zscore) AS (VALUES {values}) "
+                f"UPDATE {table} SET expected_price = scores.expected_price, "
+                f"price_zscore = scores.price_zscore, updated_at = %s "
+                f"FROM scores WHERE {table}.id = scores.id",
+                params + [now],
+            )
+    return len(rows)
@@ -1,121 +1,206 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified
 from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
+from django.conf import settings
 from django.views.generic import TemplateView
 from django.contrib import messages
 from django.utils import timezone
-import threading
-from .models import (ParserLog, Car, Image)
-from .parser import AuctionParser
-from .run_parse import MultiPageParser  # Импортируем новый класс
-
-from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time
+from .models import (ParserLog, Car, Image, ThrottleState, MaintenanceJob, SavedSearch)
+from .jobs import start_single_page_job, start_multi_page_job, start_resume_job, start_maintenance_job
+from .checkpoints import mark_stale_runs, stale_runs
+from .recrawl import RecrawlScheduler
+from .adapters import DEFAULT_SOURCE
+from .db_router import raise_replica_error
+from .metrics import render_latest
+from .query_guard import (QueryRejected, check_range, is_statement_timeout, ordering, page_size, parse_int,
+                          reject, search_filter, statement_timeout)
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from django.db.models import Q, Prefetch, Count, Max
 from django.core.paginator import Paginator
 import json
+import hashlib
+from time import perf_counter
 
 
 class CarsAjaxView(View):
-    """AJAX view для загрузки автомобилей с фильтрацией"""
+    """
+    AJAX view для загрузки автомобилей с фильтрацией.
+    Параметры проверяются до обращения к БД (cars.query_guard): недопустимые
+    отклоняются с кодом 400, каждый запрос к БД ограничен по времени.
+    """
+    replica_reads = True  # чтение с реплики БД, см. cars.db_router
 
     def get(self, request):
         try:
-            # Получаем параметры фильтрации
-            search = request.GET.get('search', '').strip()
-            brand = request.GET.get('brand', '').strip()
-            year_from = request.GET.get('year_from', '').strip()
-            year_to = request.GET.get('year_to', '').strip()
-            price_from = request.GET.get('price_from', '').strip()
-            price_to = request.GET.get('price_to', '').strip()
-            mileage_from = request.GET.get('mileage_from', '').strip()
-            mileage_to = request.GET.get('mileage_to', '').strip()
-            sort = request.GET.get('sort', '-created_at')
-            page = int(request.GET.get('page', 1))
-            per_page = int(request.GET.get('per_page', 50))
-
-            # Начинаем с базового QuerySet
-            cars_qs = Car.objects.select_related().prefetch_related('images').all()
-
-            # Применяем фильтры
-            if search:
-                cars_qs = cars_qs.filter(
-                    Q(brand__icontains=search) |
-                    Q(model__icontains=search) |
-                    Q(lot_number__icontains=search)
-                )
-
-            if brand:
-                cars_qs = cars_qs.filter(brand=brand)
-
-            if year_from:
-                cars_qs = cars_qs.filter(year__gte=int(year_from))
-            if year_to:
-                cars_qs = cars_qs.filter(year__lte=int(year_to))
-
-            if price_from:
-                cars_qs = cars_qs.filter(price__gte=int(price_from))
-            if price_to:
-                cars_qs = cars_qs.filter(price__lte=int(price_to))
-
-            if mileage_from:
-                cars_qs = cars_qs.filter(mileage__gte=int(mileage_from))
-            if mileage_to:
-                cars_qs = cars_qs.filter(mileage__lte=int(mileage_to))
-
-            # Применяем сортировку
-            cars_qs = cars_qs.order_by(sort)
-
-            # Пагинация
-            paginator = Paginator(cars_qs, per_page)
-
-            try:
-                cars_page = paginator.page(page)
-            except:
-                cars_page = paginator.page(1)
-
-            # Подготавливаем данные для JSON
-            cars_data = []
-            for car in cars_page:
-                car_dict = {
-                    'id': car.id,
-                    'brand': car.brand,
-                    'model': car.model,
-                    'year': car.year,
-                    'price': car.price,
-                    'mileage': car.mileage,
-                    'lot_number': car.lot_number,
-                    'engine_volume': car.engine_volume,
-                    'auction_date': car.auction_date,
-                    'lot_url': car.lot_url,
-                    'created_at': car.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'images': [
-                        {'url': image.url}
-                        for image in car.images.all()[:3]  # Берем первые 3 изображения
-                    ]
-                }
-                cars_data.append(car_dict)
+            params = self.parse_params(request.GET)
+        except QueryRejected as e:
+            reject('cars_ajax', e.reason)
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
-            response_data = {
-                'success': True,
-                'cars': cars_data,
-                'page': cars_page.number,
-                'total_pages': paginator.num_pages,
-                'total_count': paginator.count,
-                'has_previous': cars_page.has_previous(),
-                'has_next': cars_page.has_next(),
-            }
-
-            return JsonResponse(response_data, safe=False)
+        try:
+            with statement_timeout(Car):
+                return JsonResponse(self.load_page(**params), safe=False)
 
         except Exception as e:
+            if is_statement_timeout(e):
+                reject('cars_ajax', 'timeout')
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Запрос выполнялся слишком долго, уточните фильтры',
+                }, status=503)
+            raise_replica_error(e)
             print(f"Ошибка в CarsAjaxView: {e}")
             return JsonResponse({
                 'success': False,
                 'error': str(e)
             })
 
+    def parse_params(self, query):
+        """Проверенные параметры запроса; недопустимые - QueryRejected"""
+        params = {
+            'search': query.get('search', '').strip(),
+            'brand': query.get('brand', '').strip(),
+            'source': query.get('source', '').strip(),
+            'page': parse_int(query, 'page', minimum=1, default=1),
+            'per_page': page_size(query),
+            'ordering': ordering(query.get('sort', '').strip()),
+        }
+        for name in ('year', 'price', 'mileage', 'engine'):
+            low = parse_int(query, f'{name}_from', minimum=0)
+            high = parse_int(query, f'{name}_to', minimum=0)
+            check_range(name, low, high)
+            params[f'{name}_from'], params[f'{name}_to'] = low, high
+        for name in ('auction', 'created'):
+            try:
+                low = self.day_start(query.get(f'{name}_from', '').strip() or None)
+                high = self.day_start(query.get(f'{name}_to', '').strip() or None)
+            except ValueError as e:
+                raise QueryRejected('invalid', str(e))
+            check_range(name, low, high)
+            params[f'{name}_from'], params[f'{name}_to'] = low, high
+        params['search_filter'] = search_filter(params.pop('search'))
+        return params
+
+    def load_page(self, search_filter, brand, source, page, per_page, ordering,
+                  year_from, year_to, price_from, price_to, mileage_from, mileage_to,
+                  engine_from, engine_to, auction_from, auction_to, created_from, created_to):
+        # Начинаем с базового QuerySet
+        cars_qs = Car.objects.select_related().prefetch_related('images').all()
+
+        # Применяем фильтры
+        if search_filter:
+            cars_qs = cars_qs.filter(search_filter)
+
+        if brand:
+            cars_qs = cars_qs.filter(brand=brand)
+
+        if source:
+            cars_qs = cars_qs.filter(source=source)
+
+        if year_from is not None:
+            cars_qs = cars_qs.filter(year__gte=year_from)
+        if year_to is not None:
+            cars_qs = cars_qs.filter(year__lte=year_to)
+
+        if price_from is not None:
+            cars_qs = cars_qs.filter(price__gte=price_from)
+        if price_to is not None:
+            cars_qs = cars_qs.filter(price__lte=price_to)
+
+        if mileage_from is not None:
+            cars_qs = cars_qs.filter(mileage__gte=mileage_from)
+        if mileage_to is not None:
+            cars_qs = cars_qs.filter(mileage__lte=mileage_to)
+
+        # Дата аукциона (YYYY-MM-DD), обе границы включительно
+        if auction_from:
+            cars_qs = cars_qs.filter(auction_at__gte=auction_from)
+        if auction_to:
+            cars_qs = cars_qs.filter(auction_at__lt=auction_to + timezone.timedelta(days=1))
+
+        if engine_from is not None:
+            cars_qs = cars_qs.filter(engine_cc__gte=engine_from)
+        if engine_to is not None:
+            cars_qs = cars_qs.filter(engine_cc__lte=engine_to)
+
+        # Дата добавления в базу (YYYY-MM-DD) - ключ секций, такие запросы читают только нужные месяцы
+        if created_from:
+            cars_qs = cars_qs.filter(created_at__gte=created_from)
+            # Изображения не бывают старше своего автомобиля - отсекаем и их старые секции
+            cars_qs = cars_qs.prefetch_related(None).prefetch_related(Prefetch(
+                'images', queryset=Image.objects.filter(created_at__gte=created_from)
+            ))
+        if created_to:
+            cars_qs = cars_qs.filter(created_at__lt=created_to + timezone.timedelta(days=1))
+
+        # Применяем сортировку (только допустимые, по индексам)
+        cars_qs = cars_qs.order_by(*ordering)
+
+        # Пагинация
+        paginator = Paginator(cars_qs, per_page)
+
+        try:
+            cars_page = paginator.page(page)
+        except:
+            cars_page = paginator.page(1)
+
+        # Подготавливаем данные для JSON
+        cars_data = []
+        for car in cars_page:
+            car_dict = {
+                'id': car.id,
+                'brand': car.brand,
+                'model': car.model,
+                'year': car.year,
+                'price': car.price,
+                'mileage': car.mileage,
+                'lot_number': car.lot_number,
+                'source': car.source,
+                'engine_volume': car.engine_volume,
+                'auction_date': car.auction_date,
+                'auction_at': car.auction_at.date().isoformat() if car.auction_at else None,
+                'engine_cc': car.engine_cc,
+                'expected_price': car.expected_price,
+                'price_zscore': car.price_zscore,
+                'lot_url': car.lot_url,
+                'created_at': car.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                'images': [
+                    {'url': image.url}
+                    for image in car.images.all()[:3]  # Берем первые 3 изображения
+                ]
+            }
+            cars_data.append(car_dict)
+
+        return {
+            'success': True,
+            'cars': cars_data,
+            'page': cars_page.number,
+            'total_pages': paginator.num_pages,
+            'total_count': paginator.count,
+            'has_previous': cars_page.has_previous(),
+            'has_next': cars_page.has_next(),
+        }
+
+    @staticmethod
+    def day_start(value):
+        """Начало дня для даты из параметра запроса (пустое - None)"""
+        if value is None:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Некорректная дата: {value}")
+        return timezone.make_aware(datetime.combine(day, time.min))
+
 
 class ParserView(TemplateView):
     template_name = 'parser.html'
+    replica_reads = True
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -145,36 +230,12 @@ class StartParserView(View):
         # Создаем запись в логе
         parser_log = ParserLog.objects.create(url=url)
 
-        # Запускаем парсер в отдельном потоке
-        thread = threading.Thread(
-            target=self.run_parser_in_thread,
-            args=(url, parser_log.id)
-        )
-        thread.daemon = True
-        thread.start()
+        # Запускаем парсер в фоне
+        start_single_page_job(url, parser_log.id)
 
         messages.success(request, f'Парсинг запущен для URL: {url}')
         return redirect('parser_view')
 
-    def run_parser_in_thread(self, url, log_id):
-        """Запуск парсера в отдельном потоке"""
-        try:
-            parser_log = ParserLog.objects.get(id=log_id)
-            parser = AuctionParser()
-            parser.run_parser(url, parser_log)
-        except Exception as e:
-            # Обновляем лог с ошибкой
-            try:
-                parser_log = ParserLog.objects.get(id=log_id)
-                parser_log.mark_error(str(e))
-            except ParserLog.DoesNotExist:
-                pass
-
-            # Логируем ошибку
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Ошибка в потоке парсера: {e}")
-
 
 class StartMultiPageParserView(View):
     """Запуск многостраничного парсера"""
@@ -211,9 +272,8 @@ class StartMultiPageParserView(View):
 
         parser_log = ParserLog.objects.create(url=url_text)
 
-        # Запускаем многостраничный парсер в отдельном потоке
-        multi_parser = MultiPageParser()
-        log_id = multi_parser.run_in_thread(start_page, end_page, parser_log.id)
+        # Запускаем многостраничный парсер в фоне
+        start_multi_page_job(start_page, end_page, parser_log.id)
 
         if end_page:
             message = f'Запущен многостраничный парсинг: страницы {start_page}-{end_page}'
@@ -224,6 +284,26 @@ class StartMultiPageParserView(View):
         return redirect('parser_view')
 
 
+class ResumeParserView(View):
+    """Продолжение прерванного многостраничного парсинга с последней сохраненной страницы"""
+
+    def post(self, request, log_id):
+        mark_stale_runs()
+        parser_log = ParserLog.objects.filter(id=log_id).first()
+        if not parser_log or not parser_log.resumable:
+            messages.error(request, 'Этот запуск нельзя продолжить')
+            return redirect('parser_view')
+
+        # Статус меняется сразу, чтобы повторное нажатие не запустило второй процесс
+        updated = ParserLog.objects.filter(id=log_id, status=parser_log.status).update(
+            status='running', heartbeat_at=timezone.now(),
+        )
+        if updated:
+            start_resume_job(parser_log.id)
+            messages.success(request, f'Парсинг #{parser_log.id} продолжен после страницы {parser_log.last_page or 0}')
+        return redirect('parser_view')
+
+
 class StopParserView(View):
     """Остановка всех активных парсеров"""
 
@@ -262,9 +342,18 @@ class ParserStatusView(View):
                     'status_display': recent_log.get_status_display(),
                     'cars_parsed': recent_log.cars_parsed,
                     'images_parsed': recent_log.images_parsed,
+                    'keyless_lots': recent_log.keyless_lots,
+                    'duplicate_lots': recent_log.duplicate_lots,
                     'created_at': recent_log.created_at.strftime('%d.%m.%Y %H:%M'),
                     'url': recent_log.url,
+                    'log_id': recent_log.id,
+                    'last_page': recent_log.last_page,
+                    'resumable': recent_log.resumable,
+                    # Процесс перестал подавать сигнал; статус меняют scrape и resume_parser_runs
+                    'stale': recent_log.status == 'running' and stale_runs().filter(pk=recent_log.pk).exists(),
                 }
+                if recent_log.heartbeat_at:
+                    data['heartbeat_at'] = recent_log.heartbeat_at.strftime('%d.%m.%Y %H:%M:%S')
                 if recent_log.finished_at:
                     data['finished_at'] = recent_log.finished_at.strftime('%d.%m.%Y %H:%M')
                 if recent_log.error_message:
@@ -272,6 +361,17 @@ class ParserStatusView(View):
             else:
                 data = {'status': 'no_data'}
 
+            # Текущая скорость обхода по сайтам (сохраняется регулятором по завершении запуска)
+            data['throttle'] = [
+                {
+                    'host': state.host,
+                    'delay': round(state.delay, 2),
+                    'concurrency': state.concurrency,
+                    'updated_at': state.updated_at.strftime('%d.%m.%Y %H:%M'),
+                }
+                for state in ThrottleState.objects.all()
+            ]
+
             return JsonResponse(data)
 
         except Exception as e:
@@ -279,21 +379,380 @@ class ParserStatusView(View):
             return JsonResponse({'status': 'error', 'error_message': str(e)})
 
 
+class RecrawlStatsView(View):
+    replica_reads = True
+
+    def get(self, request):
+        """API метрик свежести данных сайта (?source=, по умолчанию основной) по корзинам близости аукциона"""
+        try:
+            source = request.GET.get('source', '').strip() or DEFAULT_SOURCE
+            return JsonResponse({
+                'success': True,
+                'source': source,
+                'buckets': RecrawlScheduler.freshness_by_bucket(source=source),
+            })
+        except Exception as e:
+            raise_replica_error(e)
+            print(f"Ошибка в RecrawlStatsView: {e}")
+            return JsonResponse({'success': False, 'error': str(e)})
+
+
+class MetricsView(View):
+    def get(self, request):
+        """Метрики в формате Prometheus"""
+        return HttpResponse(render_latest(), content_type=CONTENT_TYPE_LATEST)
+
+
 class ClearDataView(View):
     def post(self, request):
-        """Очистка всех данных"""
+        """
+        Запуск полной очистки данных в фоне.
+        Прогресс доступен по адресу parser/maintenance/<id>/
+        """
+        try:
+            job = MaintenanceJob.objects.create(kind='purge')
+            start_maintenance_job(job.id)
+            messages.success(request, f'Очистка данных запущена (задача #{job.id})')
+        except Exception as e:
+            messages.error(request, f'Ошибка при очистке данных: {str(e)}')
+
+        return redirect('parser_view')
+
+
+class MaintenanceJobStatusView(View):
+    def get(self, request, job_id):
+        """Прогресс задачи обслуживания данных"""
+        try:
+            job = MaintenanceJob.objects.get(id=job_id)
+        except MaintenanceJob.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Задача не найдена'}, status=404)
+
+        return JsonResponse({
+            'success': True,
+            'id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'processed': job.processed,
+            'total': job.total,
+            'message': job.message,
+            'created_at': job.created_at.strftime('%d.%m.%Y %H:%M'),
+            'finished_at': job.finished_at.strftime('%d.%m.%Y %H:%M') if job.finished_at else None,
+        })
+
+
+class UnderpricedLotsView(View):
+    """Лоты с ценой заметно ниже аналогов (по оценке cars.valuation)"""
+    replica_reads = True
+
+    def get(self, request):
+        # NumPy нужен только модулю оценки, веб-процесс подключает его при первом запросе
+        from .valuation import UNDERPRICED_Z
+
+        try:
+            brand = request.GET.get('brand', '').strip()
+            model = request.GET.get('model', '').strip()
+            max_z = float(request.GET.get('max_z', UNDERPRICED_Z))
+            limit = min(int(request.GET.get('limit', 50)), 500)
+
+            cars_qs = Car.objects.filter(price_zscore__lte=max_z)
+            if brand:
+                cars_qs = cars_qs.filter(brand=brand)
+            if model:
+                cars_qs = cars_qs.filter(model=model)
+
+            lots = []
+            for car in cars_qs.order_by('price_zscore', 'id')[:limit]:
+                lots.append({
+                    'id': car.id,
+                    'brand': car.brand,
+                    'model': car.model,
+                    'year': car.year,
+                    'mileage': car.mileage,
+                    'price': car.price,
+                    'expected_price': car.expected_price,
+                    'discount': round(1 - car.price / car.expected_price, 3) if car.expected_price else None,
+                    'price_zscore': car.price_zscore,
+                    'lot_number': car.lot_number,
+                    'lot_url': car.lot_url,
+                    'auction_at': car.auction_at.date().isoformat() if car.auction_at else None,
+                })
+
+            return JsonResponse({'success': True, 'max_z': max_z, 'lots': lots})
+
+        except Exception as e:
+            raise_replica_error(e)
+            return JsonResponse({'success': False, 'error': str(e)})
+
+
+class ComparableLotsView(View):
+    """
+    Ближайшие аналоги лота (та же марка и модель, близкие год, пробег и объем
+    двигателя) по индексу cars.comparables с разницей в цене.
+    Лот задается car_id или параметрами brand, model, year, mileage, engine_cc.
+    """
+    replica_reads = True
+
+    def get(self, request):
+        # NumPy нужен только индексу аналогов, веб-процесс подключает его при первом запросе
+        from .comparables import current_index
+
+        try:
+            k = max(1, min(int(request.GET.get('k', 10)), 50))
+            car_id = request.GET.get('car_id', '').strip()
+            if car_id:
+                target = Car.objects.filter(id=int(car_id)).first()
+                if target is None:
+                    return JsonResponse({'success': False, 'error': 'Лот не найден'}, status=404)
+                brand, model, year = target.brand, target.model, target.year
+                mileage, engine_cc, price = target.mileage, target.engine_cc, target.price
+                exclude_id = target.id
+            else:
+                brand = request.GET.get('brand', '').strip()
+                model = request.GET.get('model', '').strip()
+                year = int(request.GET.get('year', ''))
+                mileage = int(request.GET['mileage']) if request.GET.get('mileage') else None
+                engine_cc = int(request.GET['engine_cc']) if request.GET.get('engine_cc') else None
+                price = int(request.GET['price']) if request.GET.get('price') else None
+                exclude_id = None
+                if not brand:
+                    raise ValueError("Не задана марка")
+
+            started = perf_counter()
+            neighbours = current_index().query(brand, model, year, mileage, engine_cc, k=k, exclude_id=exclude_id)
+            search_ms = round((perf_counter() - started) * 1000, 2)
+
+            # Данные аналогов - из БД одним запросом (удаленные лоты пропускаются)
+            cars = Car.objects.only('id', 'lot_number', 'source', 'lot_url', 'year', 'mileage', 'engine_cc',
+                                    'price', 'auction_at').in_bulk([car_id for car_id, _, _ in neighbours])
+            comparables = []
+            for neighbour_id, neighbour_price, distance in neighbours:
+                car = cars.get(neighbour_id)
+                if car is None or not car.price:
+                    continue
+                comparables.append({
+                    'id': car.id,
+                    'lot_number': car.lot_number,
+                    'source': car.source,
+                    'year': car.year,
+                    'mileage': car.mileage,
+                    'engine_cc': car.engine_cc,
+                    'price': car.price,
+                    'price_delta': car.price - price if price else None,
+                    'price_delta_pct': round((car.price - price) / price, 3) if price else None,
+                    'distance': round(distance, 3),
+                    'lot_url': car.lot_url,
+                    'auction_at': car.auction_at.date().isoformat() if car.auction_at else None,
+                })
+
+            prices = sorted(car['price'] for car in comparables)
+            return JsonResponse({
+                'success': True,
+                'target': {'brand': brand, 'model': model, 'year': year, 'mileage': mileage,
+                           'engine_cc': engine_cc, 'price': price},
+                'comparables': comparables,
+                'median_price': prices[len(prices) // 2] if prices else None,
+                'search_ms': search_ms,
+            })
+
+        except Exception as e:
+            raise_replica_error(e)
+            return JsonResponse({'success': False, 'error': str(e)})
+
+
+class SavedSearchView(View):
+    """
+    Сохраненные поиски: POST сохраняет фильтры списка автомобилей (марка,
+    год, цена, пробег - те же параметры, что у cars/ajax/), GET - список
+    поисков с числом совпадений
+    """
+
+    RANGE_PARAMS = ('year_from', 'year_to', 'price_from', 'price_to', 'mileage_from', 'mileage_to')
+
+    def get(self, request):
+        searches = SavedSearch.objects.annotate(matches_count=Count('matches')).order_by('-created_at')
+        return JsonResponse({
+            'success': True,
+            'searches': [
+                {
+                    'id': search.id,
+                    'name': str(search),
+                    'brand': search.brand,
+                    **{param: getattr(search, param) for param in self.RANGE_PARAMS},
+                    'is_active': search.is_active,
+                    'matches': search.matches_count,
+                }
+                for search in searches
+            ],
+        })
+
+    def post(self, request):
         try:
-            cars_count = Car.objects.count()
-            images_count = Image.objects.count()
-            logs_count = ParserLog.objects.count()
+            values = {}
+            for param in self.RANGE_PARAMS:
+                value = request.POST.get(param, '').strip()
+                values[param] = int(value) if value else None
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        brand = request.POST.get('brand', '').strip()
+        if not brand and all(value is None for value in values.values()):
+            return JsonResponse({'success': False, 'error': 'Задайте хотя бы один фильтр'}, status=400)
+
+        search = SavedSearch.objects.create(name=request.POST.get('name', '').strip(), brand=brand, **values)
+        return JsonResponse({'success': True, 'id': search.id, 'name': str(search)})
+
 
-            Image.objects.all().delete()
-            Car.objects.all().delete()
-            ParserLog.objects.all().delete()
+class SavedSearchMatchesView(View):
+    """Лоты, подошедшие под сохраненный поиск, новые первыми (?since= - только после момента)"""
+    replica_reads = True
+
+    def get(self, request, search_id):
+        try:
+            search = SavedSearch.objects.get(id=search_id)
+        except SavedSearch.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Поиск не найден'}, status=404)
+
+        try:
+            limit = min(int(request.GET.get('limit', 50)), 500)
+            matches = search.matches.select_related('car').order_by('-matched_at', '-id')
+            since = request.GET.get('since', '').strip()
+            if since:
+                since_at = parse_datetime(since)
+                if since_at is None:
+                    raise ValueError(f"Некорректная дата: {since}")
+                if timezone.is_naive(since_at):
+                    since_at = timezone.make_aware(since_at)
+                matches = matches.filter(matched_at__gt=since_at)
+
+            lots = []
+            for match in matches[:limit]:
+                car = match.car
+                lots.append({
+                    'id': car.id,
+                    'brand': car.brand,
+                    'model': car.model,
+                    'year': car.year,
+                    'mileage': car.mileage,
+                    'price': car.price,
+                    'lot_number': car.lot_number,
+                    'source': car.source,
+                    'lot_url': car.lot_url,
+                    'auction_at': car.auction_at.date().isoformat() if car.auction_at else None,
+                    'matched_at': match.matched_at.isoformat(),
+                })
+
+            return JsonResponse({'success': True, 'search': str(search), 'lots': lots})
 
-            messages.success(request,
-                             f'Данные очищены. Удалено: {cars_count} автомобилей, {images_count} изображений, {logs_count} логов')
         except Exception as e:
-            messages.error(request, f'Ошибка при очистке данных: {str(e)}')
+            raise_replica_error(e)
+            return JsonResponse({'success': False, 'error': str(e)})
+
+
+# Поля пакетного запроса лотов; id, source и lot_number отдаются всегда
+LOOKUP_KEY_FIELDS = ('id', 'source', 'lot_number')
+LOOKUP_FIELDS = (
+    'brand', 'model', 'year', 'price', 'mileage', 'engine_volume', 'engine_cc', 'auction_date',
+    'auction_at', 'expected_price', 'price_zscore', 'lot_url', 'created_at', 'updated_at', 'images',
+)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class LotLookupView(View):
+    """
+    Пакетный запрос лотов для внешних клиентов: POST с JSON
+    {"lot_numbers": [...], "ids": [...], "source": "...", "fields": [...]}.
+    Число запросов к БД не зависит от числа лотов: состояние выборки для ETag
+    (количество и последнее изменение updated_at), сами лоты одним IN по индексу
+    и изображения одним запросом. Если ETag совпал с If-None-Match - ответ 304
+    без чтения лотов.
+    """
 
-        return redirect('parser_view')
\ No newline at end of file
+    def post(self, request):
+        try:
+            lot_numbers, ids, source, fields = self.parse_body(json.loads(request.body or b'{}'))
+        except (ValueError, TypeError) as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        try:
+            keys = Q()
+            if lot_numbers:
+                keys |= Q(lot_number__in=lot_numbers)
+            if ids:
+                keys |= Q(id__in=ids)
+            cars_qs = Car.objects.filter(keys)
+            if source:
+                cars_qs = cars_qs.filter(source=source)
+
+            state = cars_qs.aggregate(count=Count('id'), changed=Max('updated_at'))
+            etag = self.make_etag(state, lot_numbers, ids, source, fields)
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+            columns = [name for name in fields if name != 'images']
+            cars_qs = cars_qs.only(*LOOKUP_KEY_FIELDS, *columns).order_by('id')
+            if 'images' in fields:
+                cars_qs = cars_qs.prefetch_related(
+                    Prefetch('images', queryset=Image.objects.only('car_id', 'url').order_by('id'))
+                )
+            cars = [self.serialize(car, fields) for car in cars_qs]
+
+        except Exception as e:
+            print(f"Ошибка в LotLookupView: {e}")
+            return JsonResponse({'success': False, 'error': str(e)})
+
+        found_lots = {car['lot_number'] for car in cars}
+        found_ids = {car['id'] for car in cars}
+        response = JsonResponse({
+            'success': True,
+            'cars': cars,
+            'missing_lot_numbers': [number for number in lot_numbers if number not in found_lots],
+            'missing_ids': [car_id for car_id in ids if car_id not in found_ids],
+        })
+        response['ETag'] = etag
+        return response
+
+    @staticmethod
+    def parse_body(body):
+        """Проверяет тело запроса: (номера лотов, id, источник, поля)"""
+        if not isinstance(body, dict):
+            raise ValueError("Ожидается JSON-объект")
+        lot_numbers = body.get('lot_numbers') or []
+        ids = body.get('ids') or []
+        if not isinstance(lot_numbers, list) or not isinstance(ids, list):
+            raise ValueError("lot_numbers и ids должны быть списками")
+        # Повторы не нужны ни в запросе к БД, ни в ETag
+        lot_numbers = list(dict.fromkeys(str(number).strip() for number in lot_numbers))
+        ids = list(dict.fromkeys(int(car_id) for car_id in ids))
+        if not lot_numbers and not ids:
+            raise ValueError("Не заданы lot_numbers или ids")
+        if len(lot_numbers) + len(ids) > settings.LOT_LOOKUP_MAX_KEYS:
+            raise ValueError(f"Не больше {settings.LOT_LOOKUP_MAX_KEYS} лотов за запрос")
+
+        fields = body.get('fields') or LOOKUP_FIELDS
+        unknown = set(fields) - set(LOOKUP_FIELDS) - set(LOOKUP_KEY_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+        # Порядок полей не влияет на ответ и ETag
+        fields = [name for name in LOOKUP_FIELDS if name in fields]
+
+        source = str(body.get('source') or '').strip()
+        return lot_numbers, ids, source, fields
+
+    @staticmethod
+    def make_etag(state, lot_numbers, ids, source, fields):
+        """ETag меняется при изменении, добавлении или удалении любого из запрошенных лотов"""
+        payload = json.dumps([state['count'], state['changed'], sorted(lot_numbers), sorted(ids), source, fields],
+                             default=str)
+        return '"%s"' % hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def serialize(car, fields):
+        data = {name: getattr(car, name) for name in LOOKUP_KEY_FIELDS}
+        for name in fields:
+            if name == 'images':
+                data['images'] = [image.url for image in car.images.all()]
+            else:
+                data[name] = getattr(car, name)
+        return data
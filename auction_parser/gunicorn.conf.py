@@ -0,0 +1,69 @@
+"""
+Конфигурация gunicorn для продакшен-режима.
+
+Запуск:
+    gunicorn -c gunicorn.conf.py auction_parser.wsgi
+
+Все параметры можно переопределить переменными окружения GUNICORN_*.
+"""
+import os
+import shutil
+from os import environ
+
+
+def _cpu_count():
+    """Количество доступных процессу CPU (с учетом ограничений контейнера)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+bind = environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# gevent-воркеры: запросы в основном ждут БД, поэтому кооперативная
+# многозадачность дает больше пропускной способности, чем sync-воркеры
+worker_class = 'gevent'
+workers = int(environ.get('GUNICORN_WORKERS', _cpu_count() * 2 + 1))
+# Каждое соединение может держать свое подключение к PostgreSQL,
+# поэтому workers * worker_connections не должно превышать max_connections
+worker_connections = int(environ.get('GUNICORN_WORKER_CONNECTIONS', 50))
+
+timeout = int(environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Периодический перезапуск воркеров защищает от медленных утечек памяти
+max_requests = int(environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = environ.get('GUNICORN_LOGLEVEL', 'info')
+
+# Парсинг не должен выполняться внутри воркеров, обслуживающих запросы:
+# задачи запускаются отдельными процессами (см. cars/jobs.py)
+raw_env = ['PARSER_JOBS_MODE=process']
+
+# Общий каталог метрик prometheus_client для всех воркеров и процессов парсинга.
+# Переменная выставляется до загрузки приложения и наследуется дочерними процессами.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+
+def on_starting(server):
+    """Очищаем метрики предыдущего запуска"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    """Делаем psycopg2 совместимым с gevent в каждом воркере"""
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+
+def child_exit(server, worker):
+    """Убираем live-метрики завершившегося воркера"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)